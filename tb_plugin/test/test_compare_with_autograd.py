@@ -1,4 +1,6 @@
 import os
+import shutil
+import tempfile
 import time
 import unittest
 import pytest
@@ -221,9 +223,16 @@ def get_output_fn(dir_name, profilers_dict):
 class TestCompareWithAutogradResult(unittest.TestCase):
 
     def compare_results(self, log_dir, profilers_dict, use_gpu=True, record_shapes=False, with_stack=False):
-        cache = io.Cache()
+        # keep the downloads and the traces out of the user cache directory.
+        cache_dir = tempfile.mkdtemp()
+        cache = io.Cache(os.path.join(cache_dir, "downloads"), 64 * 1024 * 1024,
+                         os.path.join(cache_dir, "traces"), 64 * 1024 * 1024)
         loader = RunLoader(os.path.split(log_dir)[-1], log_dir, cache)
-        run = loader.load()
+        try:
+            run = loader.load()
+        finally:
+            cache.__exit__(None, None, None)
+            shutil.rmtree(cache_dir)
         plugin_result = get_plugin_result(run, record_shapes, with_stack)
         count = 0
         for worker_name, p in profilers_dict.items():
@@ -0,0 +1,270 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from functools import partial
+from unittest import mock
+
+from torch_tb_profiler import io
+from torch_tb_profiler.io import DiskCache
+from torch_tb_profiler.io.base import BaseFileSystem, RemotePath, StatData, ThreadLocalClient
+from torch_tb_profiler.profiler.profile_cache import ProfileCache
+from torch_tb_profiler.profiler.progress import ProgressReporter, create_progress_file
+
+
+class FakeRemoteFileSystem(RemotePath, BaseFileSystem):
+    def __init__(self):
+        self.files = {}
+        self.downloads = 0
+        self.listings = 0
+
+    def download_file(self, filename, local_file=None):
+        self.downloads += 1
+        with open(local_file, "wb") as f:
+            f.write(self.files[filename])
+        return local_file
+
+    def stat(self, filename):
+        data = self.files[filename]
+        return StatData(len(data), None, str(hash(data)))
+
+    def exists(self, filename):
+        return filename in self.files
+
+    def read(self, file, binary_mode=False, size=None, continue_from=None):
+        raise NotImplementedError
+
+    def write(self, filename, file_content, binary_mode=False):
+        raise NotImplementedError
+
+    def glob(self, filename):
+        raise NotImplementedError
+
+    def isdir(self, dirname):
+        return False
+
+    def listdir(self, dirname):
+        raise NotImplementedError
+
+    def makedirs(self, path):
+        raise NotImplementedError
+
+    def list_files(self, dirname, recursive=True):
+        self.listings += 1
+        prefix = dirname + "/"
+        files = []
+        subdirs = set()
+        for filename in self.files:
+            if not filename.startswith(prefix):
+                continue
+            if recursive or "/" not in filename[len(prefix):]:
+                files.append((filename, self.stat(filename)))
+            else:
+                subdirs.add(prefix + filename[len(prefix):].split("/")[0])
+        return files, sorted(subdirs)
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_put(self):
+        cache = DiskCache(self.directory, 1024)
+        self.assertIsNone(cache.get("a"))
+        self.assertTrue(cache.put("a", b"123"))
+        self.assertEqual(cache.get("a"), b"123")
+        self.assertTrue(cache.put("a", b"456"))
+        self.assertEqual(cache.get("a"), b"456")
+        cache.remove("a")
+        self.assertIsNone(cache.get("a"))
+        # no temporary file is left behind.
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_lru_eviction(self):
+        cache = DiskCache(self.directory, 30)
+        for i, key in enumerate(["a", "b", "c"]):
+            cache.put(key, b"0123456789")
+            os.utime(cache.path(key), (i, i))
+        # "a" is the oldest entry but it is used again.
+        self.assertEqual(cache.get("a"), b"0123456789")
+        cache.put("d", b"0123456789")
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertIsNotNone(cache.get("d"))
+
+    def test_put_file(self):
+        cache = DiskCache(self.directory, 5)
+
+        def write(path):
+            with open(path, "wb") as f:
+                f.write(b"0123456789")
+
+        self.assertIsNone(cache.get_file("a"))
+        with cache.lock("a"):
+            path = cache.put_file("a", write)
+        # the new entry is kept even if it is larger than max_size.
+        self.assertEqual(cache.get_file("a"), path)
+        self.assertEqual(cache.get("a"), b"0123456789")
+
+        def fail(path):
+            write(path)
+            raise OSError("disk full")
+
+        # the temporary file of a failed write is removed.
+        with self.assertRaises(OSError):
+            cache.put_file("b", fail)
+        self.assertEqual([name for name in os.listdir(self.directory) if name.endswith(".tmp")], [])
+
+    def test_evict(self):
+        cache = DiskCache(self.directory, 1024)
+        # the directory is scanned by the first put only while the entries fit in max_size.
+        with mock.patch.object(cache, "evict", wraps=cache.evict) as evict:
+            for key in "abc":
+                cache.put(key, b"0123456789")
+            self.assertEqual(evict.call_count, 1)
+            cache.put("d", b"0" * 1000)
+            self.assertEqual(evict.call_count, 2)
+
+        # the temporary files left by the crashed writers are removed once stale.
+        stale = os.path.join(self.directory, "stale.tmp")
+        recent = os.path.join(self.directory, "recent.tmp")
+        for path in (stale, recent):
+            with open(path, "wb") as f:
+                f.write(b"0")
+        os.utime(stale, (0, 0))
+        cache.evict()
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(recent))
+
+    def test_download_cache(self):
+        fs = FakeRemoteFileSystem()
+        io.register_filesystem("fake", fs)
+        fs.files["fake://bucket/worker0.pt.trace.json"] = b"[1]"
+        with io.Cache(self.directory, 1024) as cache:
+            local_file = cache.get_remote_cache("fake://bucket/worker0.pt.trace.json")
+            self.assertEqual(cache.read("fake://bucket/worker0.pt.trace.json"), b"[1]")
+            self.assertEqual(fs.downloads, 1)
+            local = os.path.join(self.directory, "worker0.pt.trace.json")
+            self.assertEqual(cache.get_remote_cache(local), local)
+
+        # the download survives the cache, and a changed file is downloaded again.
+        with io.Cache(self.directory, 1024) as cache:
+            self.assertEqual(cache.get_remote_cache("fake://bucket/worker0.pt.trace.json"), local_file)
+            self.assertEqual(fs.downloads, 1)
+            fs.files["fake://bucket/worker0.pt.trace.json"] = b"[2]"
+            self.assertEqual(cache.read("fake://bucket/worker0.pt.trace.json"), b"[2]")
+            self.assertEqual(fs.downloads, 2)
+
+            # the prefetched file is passed to the parsing process without checking the remote file again.
+            progress_file = create_progress_file()
+            try:
+                local_file = io.DownloadManager().prefetch(cache, "fake://bucket/worker0.pt.trace.json",
+                                                           ProgressReporter(progress_file, 3)).result()
+                # the download stage is reported for the parsing process to resume.
+                reporter = ProgressReporter.resume(progress_file, 3)
+                self.assertEqual(list(reporter.stages), ["download"])
+                self.assertEqual(reporter.stage_bytes, {"download": 3})
+            finally:
+                os.remove(progress_file)
+            del fs.files["fake://bucket/worker0.pt.trace.json"]
+            prefetched = cache.with_local_file("fake://bucket/worker0.pt.trace.json", local_file)
+            self.assertEqual(prefetched.read("fake://bucket/worker0.pt.trace.json"), b"[2]")
+            self.assertEqual(fs.downloads, 2)
+
+    def test_thread_local_client(self):
+        client = ThreadLocalClient(object)
+        self.assertIs(client.get(), client.get())
+        clients = []
+        thread = threading.Thread(target=lambda: clients.append(client.get()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(clients[0], client.get())
+
+    def test_trace_cache(self):
+        fs = FakeRemoteFileSystem()
+        io.register_filesystem("fake", fs)
+        fs.files["fake://bucket/worker0.pt.trace.json"] = b"[1]"
+        fs.files["fake://bucket/worker1.pt.trace.json"] = b"[2]"
+        trace_directory = os.path.join(self.directory, "traces")
+        writes = []
+
+        def write(content, path):
+            writes.append(content)
+            with open(path, "wb") as f:
+                f.write(content)
+
+        with io.Cache(self.directory, 1024, trace_directory, 10) as cache:
+            with cache.open_trace("fake://bucket/worker0.pt.trace.json", "gzip", partial(write, b"01234")) as f:
+                self.assertEqual(f.read(), b"01234")
+            with cache.open_trace("fake://bucket/worker0.pt.trace.json", "gzip", partial(write, b"")) as f:
+                self.assertEqual(f.read(), b"01234")
+            self.assertEqual(writes, [b"01234"])
+
+        # the artifacts survive the cache, and the least recently used ones are evicted over max_size.
+        with io.Cache(self.directory, 1024, trace_directory, 10) as cache:
+            with cache.open_trace("fake://bucket/worker0.pt.trace.json", "gzip", partial(write, b"")) as f:
+                self.assertEqual(f.read(), b"01234")
+            with cache.open_trace("fake://bucket/worker1.pt.trace.json", "gzip", partial(write, b"56789")):
+                pass
+            with cache.open_trace("fake://bucket/worker0.pt.trace.json", "gpu_metrics", partial(write, b"abcde")):
+                pass
+            self.assertEqual(len([name for name in os.listdir(trace_directory) if name.endswith(DiskCache.SUFFIX)]), 2)
+            with cache.open_trace("fake://bucket/worker0.pt.trace.json", "gzip", partial(write, b"01234")):
+                pass
+            self.assertEqual(writes, [b"01234", b"56789", b"abcde", b"01234"])
+
+            # a changed trace file has another artifact.
+            fs.files["fake://bucket/worker1.pt.trace.json"] = b"[3]"
+            with cache.open_trace("fake://bucket/worker1.pt.trace.json", "gzip", partial(write, b"fghij")) as f:
+                self.assertEqual(f.read(), b"fghij")
+
+            # the state known by the loader is used without requesting the remote file.
+            file_stat = fs.stat("fake://bucket/worker1.pt.trace.json")
+            del fs.files["fake://bucket/worker1.pt.trace.json"]
+            with cache.open_trace("fake://bucket/worker1.pt.trace.json", "gzip", partial(write, b""), file_stat) as f:
+                self.assertEqual(f.read(), b"fghij")
+
+    def test_listing_snapshot(self):
+        fs = FakeRemoteFileSystem()
+        io.register_filesystem("fake", fs)
+        fs.files["fake://bucket/logdir/run1/worker0.pt.trace.json"] = b"[1]"
+        fs.files["fake://bucket/logdir/run1/events.out"] = b""
+        fs.files["fake://bucket/logdir/run2/a/worker0.pt.trace.json"] = b"[1]"
+        snapshot = io.ListingSnapshot("fake://bucket/logdir")
+        self.assertEqual(snapshot.refresh(), {"fake://bucket/logdir/run1", "fake://bucket/logdir/run2/a"})
+        self.assertEqual(snapshot.run_dirs, ["fake://bucket/logdir/run1", "fake://bucket/logdir/run2/a"])
+        self.assertEqual(list(snapshot.get_files("fake://bucket/logdir/run1")), ["worker0.pt.trace.json"])
+        self.assertIsNone(snapshot.get_files("fake://bucket/logdir/run3"))
+        # one listing of the logdir, and one of each top-level directory.
+        self.assertEqual(fs.listings, 3)
+
+        self.assertEqual(snapshot.refresh(), set())
+        fs.files["fake://bucket/logdir/run1/worker0.pt.trace.json"] = b"[2]"
+        fs.files["fake://bucket/logdir/worker1.pt.trace.json"] = b"[1]"
+        del fs.files["fake://bucket/logdir/run2/a/worker0.pt.trace.json"]
+        self.assertEqual(snapshot.refresh(), {"fake://bucket/logdir", "fake://bucket/logdir/run1",
+                                              "fake://bucket/logdir/run2/a"})
+        self.assertEqual(snapshot.run_dirs, ["fake://bucket/logdir", "fake://bucket/logdir/run1"])
+
+    def test_profile_cache_key(self):
+        trace_path = os.path.join(self.directory, "worker0.pt.trace.json")
+        with open(trace_path, "w") as f:
+            f.write("[]")
+        key = ProfileCache.get_key(trace_path)
+        self.assertEqual(ProfileCache.get_key(trace_path), key)
+
+        with open(trace_path, "w") as f:
+            f.write("[ ]")
+        os.utime(trace_path, (time.time() + 10, time.time() + 10))
+        self.assertNotEqual(ProfileCache.get_key(trace_path), key)
+        self.assertIsNone(ProfileCache.get_key(os.path.join(self.directory, "missing.pt.trace.json")))
+
+
+if __name__ == '__main__':
+    unittest.main()
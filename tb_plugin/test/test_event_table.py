@@ -0,0 +1,102 @@
+import unittest
+
+from torch_tb_profiler.profiler import trace
+from torch_tb_profiler.profiler.event_table import (EventDispatcher, EventTable,
+                                                    EventTableBuilder)
+
+TRACE_EVENTS = [
+    {"ph": "X", "cat": "Operator", "name": "ProfilerStep#3", "pid": 13721, "tid": "123",
+     "ts": 100, "dur": 300, "args": {"Input Dims": [], "External id": 2}},
+    {"ph": "X", "cat": "Operator", "name": "aten::to", "pid": 13721, "tid": "123",
+     "ts": 200, "dur": 60, "args": {"Input Dims": [[2, 8, 5], [], []], "Input type": ["float", "", ""],
+                                   "Call stack": "a.py(5): f", "External id": 3}},
+    {"ph": "X", "cat": "Runtime", "name": "cudaLaunchKernel", "pid": 13721, "tid": "123",
+     "ts": 210, "dur": 5, "args": {"correlation": 334, "external id": 3}},
+    {"ph": "X", "cat": "Kernel", "name": "void cunn_ClassNLLCriterion_updateGradInput_kernel<float>",
+     "pid": 0, "tid": "stream 7", "ts": 430, "dur": 15,
+     "args": {"correlation": 334, "external id": 3, "device": 0, "blocks per SM": 0.5,
+              "est. achieved occupancy %": 12}},
+    {"ph": "i", "s": "t", "name": "[memory]", "pid": 136, "tid": 136, "ts": 250,
+     "args": {"Device Type": 1, "Device Id": 0, "Bytes": 4}},
+    {"ph": "i", "s": "g", "name": "Record Window End", "pid": 136, "tid": 136, "ts": 1000},
+    {"ph": "M", "name": "process_name", "pid": 1, "args": {"name": "python"}}
+]
+
+ATTRIBUTES = ["type", "name", "ts", "duration", "pid", "tid", "external_id", "correlation", "device",
+              "blocks_per_sm", "occupancy", "callstack", "input_shape", "input_type"]
+MEMORY_ATTRIBUTES = ["type", "name", "ts", "pid", "tid", "scope", "device_type", "device_id", "bytes"]
+
+
+class TestEventTable(unittest.TestCase):
+    def assert_rows_equal(self, rows, events):
+        self.assertEqual(len(rows), len(events))
+        for row, event in zip(rows, events):
+            attributes = MEMORY_ATTRIBUTES if event.type == trace.EventTypes.MEMORY else ATTRIBUTES
+            for attribute in attributes:
+                self.assertEqual(getattr(row, attribute), getattr(event, attribute), attribute)
+        self.assertEqual(rows[0].step, 3)
+
+    def test_build(self):
+        builder = EventTableBuilder()
+        used = [builder.append(data) for data in TRACE_EVENTS]
+        self.assertEqual(used, [True, True, True, True, True, False, False])
+
+        events = [e for e in map(trace.create_event, TRACE_EVENTS) if e is not None]
+        table = builder.build()
+        self.assertEqual(len(table), 5)
+        self.assert_rows_equal(list(table), events)
+        self.assert_rows_equal(list(EventTable.from_events(events)), events)
+
+    def test_number_columns(self):
+        builder = EventTableBuilder()
+        for ts, dur in ((100, 10), (200.0, 20.5), (300, None), (400.25, 30)):
+            builder.append({"ph": "X", "cat": "Runtime", "name": "cudaLaunchKernel", "pid": 1, "tid": 1,
+                            "ts": ts, "dur": dur})
+        table = builder.build()
+        # the ts column stays int until a non-integral value, and the values keep their python types.
+        self.assertEqual([(type(row.ts), row.ts) for row in table], [
+            (int, 100), (float, 200.0), (int, 300), (float, 400.25)])
+        self.assertEqual([(type(row.duration), row.duration) for row in table], [
+            (int, 10), (float, 20.5), (type(None), None), (int, 30)])
+
+        builder = EventTableBuilder()
+        for ts in (100, 200.0):
+            builder.append({"ph": "X", "cat": "Runtime", "name": "cudaLaunchKernel", "pid": 1, "tid": 1,
+                            "ts": ts, "dur": 1})
+        table = builder.build()
+        self.assertEqual(table.ts.dtype.kind, "i")
+        self.assertEqual([type(row.ts) for row in table], [int, float])
+
+    def test_indexes(self):
+        builder = EventTableBuilder()
+        for data in TRACE_EVENTS:
+            builder.append(data)
+        table = builder.build()
+        self.assertEqual(table.indexes(trace.EventTypes.KERNEL).tolist(), [3])
+        self.assertEqual(table.get_names(table.indexes(trace.EventTypes.OPERATOR, trace.EventTypes.RUNTIME)),
+                         ["aten::to", "cudaLaunchKernel"])
+        self.assertEqual([row.bytes for row in table.rows(table.indexes(trace.EventTypes.MEMORY))], [4])
+
+    def test_dispatch(self):
+        builder = EventTableBuilder()
+        for data in TRACE_EVENTS:
+            builder.append(data)
+        table = builder.build()
+
+        received = []
+        dispatcher = EventDispatcher()
+        dispatcher.register(lambda e: received.append(("op", e.name)), trace.EventTypes.OPERATOR,
+                            trace.EventTypes.PROFILER_STEP)
+        dispatcher.register(lambda e: received.append(("device", e.name)), trace.EventTypes.KERNEL)
+        dispatcher.register(lambda e: received.append(("all", e.name)), trace.EventTypes.OPERATOR,
+                            trace.EventTypes.KERNEL)
+        dispatcher.dispatch(table)
+        self.assertEqual(received, [
+            ("op", "ProfilerStep#3"),
+            ("op", "aten::to"), ("all", "aten::to"),
+            ("device", "void cunn_ClassNLLCriterion_updateGradInput_kernel<float>"),
+            ("all", "void cunn_ClassNLLCriterion_updateGradInput_kernel<float>")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from torch_tb_profiler import io
+from torch_tb_profiler.profiler import RunLoader, transport
+from torch_tb_profiler.io import DiskCache
+from torch_tb_profiler.profiler.pool import ParsePool
+from torch_tb_profiler.profiler.profile_cache import ProfileCache
+from torch_tb_profiler.profiler.progress import (ProgressReporter, create_progress_file, get_fraction,
+                                                 read_progress)
+from torch_tb_profiler.profiler.residency import ProfileResidency
+from torch_tb_profiler.run import PendingRunProfile, RunProfile
+
+TRACE = {
+    "schemaVersion": 1,
+    "traceEvents": [
+        {"ph": "X", "cat": "Operator", "name": "ProfilerStep#1", "pid": 1, "tid": 1, "ts": 100, "dur": 200},
+        {"ph": "X", "cat": "Operator", "name": "aten::conv2d", "pid": 1, "tid": 1, "ts": 120, "dur": 50},
+        {"ph": "X", "cat": "Operator", "name": "aten::add", "pid": 1, "tid": 1, "ts": 200, "dur": 20}
+    ]
+}
+
+
+class TestRunLoader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # keep the downloads and the traces out of the user cache directory.
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.cache = io.Cache(os.path.join(cls.cache_dir, "downloads"), 64 * 1024 * 1024,
+                             os.path.join(cls.cache_dir, "traces"), 64 * 1024 * 1024)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cache.__exit__(None, None, None)
+        shutil.rmtree(cls.cache_dir)
+
+    def setUp(self):
+        self.run_dir = tempfile.mkdtemp()
+        self.profile_cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.run_dir)
+        shutil.rmtree(self.profile_cache_dir)
+
+    def write(self, name):
+        with open(os.path.join(self.run_dir, name), "w") as f:
+            json.dump(TRACE, f)
+
+    def test_incremental_load(self):
+        self.write("worker0.1.pt.trace.json")
+        loader = RunLoader("run", self.run_dir, self.cache)
+        run = loader.load()
+        self.assertEqual(list(run.profiles.keys()), [("worker0", "1")])
+        profile = run.profiles[("worker0", "1")]
+
+        # nothing changed.
+        self.assertIsNone(loader.load())
+
+        # only the new span file is parsed.
+        self.write("worker0.2.pt.trace.json")
+        run = loader.load()
+        self.assertEqual(sorted(run.profiles.keys()), [("worker0", "1"), ("worker0", "2")])
+        self.assertIs(run.profiles[("worker0", "1")], profile)
+
+        os.remove(os.path.join(self.run_dir, "worker0.2.pt.trace.json"))
+        run = loader.load()
+        self.assertEqual(list(run.profiles.keys()), [("worker0", "1")])
+
+    def test_lazy_load(self):
+        self.write("worker0.pt.trace.json")
+        self.write("worker1.pt.trace.json")
+        loader = RunLoader("run", self.run_dir, self.cache, lazy=True)
+        run = loader.load()
+        self.assertEqual(loader.state, "pending")
+        self.assertEqual(run.workers, ["worker0", "worker1"])
+        self.assertIsInstance(run.get_profile("worker0", "default"), PendingRunProfile)
+        self.assertEqual(run.get_workers("Overview"), ["worker0", "worker1"])
+
+        run = loader.materialize("worker1", "default")
+        self.assertIsInstance(run.get_profile("worker1", "default"), RunProfile)
+        self.assertIsInstance(run.get_profile("worker0", "default"), PendingRunProfile)
+        self.assertIsNone(loader.materialize("worker1", "default"))
+        self.assertIsNone(loader.load())
+
+        run = loader.materialize("All", "default")
+        self.assertIsInstance(run.get_profile("worker0", "default"), RunProfile)
+        self.assertEqual(loader.state, "loaded")
+
+    def test_residency(self):
+        self.write("worker0.pt.trace.json")
+        self.write("worker1.pt.trace.json")
+        evicted = []
+        residency = ProfileResidency(1, evicted.append)
+        loader = RunLoader("run", self.run_dir, self.cache, residency=residency)
+        run = loader.load()
+        # only the most recent profile is kept.
+        self.assertEqual(evicted, [loader])
+        self.assertEqual(len(residency._profiles), 1)
+        profiles = [run.get_profile(worker, "default") for worker in ("worker0", "worker1")]
+        self.assertEqual(sorted(type(p).__name__ for p in profiles), ["PendingRunProfile", "RunProfile"])
+        self.assertEqual(len(run.views), 3)
+
+        pending = next(p for p in profiles if isinstance(p, PendingRunProfile))
+        run = loader.materialize(pending.worker, "default")
+        self.assertIsInstance(run.get_profile(pending.worker, "default"), RunProfile)
+        self.assertEqual(len(evicted), 2)
+        self.assertEqual(loader.state, "loaded")
+
+    def test_progress(self):
+        self.write("worker0.pt.trace.json")
+        self.write("worker1.pt.trace.json")
+        loader = RunLoader("run", self.run_dir, self.cache, lazy=True)
+        loader.load()
+        progress = loader.get_progress()
+        self.assertEqual(progress["state"], "pending")
+        self.assertEqual(progress["percent"], 0)
+        self.assertEqual(progress["loaded_files"], 0)
+
+        loader.materialize("worker0", "default")
+        progress = loader.get_progress()
+        self.assertEqual(progress["percent"], 50)
+        self.assertEqual(progress["files"], 2)
+        self.assertEqual(progress["loaded_files"], 1)
+        self.assertEqual(sorted(progress["stages"].keys()), ["analyze", "decompress", "download", "generate", "parse",
+                                                                  "process"])
+
+    def test_profile_cache(self):
+        self.write("worker0.pt.trace.json")
+        profile_cache = ProfileCache(self.profile_cache_dir, 1024 * 1024)
+        loader = RunLoader("run", self.run_dir, self.cache, lazy=True, profile_cache=profile_cache)
+        loader.load()
+        loader.materialize("worker0", "default")
+        self.assertIn("parse", loader._last_progress["worker0.pt.trace.json"]["stages"])
+        entries = [name for name in os.listdir(self.profile_cache_dir) if name.endswith(DiskCache.SUFFIX)]
+        self.assertEqual(len(entries), 1)
+
+        # a new loader takes the profile from the cache without running any stage.
+        loader = RunLoader("run", self.run_dir, self.cache, lazy=True, profile_cache=profile_cache)
+        loader.load()
+        run = loader.materialize("worker0", "default")
+        self.assertIsInstance(run.get_profile("worker0", "default"), RunProfile)
+        self.assertIsNone(loader._last_progress["worker0.pt.trace.json"])
+
+    def test_exhausted_budget(self):
+        self.write("worker0.pt.trace.json")
+        loader = RunLoader("run", self.run_dir, self.cache)
+        budget = ParsePool.instance()._budget
+        memory = budget.acquire(budget.budget)
+        try:
+            thread = threading.Thread(target=loader.load)
+            thread.start()
+            # the loader is not locked while the file waits for the memory budget.
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+            self.assertEqual(loader.get_progress()["state"], "loading")
+            self.assertFalse(loader.evict("worker0", "default"))
+        finally:
+            budget.release(memory)
+        thread.join()
+        self.assertIsInstance(loader.run.get_profile("worker0", "default"), RunProfile)
+
+    def test_load_result_out_of_lock(self):
+        self.write("worker0.pt.trace.json")
+        loader = RunLoader("run", self.run_dir, self.cache)
+        loading = threading.Event()
+        resume = threading.Event()
+        load = transport.load
+
+        def wait_and_load(handle):
+            loading.set()
+            resume.wait()
+            return load(handle)
+
+        with mock.patch.object(transport, "load", wait_and_load):
+            thread = threading.Thread(target=loader.load)
+            thread.start()
+            try:
+                self.assertTrue(loading.wait(60))
+                # the loader is not locked while the result is loaded.
+                self.assertEqual(loader.get_progress()["state"], "loading")
+            finally:
+                resume.set()
+            thread.join()
+        self.assertIsInstance(loader.run.get_profile("worker0", "default"), RunProfile)
+
+    def test_progress_reporter(self):
+        path = create_progress_file()
+        try:
+            reporter = ProgressReporter(path, 100)
+            with reporter.run_stage("download"):
+                pass
+            with reporter.run_stage("parse"):
+                reporter.update(bytes_read=50, events=10)
+                reporter._report(force=True)
+                progress = read_progress(path)
+                self.assertEqual(progress["stage"], "parse")
+                self.assertEqual(progress["events"], 10)
+                # the decompress stage advances with the parse stage.
+                self.assertAlmostEqual(get_fraction(progress), 0.35)
+            self.assertAlmostEqual(get_fraction(read_progress(path)), 0.6)
+
+            # the decompression measured within the parse stage is not counted in it.
+            with reporter.run_stage("parse"):
+                time.sleep(0.2)
+                reporter.add_stage("decompress", 0.15, 200)
+            progress = read_progress(path)
+            self.assertEqual(progress["stage_bytes"]["decompress"], 200)
+            self.assertEqual(progress["stages"]["decompress"], 0.15)
+            self.assertLess(progress["stages"]["parse"], 0.15)
+            self.assertAlmostEqual(get_fraction(progress), 0.6)
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
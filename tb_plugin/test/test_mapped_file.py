@@ -0,0 +1,50 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from torch_tb_profiler.io import MappedFile, open_mapped
+
+CONTENT = b'{"traceEvents": [{"name": "a", "ts": 1}]}\n' * 1000
+
+
+class TestMappedFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_read(self):
+        path = self.write("trace.json", CONTENT)
+        with MappedFile(path) as f:
+            self.assertEqual(len(f), len(CONTENT))
+            self.assertEqual(f.read(5), CONTENT[:5])
+            f.seek(-3, os.SEEK_END)
+            self.assertEqual(f.read(), CONTENT[-3:])
+            self.assertEqual(f.read(), b"")
+            self.assertEqual(f.data.rfind(b"]"), CONTENT.rfind(b"]"))
+            self.assertEqual(bytes(f.view[10:20]), CONTENT[10:20])
+
+        with MappedFile(self.write("empty.json", b"")) as f:
+            self.assertEqual(f.read(), b"")
+
+    def test_open_mapped(self):
+        with open_mapped(self.write("trace.json", CONTENT)) as f:
+            self.assertEqual(f.read(), CONTENT)
+        with open_mapped(self.write("trace.json.gz", gzip.compress(CONTENT)), True) as f:
+            self.assertEqual(f.read(), CONTENT)
+            # the decompression is reported by the gzip reader.
+            self.assertEqual(f.decompressed_bytes, len(CONTENT))
+            self.assertGreaterEqual(f.decompress_seconds, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+import unittest
+
+from torch_tb_profiler.profiler import transport
+from torch_tb_profiler.profiler.pool import MemoryBudget, ParsePool
+
+
+def square(x):
+    return x * x
+
+
+class TestPool(unittest.TestCase):
+    def test_memory_budget(self):
+        budget = MemoryBudget(100)
+        self.assertEqual(budget.acquire(60), 60)
+        # a task larger than the budget is capped.
+        acquired = []
+        t = threading.Thread(target=lambda: acquired.append(budget.acquire(1000)))
+        t.start()
+        time.sleep(0.1)
+        self.assertEqual(acquired, [])
+        budget.release(60)
+        t.join(5)
+        self.assertEqual(acquired, [100])
+        self.assertEqual(budget.used, 100)
+        budget.release(100)
+        self.assertEqual(budget.used, 0)
+
+    def test_submit(self):
+        pool = ParsePool(2, 100)
+        try:
+            futures = [pool.submit(square, i, memory=60) for i in range(5)]
+            self.assertEqual([f.result() for f in futures], [i * i for i in range(5)])
+        finally:
+            pool.shutdown()
+
+    def test_submit_background(self):
+        pool = ParsePool(1, 100)
+        try:
+            memory = pool._budget.acquire(100)
+            # the caller is not blocked while the task waits for the budget.
+            future = pool.submit_background(square, 3, memory=60)
+            self.assertFalse(future.done())
+            pool._budget.release(memory)
+            self.assertEqual(future.result(60), 9)
+        finally:
+            pool.shutdown()
+
+    def test_estimate_memory(self):
+        self.assertGreater(ParsePool.estimate_memory("a.json.gz", 10), ParsePool.estimate_memory("a.json", 10))
+        self.assertGreater(ParsePool.estimate_memory("a.json", 10), ParsePool.estimate_memory("a.json", 10, True))
+        self.assertGreater(ParsePool.estimate_memory("a.json", 10, True), 0)
+
+    def test_transport(self):
+        obj = ({"a": [1, 2]}, None)
+        handle = transport.dump(obj)
+        self.assertIsNotNone(handle.path)
+        self.assertEqual(transport.load(handle), obj)
+        self.assertFalse(os.path.exists(handle.path))
+        self.assertEqual(transport.load(transport.ResultHandle(None, obj)), obj)
+
+
+if __name__ == '__main__':
+    unittest.main()
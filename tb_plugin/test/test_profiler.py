@@ -1,10 +1,13 @@
 import json
 import gzip
+import os
+import tempfile
 import unittest
 
 import torch_tb_profiler.profiler.trace as trace
 from torch_tb_profiler.profiler.data import RunProfileData
 from torch_tb_profiler.profiler.overall_parser import ProfileRole
+from torch_tb_profiler.profiler.trace_stream import write_trace_with_counters
 from torch_tb_profiler.run import RunProfile
 
 SCHEMA_VERSION = 1
@@ -1205,9 +1208,11 @@ class TestProfiler(unittest.TestCase):
               (1621401187236390, 1621401187236391, 0.125), (1621401187236501, 1621401187236502, 0.125)]]
 
         trace_json_flat_path = "gpu_metrics_input.json"
-        with open(trace_json_flat_path, "rb") as file:
-            raw_data = file.read()
-        data_with_gpu_metrics_compressed = profile.append_gpu_metrics(raw_data)
+        with tempfile.TemporaryDirectory() as directory:
+            output_file = os.path.join(directory, "trace.json.gz")
+            write_trace_with_counters(trace_json_flat_path, False, output_file, profile.get_gpu_metrics())
+            with open(output_file, "rb") as file:
+                data_with_gpu_metrics_compressed = file.read()
         data_with_gpu_metrics_flat = gzip.decompress(
             data_with_gpu_metrics_compressed)
 
@@ -1,9 +1,13 @@
 import unittest
 import math
+import random
 
 from torch_tb_profiler.profiler.overall_parser import (
     merge_ranges, subtract_ranges_lists, intersection_ranges_lists, get_ranges_sum
 )
+from torch_tb_profiler.profiler.range_utils import (
+    IntervalSet, merge_ranges_with_value, intersection_ranges_lists_with_value
+)
 
 
 def check_ranges_equal(ranges1, ranges2):
@@ -46,5 +50,72 @@ class TestOverallParser(unittest.TestCase):
         self.assertTrue(math.isclose(dst_sum, expected_sum))
 
 
+def random_ranges(count, integer):
+    ranges = []
+    for _ in range(count):
+        if integer:
+            start = random.randint(0, 1000)
+            ranges.append((start, start + random.randint(1, 50)))
+        else:
+            start = random.uniform(0, 1000)
+            ranges.append((start, start + random.uniform(0.01, 50)))
+    return ranges
+
+
+class TestIntervalSet(unittest.TestCase):
+    def test_interval_set(self):
+        random.seed(0)
+        for integer in (True, False):
+            for count in (0, 1, 2, 10, 200):
+                ranges1 = random_ranges(count, integer)
+                ranges2 = random_ranges(count // 2 + 1, integer)
+                # the ranges touching each other are merged.
+                ranges2.append((ranges2[0][1], ranges2[0][1] + 5))
+                merged1, merged2 = merge_ranges(list(ranges1)), merge_ranges(list(ranges2))
+                set1, set2 = IntervalSet.from_ranges(ranges1), IntervalSet.from_ranges(ranges2)
+                self.assertEqual(set1.to_ranges(), merged1)
+                self.assertEqual(set2.to_ranges(), merged2)
+
+                intersection = set1.intersection(set2)
+                self.assertEqual(intersection.to_ranges(), intersection_ranges_lists(merged1, merged2))
+                self.assertEqual(intersection.sum(), get_ranges_sum(intersection_ranges_lists(merged1, merged2)))
+                self.assertEqual(set1.subtract(set2).to_ranges(), subtract_ranges_lists(merged1, merged2))
+                self.assertEqual(set2.subtract(set1).to_ranges(), subtract_ranges_lists(merged2, merged1))
+                for step in ((100, 300), (0, 2000), (2000, 3000)):
+                    self.assertEqual(set1.clip(*step).to_ranges(), intersection_ranges_lists([step], merged1))
+                    self.assertEqual(set1.clip(*step).sum(), get_ranges_sum(intersection_ranges_lists([step], merged1)))
+                if integer and count:
+                    self.assertIsInstance(set1.sum(), int)
+
+    def test_clip_with_float_bounds(self):
+        ranges = [(0, 10), (20, 30)]
+        interval_set = IntervalSet.from_ranges(ranges)
+        for step in ((5.5, 25.5), (5.5, 30), (0, 25.5), (-1.5, 40.5)):
+            clipped = interval_set.clip(*step)
+            self.assertEqual(clipped.to_ranges(), intersection_ranges_lists([step], ranges))
+            self.assertEqual(clipped.sum(), get_ranges_sum(intersection_ranges_lists([step], ranges)))
+            self.assertEqual(interval_set.intersection(IntervalSet.from_ranges([step, (40, 50)])).to_ranges(),
+                             intersection_ranges_lists(ranges, [step, (40, 50)]))
+        self.assertEqual(interval_set.clip(5.5, 25.5).to_ranges(), [(5.5, 10), (20, 25.5)])
+
+    def test_interval_set_with_value(self):
+        random.seed(0)
+        for integer in (True, False):
+            for count in (0, 1, 10, 200):
+                ranges = [r + (random.choice([0.25, 0.5, 1.0, 2.0]),) for r in random_ranges(count, integer)]
+                merged = merge_ranges_with_value(ranges)
+                interval_set = IntervalSet.from_ranges_with_value(ranges)
+                self.assertEqual(interval_set.to_ranges(), merged)
+
+                step = (100, 300)
+                clipped = interval_set.clip(*step)
+                expected = intersection_ranges_lists_with_value(merged, [step])
+                self.assertEqual(clipped.to_ranges(), expected)
+                weighted_sum = 0.0
+                for r in expected:
+                    weighted_sum += r[2] * (r[1] - r[0])
+                self.assertEqual(clipped.weighted_sum(), weighted_sum)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,109 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from werkzeug.exceptions import BadRequest
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+from torch_tb_profiler.plugin import TorchProfilerPlugin
+
+
+def create_request(headers=None, query_string=None):
+    return Request(EnvironBuilder(headers=headers, query_string=query_string).get_environ())
+
+
+def read_body(response):
+    # the streamed responses are passed through to the server as is.
+    try:
+        return b"".join(response.response)
+    finally:
+        response.close()
+
+
+class TestResponses(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_file_response(self):
+        content = json.dumps({"traceEvents": [{"name": str(i)} for i in range(20000)]}).encode("utf-8")
+        path = self.write("worker0.pt.trace.json", content)
+
+        response = TorchProfilerPlugin._respond_file(create_request({"Range": "bytes=10-19"}), open(path, "rb"))
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(read_body(response), content[10:20])
+
+        # the download of the gzipped file is resumed from the ranges of the compressed bytes.
+        compressed = gzip.compress(content)
+        path = self.write("worker0.pt.trace.json.gz", compressed)
+        response = TorchProfilerPlugin._respond_file(create_request(), open(path, "rb"), gzipped=True)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.headers["Accept-Ranges"], "bytes")
+        self.assertEqual(read_body(response), compressed)
+        etag = response.headers["ETag"]
+        response = TorchProfilerPlugin._respond_file(
+            create_request({"Range": "bytes=100-", "If-Range": etag}), open(path, "rb"), gzipped=True)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(read_body(response), compressed[100:])
+
+    def test_encoded_json(self):
+        data = {"data": [{"name": "aten::add", "calls": 10}]}
+        content = json.dumps(data).encode("utf-8")
+
+        # the default response is the same as before.
+        response = TorchProfilerPlugin.respond_as_json(data)
+        self.assertEqual(response.get_data(), content)
+        response = TorchProfilerPlugin.respond_as_json(data, create_request())
+        self.assertEqual(response.get_data(), content)
+        self.assertIsNone(response.headers.get("Content-Encoding"))
+        etag = response.headers["ETag"]
+
+        response = TorchProfilerPlugin.respond_as_json(data, create_request({"Accept-Encoding": "gzip, deflate"}))
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.get_data()), content)
+        gzip_etag = response.headers["ETag"]
+        self.assertNotEqual(gzip_etag, etag)
+
+        response = TorchProfilerPlugin.respond_as_json(data, create_request({"If-None-Match": etag}))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b"")
+        response = TorchProfilerPlugin.respond_as_json(
+            data, create_request({"Accept-Encoding": "gzip", "If-None-Match": gzip_etag}))
+        self.assertEqual(response.status_code, 304)
+
+        # the changed content has another etag.
+        data["data"][0]["calls"] = 11
+        response = TorchProfilerPlugin.respond_as_json(data, create_request({"If-None-Match": etag}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(), json.dumps(data).encode("utf-8"))
+
+    def test_trace_range(self):
+        get_trace_range = TorchProfilerPlugin._get_trace_range
+        self.assertIsNone(get_trace_range(create_request()))
+        self.assertIsNone(get_trace_range(create_request(query_string="pids=1")))
+        self.assertEqual(get_trace_range(create_request(query_string="start_step=3")),
+                         (3, 3, float("-inf"), float("inf")))
+        self.assertEqual(get_trace_range(create_request(query_string="start_step=3&end_step=5"))[:2], (3, 5))
+        self.assertEqual(get_trace_range(create_request(query_string="begin_ts=10.5"))[2:], (10.5, float("inf")))
+
+        for query_string in ("start_step=abc", "start_step=1&end_step=x", "end_ts=x", "begin_ts=nan",
+                             "end_step=3", "start_step=5&end_step=3", "begin_ts=20&end_ts=10",
+                             "start_step=1&end_ts=100"):
+            with self.assertRaises(BadRequest, msg=query_string):
+                get_trace_range(create_request(query_string=query_string))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+from torch_tb_profiler.table_index import TableIndex
+
+OPERATION_TABLE = [
+    {"name": "aten::add", "input_shape": "[[2, 3], [2, 3]]", "calls": 10, "host_self_duration": 30},
+    {"name": "aten::mul", "input_shape": "[[4]]", "calls": 5, "host_self_duration": 50},
+    {"name": "aten::Conv2d", "input_shape": "[[2, 3]]", "calls": 10, "host_self_duration": 20},
+    {"name": "aten::addmm", "input_shape": "[]", "calls": 1, "host_self_duration": 40},
+]
+
+KERNEL_TABLE = {"data": {
+    "columns": [{"type": "string", "name": "Name"}, {"type": "number", "name": "Calls"},
+                {"type": "number", "name": "Total Duration (us)"}],
+    "rows": [["volta_sgemm", 3, 300], ["elementwise_kernel", 5, 100], ["reduce_kernel", 4, 200]]}}
+
+
+class TestTableIndex(unittest.TestCase):
+    def test_operation_table(self):
+        index = TableIndex(OPERATION_TABLE)
+        # the rows are in the order of the table by default.
+        self.assertEqual(index.get_page(), (4, OPERATION_TABLE))
+        self.assertEqual(index.get_page(offset=1, limit=2), (4, OPERATION_TABLE[1:3]))
+        self.assertEqual(index.get_page(offset=10), (4, []))
+
+        total, rows = index.get_page(sort_by="host_self_duration", limit=2)
+        self.assertEqual((total, [row["name"] for row in rows]), (4, ["aten::mul", "aten::addmm"]))
+        total, rows = index.get_page(sort_by="name", order="asc")
+        self.assertEqual([row["name"] for row in rows], ["aten::add", "aten::addmm", "aten::Conv2d", "aten::mul"])
+        # the ties are kept in the order of the table.
+        total, rows = index.get_page(sort_by="calls", order="asc")
+        self.assertEqual([row["name"] for row in rows], ["aten::addmm", "aten::mul", "aten::add", "aten::Conv2d"])
+        total, rows = index.get_page(sort_by="calls")
+        self.assertEqual([row["name"] for row in rows], ["aten::add", "aten::Conv2d", "aten::mul", "aten::addmm"])
+
+        # the search of the text cells is case insensitive, and applied before the page.
+        total, rows = index.get_page(search="ADD", sort_by="host_self_duration", limit=1)
+        self.assertEqual((total, [row["name"] for row in rows]), (2, ["aten::addmm"]))
+        total, rows = index.get_page(search="[2, 3]")
+        self.assertEqual((total, [row["name"] for row in rows]), (2, ["aten::add", "aten::Conv2d"]))
+        total, rows = index.get_page(search=r"^aten::(mul|conv)", regex=True)
+        self.assertEqual([row["name"] for row in rows], ["aten::mul", "aten::Conv2d"])
+        # the numbers are not searched.
+        self.assertEqual(index.get_page(search="10")[0], 0)
+
+        for kwargs in ({"sort_by": "unknown"}, {"order": "up"}, {"search": "(", "regex": True}):
+            with self.assertRaises(ValueError):
+                index.get_page(**kwargs)
+
+    def test_kernel_table(self):
+        index = TableIndex(KERNEL_TABLE)
+        total, rows = index.get_page(sort_by="Total Duration (us)", order="asc", limit=2)
+        self.assertEqual((total, rows), (3, [["elementwise_kernel", 5, 100], ["reduce_kernel", 4, 200]]))
+        total, rows = index.get_page(search="kernel", sort_by="Calls")
+        self.assertEqual((total, [row[0] for row in rows]), (2, ["elementwise_kernel", "reduce_kernel"]))
+
+        self.assertEqual(TableIndex([]).get_page(search="a"), (0, []))
+
+    def test_mixed_column(self):
+        table = [{"name": "a", "value": "10"}, {"name": "b", "value": 9}, {"name": "c", "value": "N/A"},
+                 {"name": "d", "value": "9"}, {"name": "e", "value": 100.5}]
+        index = TableIndex(table)
+        # the numeric text is sorted by value, before the other text.
+        total, rows = index.get_page(sort_by="value", order="asc")
+        self.assertEqual([row["name"] for row in rows], ["b", "d", "a", "e", "c"])
+        total, rows = index.get_page(sort_by="value")
+        self.assertEqual([row["name"] for row in rows], ["c", "e", "a", "b", "d"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -62,11 +62,19 @@ class TestEnd2End(unittest.TestCase):
         host='localhost'
         port=7007
 
+        # keep the downloads, the traces and the profiles of the samples out of the user cache directory.
+        cache_dir = tempfile.mkdtemp(prefix="tensorboard_cache")
+        env_copy = os.environ.copy()
+        env_copy.update({
+            'TORCH_PROFILER_DOWNLOAD_CACHE_DIR': os.path.join(cache_dir, 'downloads'),
+            'TORCH_PROFILER_TRACE_CACHE_DIR': os.path.join(cache_dir, 'traces'),
+            'TORCH_PROFILER_PROFILE_CACHE_DIR': os.path.join(cache_dir, 'profiles')
+        })
+        if env:
+            env_copy.update(env)
+        env = env_copy
+
         try:
-            if env:
-                env_copy = os.environ.copy()
-                env_copy.update(env)
-                env = env_copy
             if not path_prefix:
                 tb = Popen(['tensorboard', '--logdir='+test_folder, '--port='+str(port)], env=env)
             else:
@@ -76,6 +84,8 @@ class TestEnd2End(unittest.TestCase):
             pid = tb.pid
             print("tensorboard process {} is terminating.".format(pid))
             tb.terminate()
+            tb.wait()
+            shutil.rmtree(cache_dir, ignore_errors=True)
 
     def _test_tensorboard(self, host, port, expected_runs, path_prefix):
         if not path_prefix:
@@ -0,0 +1,89 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from torch_tb_profiler.profiler.trace_slice import TraceIndex, write_trace_index
+
+TRACE_EVENTS = [
+    {"name": "process_name", "ph": "M", "pid": 1, "ts": 0, "args": {"name": "python é中"}},
+    {"ph": "X", "cat": "cpu_op", "name": "ProfilerStep#1", "pid": 1, "tid": 1, "ts": 100, "dur": 100},
+    {"ph": "X", "cat": "cpu_op", "name": "aten::add", "pid": 1, "tid": 1, "ts": 110, "dur": 20},
+    {"ph": "X", "cat": "cpu_op", "name": "ProfilerStep#2", "pid": 1, "tid": 1, "ts": 200, "dur": 100},
+    {"ph": "X", "cat": "cpu_op", "name": "aten::mul", "pid": 1, "tid": 1, "ts": 210, "dur": 20},
+    {"ph": "C", "name": "counter", "pid": 1, "ts": 250, "args": {"value": 1}},
+    {"ph": "X", "cat": "kernel", "name": "kernel_1", "pid": 0, "tid": 7, "ts": 190, "dur": 20},
+    {"ph": "X", "cat": "kernel", "name": "kernel_2", "pid": 0, "tid": 7, "ts": 320, "dur": 10},
+    {"ph": "i", "s": "t", "name": "[memory]", "pid": 1, "tid": 1, "ts": 330, "args": {"Bytes": 4}},
+]
+COUNTERS = b', {"ph":"C", "name":"GPU 0 Utilization", "pid":0, "ts":150, "args":{"GPU Utilization":1}}, ' \
+           b'{"ph":"C", "name":"GPU 0 Utilization", "pid":0, "ts":250, "args":{"GPU Utilization":0.5}}'
+
+
+class TestTraceSlice(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_slice(self, index, begin, end, counters=None):
+        output_file = os.path.join(self.directory, "slice.json.gz")
+        index.write_slice(begin, end, output_file, counters)
+        with gzip.open(output_file, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def check_index(self, content, compressed, segment_size):
+        trace_file = os.path.join(self.directory, "worker0.pt.trace.json" + (".gz" if compressed else ""))
+        with (gzip.open if compressed else open)(trace_file, "wb") as f:
+            f.write(content.encode("utf-8"))
+        index_file = os.path.join(self.directory, "index")
+        write_trace_index(trace_file, compressed, index_file, segment_size)
+
+        with open(index_file, "rb") as f:
+            index = TraceIndex(f)
+            self.assertEqual(index.get_step_range(1, 1), (100, 200))
+            self.assertEqual(index.get_step_range(2, 2)[0], 200)
+            self.assertGreater(index.get_step_range(1, 2)[1], 330)
+            with self.assertRaises(ValueError):
+                index.get_step_range(3, 3)
+
+            # the events overlapping the step, with the metadata events.
+            trace = self.read_slice(index, *index.get_step_range(1, 1))
+            self.assertEqual(trace["schemaVersion"], 1)
+            self.assertEqual([e["name"] for e in trace["traceEvents"]],
+                             ["process_name", "ProfilerStep#1", "aten::add", "kernel_1"])
+            self.assertEqual(trace["traceEvents"][0], TRACE_EVENTS[0])
+
+            trace = self.read_slice(index, 240, 330, COUNTERS)
+            self.assertEqual([e["name"] for e in trace["traceEvents"]],
+                             ["process_name", "ProfilerStep#2", "counter", "kernel_2", "GPU 0 Utilization"])
+            self.assertEqual(trace["traceEvents"][-1]["ts"], 250)
+
+            trace = self.read_slice(index, float("-inf"), float("inf"))
+            self.assertEqual(trace["traceEvents"], TRACE_EVENTS)
+
+    def test_slice(self):
+        trace = {"schemaVersion": 1, "traceEvents": TRACE_EVENTS, "deviceProperties": []}
+        for compressed in (False, True):
+            for segment_size in (64, 1024 * 1024):
+                self.check_index(json.dumps(trace, ensure_ascii=False, indent=1), compressed, segment_size)
+
+    def test_invalid_value(self):
+        # the N/A values are replaced in the slices too.
+        content = json.dumps({"schemaVersion": 1, "traceEvents": TRACE_EVENTS}, ensure_ascii=False)
+        content = content.replace('"name": "aten::add"', '"name": "aten::add", "value": N/A')
+        trace_file = os.path.join(self.directory, "worker0.pt.trace.json")
+        with open(trace_file, "w", encoding="utf-8") as f:
+            f.write(content)
+        index_file = os.path.join(self.directory, "index")
+        write_trace_index(trace_file, False, index_file, 64)
+        with open(index_file, "rb") as f:
+            trace = self.read_slice(TraceIndex(f), 100, 200)
+        self.assertEqual(trace["traceEvents"][2]["value"], "N/A")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+import zlib
+from json.decoder import JSONDecodeError
+
+from torch_tb_profiler.profiler.trace_stream import (TraceProjection,
+                                                     TraceStream,
+                                                     write_patched_trace,
+                                                     write_projected_trace,
+                                                     write_trace_with_counters)
+
+TRACE_EVENTS = [
+    {"ph": "X", "cat": "Operator", "name": "aten::to", "pid": 13721, "tid": "123",
+     "ts": 200, "dur": 60, "args": {"Input Dims": [[2, 8, 5], [], []], "External id": 3}},
+    {"ph": "X", "cat": "Kernel", "name": "void cunn_ClassNLLCriterion_updateGradInput_kernel<float>",
+     "pid": 0, "tid": "stream 7", "ts": 430.5, "dur": 15,
+     "args": {"correlation": 334, "external id": 4, "est. achieved occupancy %": 12.5}},
+    {"ph": "i", "s": "t", "name": "[memory]", "pid": 136, "tid": 136, "ts": 1.5e3,
+     "args": {"Device Type": 0, "Device Id": -1, "Bytes": 4}},
+    {"name": "non-ascii é中", "ph": "M", "pid": 1, "args": {"labels": [True, False, None]}}
+]
+
+
+def parse_stream(content, chunk_size):
+    stream = TraceStream(io.StringIO(content), chunk_size)
+    events = list(stream.events())
+    return events, stream.metadata
+
+
+class TestTraceStream(unittest.TestCase):
+    def test_object_format(self):
+        trace_json = {"schemaVersion": 1,
+                      "deviceProperties": [{"id": 0, "name": "Tesla V100-DGXS-32GB", "computeMajor": 7}],
+                      "traceEvents": TRACE_EVENTS,
+                      "distributedInfo": {"rank": 0, "world_size": 2}}
+        expected_metadata = {k: v for k, v in trace_json.items() if k != "traceEvents"}
+        for indent in (None, 2):
+            content = json.dumps(trace_json, indent=indent)
+            # Small chunk sizes force tokens to be split across the windows.
+            for chunk_size in (1, 2, 3, 7, 64, 1024 * 1024):
+                events, metadata = parse_stream(content, chunk_size)
+                self.assertEqual(events, TRACE_EVENTS)
+                self.assertEqual(metadata, expected_metadata)
+
+    def test_array_format(self):
+        content = json.dumps(TRACE_EVENTS)
+        for chunk_size in (1, 5, 1024):
+            events, metadata = parse_stream(content, chunk_size)
+            self.assertEqual(events, TRACE_EVENTS)
+            self.assertEqual(metadata, {})
+
+    def test_empty_trace(self):
+        events, metadata = parse_stream('{"schemaVersion": 1, "traceEvents": [ ]}', 3)
+        self.assertEqual(events, [])
+        self.assertEqual(metadata, {"schemaVersion": 1})
+
+    def test_invalid_trace(self):
+        content = '{"traceEvents": [{"name": "a", "ts": 1}, {"name": "b", "ts": N/B}]}'
+        with self.assertRaises(JSONDecodeError):
+            parse_stream(content, 4)
+
+        with self.assertRaises(JSONDecodeError):
+            parse_stream('{"traceEvents": [{"name": "a", "ts": 1}', 4)
+
+    def test_invalid_event_in_middle(self):
+        events = [{"name": str(i), "ts": i} for i in range(10000)]
+        content = json.dumps({"traceEvents": events}).replace('"ts": 100}', '"ts": 1 00}')
+        for chunk_size in (1, 64, 4096):
+            fileobj = io.StringIO(content)
+            stream = TraceStream(fileobj, chunk_size)
+            with self.assertRaises(JSONDecodeError):
+                list(stream.events())
+            # the error is raised without reading the rest of the trace.
+            self.assertLess(fileobj.tell(), content.index("1 00") + 2 * chunk_size + 16)
+
+    def test_patch(self):
+        content = '{"traceEvents": [\n{"name": "a", "ts": N/A, "args": {"x": "N/A"}},\n' \
+                  '{"name": "Record Window End", "ts": N/A},\n{"name": "c", "ts": 3}\n],\n"x": N/A}'
+        expected_events = [{"name": "a", "ts": "N/A", "args": {"x": "N/A"}},
+                           {"name": "Record Window End", "ts": "N/A"},
+                           {"name": "c", "ts": 3}]
+        for remove_index in range(3):
+            for chunk_size in (1, 4, 1024):
+                stream = TraceStream(io.StringIO(content), chunk_size)
+                events = []
+                for event in stream.events():
+                    events.append(event)
+                    if len(events) == remove_index + 1:
+                        span = stream.event_span
+                self.assertEqual(events, expected_events)
+                self.assertEqual(stream.metadata, {"x": "N/A"})
+
+                patches = stream.get_patches() + [stream.get_removal(span)]
+                with tempfile.TemporaryDirectory() as directory:
+                    trace_file = os.path.join(directory, "trace.json")
+                    with open(trace_file, "w", newline="") as f:
+                        f.write(content)
+                    output_file = os.path.join(directory, "trace.json.gz")
+                    write_patched_trace(trace_file, False, output_file, patches, chunk_size)
+                    with gzip.open(output_file, "rt") as f:
+                        patched = json.load(f)
+
+                self.assertEqual(patched["traceEvents"],
+                                 expected_events[:remove_index] + expected_events[remove_index + 1:])
+                self.assertEqual(patched["x"], "N/A")
+
+    def test_patch_many_values(self):
+        events = [{"name": 'x: N/A, "N/A" \\N/A', "ts": i, "args": {"External id": "XX", "Sequence number": "XX"}}
+                  for i in range(2000)]
+        content = json.dumps({"traceEvents": events, "x": "XX"}, ensure_ascii=False).replace('"XX"', 'N/A')
+        expected_events = json.loads(json.dumps(events).replace('"XX"', '"N/A"'))
+        for chunk_size in (3, 7, 4096, 1024 * 1024):
+            stream = TraceStream(io.StringIO(content), chunk_size)
+            self.assertEqual(list(stream.events()), expected_events)
+            self.assertEqual(stream.metadata, {"x": "N/A"})
+            patches = stream.get_patches()
+            self.assertEqual(len(patches), 2 * len(events) + 1)
+            self.assertTrue(all(content[start:end] == "N/A" for start, end, _ in patches))
+
+    def test_counters(self):
+        content = b'{"traceEvents": [\n{"name": "a", "args": {"x": [1]}},\n{"name": "b"}\n],\n"x": [2]\n}\n'
+        counters = b', {"ph": "C", "name": "GPU 0 Utilization", "ts": 1, "args": {"GPU Utilization": 1}}'
+        for compressed in (False, True):
+            for chunk_size in (1, 4, 1024):
+                with tempfile.TemporaryDirectory() as directory:
+                    trace_file = os.path.join(directory, "trace.json")
+                    with open(trace_file, "wb") as f:
+                        f.write(gzip.compress(content) if compressed else content)
+                    output_file = os.path.join(directory, "trace.json.gz")
+                    write_trace_with_counters(trace_file, compressed, output_file, counters, chunk_size)
+                    with open(output_file, "rb") as f:
+                        data = f.read()
+
+                # the trace up to its last ']' with the counters, in a single gzip member.
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                self.assertEqual(decompressor.decompress(data), content[:content.rfind(b"]")] + counters + b"]}")
+                self.assertTrue(decompressor.eof)
+                self.assertEqual(decompressor.unused_data, b"")
+
+    def test_projection(self):
+        trace_json = {"schemaVersion": 1, "traceEvents": TRACE_EVENTS + [
+            {"ph": "X", "cat": "python_function", "name": "f", "pid": 13721, "tid": "123", "ts": 210, "dur": 1},
+            {"ph": "M", "name": "thread_name", "pid": 13721, "tid": "456", "args": {"name": "worker"}}]}
+        content = json.dumps(trace_json, ensure_ascii=False, indent=1).replace('"External id": 3', '"External id": N/A')
+        projection = TraceProjection(pids=[13721, 1], tids=["123"], exclude_cats=["python_function"],
+                                     strip_args=["Input Dims"])
+        self.assertEqual(projection.key, TraceProjection([1, "13721"], [123], ["python_function"], ["Input Dims"]).key)
+        self.assertFalse(TraceProjection())
+        for chunk_size in (1, 1024):
+            with tempfile.TemporaryDirectory() as directory:
+                trace_file = os.path.join(directory, "trace.json.gz")
+                with gzip.open(trace_file, "wt", encoding="utf-8") as f:
+                    f.write(content)
+                output_file = os.path.join(directory, "projection.json.gz")
+                write_projected_trace(trace_file, True, output_file, projection, chunk_size)
+                with gzip.open(output_file, "rt", encoding="utf-8") as f:
+                    trace = json.load(f)
+
+            self.assertEqual(trace["schemaVersion"], 1)
+            self.assertEqual(trace["traceEvents"], [
+                {"ph": "X", "cat": "Operator", "name": "aten::to", "pid": 13721, "tid": "123",
+                 "ts": 200, "dur": 60, "args": {"External id": "N/A"}},
+                TRACE_EVENTS[3]])
+
+
+if __name__ == '__main__':
+    unittest.main()
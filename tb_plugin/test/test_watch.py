@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from torch_tb_profiler import io
+
+
+class TestLogdirWatcher(unittest.TestCase):
+    def setUp(self):
+        self.logdir = tempfile.mkdtemp()
+        self.target = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.logdir)
+        shutil.rmtree(self.target)
+
+    def write(self, path, content="[]"):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def check_watcher(self, use_inotify):
+        watcher = io.LogdirWatcher(self.logdir, use_inotify)
+        run1 = os.path.join(self.logdir, "run1")
+        self.write(os.path.join(run1, "worker0.pt.trace.json"))
+        self.write(os.path.join(run1, "events.out"))
+        self.assertEqual(watcher.refresh(), {run1})
+        self.assertEqual(watcher.run_dirs, [run1])
+        self.assertEqual(watcher.refresh(), set())
+
+        # the new directories, a changed trace file and a symlinked subtree.
+        run2 = os.path.join(self.logdir, "run2", "a")
+        self.write(os.path.join(run2, "worker0.pt.trace.json"))
+        self.write(os.path.join(run1, "worker0.pt.trace.json"), "[ ]")
+        self.write(os.path.join(self.target, "worker0.pt.trace.json"))
+        link = os.path.join(self.logdir, "link")
+        os.symlink(self.target, link)
+        # a symlink loop is not followed forever.
+        os.symlink(self.logdir, os.path.join(self.target, "loop"))
+        self.assertEqual(watcher.refresh(), {run1, run2, link})
+        self.assertEqual(watcher.run_dirs, [link, run1, run2])
+        self.assertEqual(watcher.refresh(), set())
+
+        self.write(os.path.join(self.target, "worker1.pt.trace.json"))
+        shutil.rmtree(os.path.join(self.logdir, "run2"))
+        self.assertEqual(watcher.refresh(), {link, run2})
+        self.assertEqual(watcher.run_dirs, [link, run1])
+        watcher.close()
+
+    def test_inotify(self):
+        self.check_watcher(True)
+
+    def test_scan(self):
+        self.check_watcher(False)
+
+
+if __name__ == '__main__':
+    unittest.main()
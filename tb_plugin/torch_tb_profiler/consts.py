@@ -13,7 +13,12 @@ WORKER_PATTERN = re.compile(r"""^(.*?) # worker name
 
 NODE_PROCESS_PATTERN = re.compile(r"""^(.*)_(\d+)""")
 MONITOR_RUN_REFRESH_INTERNAL_IN_SECONDS = 10
+MAX_LOADING_RUNS = 4
 MAX_GPU_PER_NODE = 64
+# The level of compressing the json responses, which are compressed once and cached with their profiles.
+JSON_COMPRESS_LEVEL = 6
+# The trace files are streamed to the responses in the chunks of this size.
+TRACE_RESPONSE_CHUNK_SIZE = 64 * 1024
 
 View = namedtuple("View", "id, name, display_name")
 OVERALL_VIEW = View(1, "overall", "Overview")
@@ -57,3 +62,6 @@ TOOLTIP_BLOCKS_PER_SM = \
     "If this number is less than 1, it indicates the GPU multiprocessors are not fully utilized.\n" \
     "\"Mean Blocks per SM\" is the weighted average of all calls of this kernel, " \
     "using each call's execution duration as weight."
+
+# The query arguments of a page of the operator and kernel tables.
+TABLE_PAGE_ARGS = ("offset", "limit", "sort_by", "order", "search", "regex")
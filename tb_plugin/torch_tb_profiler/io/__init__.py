@@ -1,4 +1,10 @@
 from .cache import Cache
+from .disk_cache import DiskCache
+from .download import DownloadManager
 from .file import (BaseFileSystem, StatData, abspath, basename, download_file,
-                   exists, get_filesystem, glob, isdir, join, listdir,
-                   makedirs, read, register_filesystem, relpath, walk)
+                   exists, get_filesystem, glob, is_remote, isdir, join,
+                   listdir, makedirs, read, register_filesystem, relpath,
+                   stat, walk)
+from .mapped_file import MappedFile, open_mapped
+from .snapshot import ListingSnapshot
+from .watch import LogdirWatcher
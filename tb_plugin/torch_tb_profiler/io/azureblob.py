@@ -4,10 +4,10 @@
 import os
 import tempfile
 
-from azure.storage.blob import ContainerClient
+from azure.storage.blob import BlobPrefix, ContainerClient
 
 from .. import utils
-from .base import BaseFileSystem, RemotePath, StatData
+from .base import DOWNLOAD_CHUNK_SIZE, DOWNLOAD_CONCURRENCY, BaseFileSystem, ClientCache, RemotePath, StatData
 from .utils import as_bytes, as_text, parse_blob_url
 
 logger = utils.get_logger()
@@ -20,6 +20,7 @@ class AzureBlobSystem(RemotePath, BaseFileSystem):
         if not ContainerClient:
             raise ImportError("azure-storage-blob must be installed for Azure Blob support.")
         self.connection_string = os.environ.get("AZURE_STORAGE_CONNECTION_STRING", None)
+        self._clients = ClientCache()
 
     def exists(self, dirname):
         """Returns whether the path is a directory or not."""
@@ -66,23 +67,25 @@ class AzureBlobSystem(RemotePath, BaseFileSystem):
             file_content = as_bytes(file_content)
         client.upload_blob(path, file_content)
 
-    def download_file(self, filename):
-        fp = tempfile.NamedTemporaryFile('w+t', suffix='.%s' % self.basename(filename), delete=False)
-        fp.close()
+    def download_file(self, filename, local_file=None):
+        if local_file is None:
+            fp = tempfile.NamedTemporaryFile('w+t', suffix='.%s' % self.basename(filename), delete=False)
+            fp.close()
+            local_file = fp.name
 
-        logger.info("azure blob: starting downloading file %s as %s" % (filename, fp.name))
+        logger.info("azure blob: starting downloading file %s as %s" % (filename, local_file))
         account, container, path = self.container_and_path(filename)
         client = self.create_container_client(account, container)
         blob_client = client.get_blob_client(path)
         if not blob_client.exists():
             raise FileNotFoundError("file %s doesn't exist!" % path)
 
-        downloader = blob_client.download_blob()
-        with open(fp.name, 'wb') as downloaded_file:
-            data = downloader.readall()
-            downloaded_file.write(data)
-            logger.info("azure blob: file %s is downloaded as %s, size is %d" % (filename, fp.name, len(data)))
-            return fp.name
+        # download with the concurrent ranged requests, and write the chunks to the file as they arrive.
+        downloader = blob_client.download_blob(max_concurrency=DOWNLOAD_CONCURRENCY)
+        with open(local_file, 'wb') as downloaded_file:
+            size = downloader.readinto(downloaded_file)
+            logger.info("azure blob: file %s is downloaded as %s, size is %d" % (filename, local_file, size))
+            return local_file
 
     def glob(self, filename):
         """Returns a list of files that match the given pattern(s)."""
@@ -136,7 +139,7 @@ class AzureBlobSystem(RemotePath, BaseFileSystem):
         client = self.create_container_client(account, container)
         blob_client = client.get_blob_client(path)
         props = blob_client.get_blob_properties()
-        return StatData(props.size)
+        return StatData(props.size, props.last_modified.timestamp() if props.last_modified else None, props.etag)
 
     def walk(self, top, topdown=True, onerror=None):
         account, container, path = self.container_and_path(top)
@@ -150,6 +153,29 @@ class AzureBlobSystem(RemotePath, BaseFileSystem):
         for key, value in results.items():
             yield key, None, value
 
+    def list_files(self, dirname, recursive=True):
+        """Returns the (path, StatData) of the files under the directory, and the paths of its
+        subdirectories if not recursive."""
+        account, container, path = self.container_and_path(dirname)
+        if path and not path.endswith("/"):
+            path += "/"
+        client = self.create_container_client(account, container)
+        if recursive:
+            blobs = client.list_blobs(name_starts_with=path)
+        else:
+            blobs = client.walk_blobs(name_starts_with=path, delimiter="/")
+
+        files = []
+        subdirs = []
+        for blob in blobs:
+            url = "https://{}/{}/{}".format(account, container, blob.name.rstrip("/"))
+            if isinstance(blob, BlobPrefix):
+                subdirs.append(url)
+            else:
+                files.append((url, StatData(blob.size, blob.last_modified.timestamp() if blob.last_modified else None,
+                                            blob.etag)))
+        return files, subdirs
+
     def split_blob_path(self, blob_path):
         """ Find the first blob start with blob_path, then get the relative path starting from dirname(blob_path). Finally, split the relative path.
         return (basename(blob_path), [relative splitted paths])
@@ -183,8 +209,14 @@ class AzureBlobSystem(RemotePath, BaseFileSystem):
         return root, parts[0], parts[1]
 
     def create_container_client(self, account, container):
+        # The clients are thread safe, so one client (and its connection pool) per container is shared.
+        return self._clients.get((account, container), lambda: self._create_container_client(account, container))
+
+    def _create_container_client(self, account, container):
         if self.connection_string:
-            client = ContainerClient.from_connection_string(self.connection_string, container)
+            client = ContainerClient.from_connection_string(self.connection_string, container,
+                                                            max_chunk_get_size=DOWNLOAD_CHUNK_SIZE)
         else:
-            client = ContainerClient.from_container_url("https://{}/{}".format(account, container))
+            client = ContainerClient.from_container_url("https://{}/{}".format(account, container),
+                                                        max_chunk_get_size=DOWNLOAD_CHUNK_SIZE)
         return client
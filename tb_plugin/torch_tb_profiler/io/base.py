@@ -2,11 +2,62 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # -------------------------------------------------------------------------
 import os
+import threading
 from abc import ABC, abstractmethod
 from collections import namedtuple
 
 # Data returned from the Stat call.
-StatData = namedtuple("StatData", ["length"])
+# The mtime (in seconds since the epoch) and etag are None when the file system doesn't provide them.
+StatData = namedtuple("StatData", ["length", "mtime", "etag"])
+StatData.__new__.__defaults__ = (None, None)
+
+# The number of the concurrent ranged requests to download a file, and their size.
+DOWNLOAD_CONCURRENCY = int(os.getenv('TORCH_PROFILER_DOWNLOAD_CONCURRENCY', '8'))
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class ClientCache(object):
+    """The clients of a file system, shared by the threads of the process.
+
+    A client keeps its connection pool, so creating a client for every call opens new connections
+    each time. The clients are created again in a forked process, which must not share the
+    connections of its parent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._clients = {}
+
+    def get(self, key, factory):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._clients = {}
+            client = self._clients.get(key)
+            if client is None:
+                client = factory()
+                self._clients[key] = client
+            return client
+
+
+class ThreadLocalClient(object):
+    """A client of a file system for each thread, for the clients which are not thread safe.
+
+    The client is kept by the thread local storage, so it goes away with its thread instead of
+    piling up with the threads serving the requests. It is created again in a forked process.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._local = threading.local()
+
+    def get(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.client = self._factory()
+            local.pid = os.getpid()
+        return local.client
 
 
 class BaseFileSystem(ABC):
@@ -16,7 +67,7 @@ class BaseFileSystem(ABC):
     def append(self, filename, file_content, binary_mode=False):
         pass
 
-    def download_file(self, filename):
+    def download_file(self, filename, local_file=None):
         return filename
 
     @abstractmethod
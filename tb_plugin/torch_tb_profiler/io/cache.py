@@ -1,36 +1,57 @@
 # -------------------------------------------------------------------------
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # -------------------------------------------------------------------------
-import multiprocessing as mp
+import copy
 import os
+import shutil
+import tempfile
 
-from .. import utils
-from .file import download_file, read
+from .. import __version__, utils
+from .disk_cache import DiskCache
+from .file import download_file, is_remote, read, stat
 
 logger = utils.get_logger()
 
+DOWNLOAD_CACHE = os.getenv('TORCH_PROFILER_DOWNLOAD_CACHE', '1').upper() in ("1", "TRUE", "ON")
+DOWNLOAD_CACHE_DIR = os.getenv('TORCH_PROFILER_DOWNLOAD_CACHE_DIR',
+                               os.path.join(os.getenv('XDG_CACHE_HOME', os.path.join('~', '.cache')),
+                                            'torch_tb_profiler', 'downloads'))
+DOWNLOAD_CACHE_SIZE_MB = int(os.getenv('TORCH_PROFILER_DOWNLOAD_CACHE_SIZE_MB', '10240'))
+TRACE_CACHE = os.getenv('TORCH_PROFILER_TRACE_CACHE', '1').upper() in ("1", "TRUE", "ON")
+TRACE_CACHE_DIR = os.getenv('TORCH_PROFILER_TRACE_CACHE_DIR',
+                            os.path.join(os.getenv('XDG_CACHE_HOME', os.path.join('~', '.cache')),
+                                         'torch_tb_profiler', 'traces'))
+TRACE_CACHE_SIZE_MB = int(os.getenv('TORCH_PROFILER_TRACE_CACHE_SIZE_MB', '4096'))
+
+
 class Cache:
-    def __init__(self):
-        self._lock = mp.Lock()
-        self._manager = mp.Manager()
-        self._cache_dict = self._manager.dict()
-
-    def __getstate__(self):
-        '''The multiprocessing module can start one of three ways: spawn, fork, or forkserver. 
-        The default mode is fork in Unix and spawn on Windows and macOS.
-        Therefore, the __getstate__ and __setstate__ are used to pickle/unpickle the state in spawn mode.
-        '''
-        data = self.__dict__.copy()
-        # remove the _manager to bypass the following pickle error
-        # TypeError: cannot pickle 'weakref' object
-        if hasattr(self, '_manager'):
-            del data['_manager']
-        logger.debug("Cache.__getstate__: %s " % data)
-        return data
+    """The local copies of the remote trace files, and the temporary files created from the traces.
+
+    The downloads are kept in a DiskCache keyed by the url and the size, mtime and etag of the remote file,
+    so that they survive the restart of TensorBoard and a changed remote file is downloaded again.
+    The entries are created under a file lock, so the processes parsing the traces download a file once.
+    The gzip traces served by the trace view are kept in another DiskCache in the same way.
+    The cache has no shared state but the directories, so it is cheap to pickle to those processes.
+    """
+
+    def __init__(self, directory=DOWNLOAD_CACHE_DIR, max_size=DOWNLOAD_CACHE_SIZE_MB * 1024 * 1024,
+                 trace_directory=TRACE_CACHE_DIR, trace_max_size=TRACE_CACHE_SIZE_MB * 1024 * 1024):
+        # The temporary files are removed on close.
+        self._temp_dir = tempfile.mkdtemp(prefix='torch_tb_profiler_')
+        if DOWNLOAD_CACHE:
+            self._downloads = DiskCache(os.path.abspath(os.path.expanduser(directory)), max_size)
+        else:
+            self._downloads = DiskCache(os.path.join(self._temp_dir, 'downloads'), float('inf'))
+        if TRACE_CACHE:
+            self._traces = DiskCache(os.path.abspath(os.path.expanduser(trace_directory)), trace_max_size)
+        else:
+            self._traces = DiskCache(os.path.join(self._temp_dir, 'traces'), trace_max_size)
+        # The files downloaded by the plugin process right before passing the cache to a parsing process.
+        self._local_files = {}
 
     def __setstate__(self, state):
-        '''The default logging level in new process is warning. Only warning and error log can be written to 
-        streams. 
+        '''The default logging level in new process is warning. Only warning and error log can be written to
+        streams.
         So, we need call use_absl_handler in the new process.
         '''
         from absl import logging
@@ -42,35 +63,72 @@ class Cache:
         local_file = self.get_remote_cache(filename)
         return read(local_file)
 
-    def get_remote_cache(self, filename):
-        '''Try to get the local file in the cache. download it to local if it cannot be found in cache.'''
-        local_file = self.get_file(filename)
+    def get_remote_cache(self, filename, file_stat=None):
+        '''Try to get the local file in the cache. download it to local if it cannot be found in cache.
+        file_stat is the StatData of the remote file if it is already known, which saves a request.'''
+        # skip the cache for local files
+        if not is_remote(filename):
+            return filename
+        if filename in self._local_files:
+            return self._local_files[filename]
+
+        if file_stat is None:
+            file_stat = stat(filename)
+        key = "{}|{}|{}|{}".format(filename, file_stat.length, file_stat.mtime, file_stat.etag)
+        local_file = self._downloads.get_file(key)
         if local_file is None:
-            local_file = download_file(filename)
-            # skip the cache for local files
-            if local_file != filename:
-                self.add_file(filename, local_file)
+            with self._downloads.lock(key):
+                # downloaded by another process while waiting for the lock.
+                local_file = self._downloads.get_file(key)
+                if local_file is None:
+                    local_file = self._downloads.put_file(key, lambda path: download_file(filename, path))
+                    logger.debug("add local cache %s for file %s" % (local_file, filename))
 
         return local_file
 
-    def get_file(self, filename):
-        return self._cache_dict.get(filename)
+    def with_local_file(self, filename, local_file):
+        '''Return a copy of the cache, which returns local_file for the remote filename without checking it again.'''
+        cache = copy.copy(self)
+        cache._local_files = {filename: local_file}
+        return cache
 
-    def add_file(self, source_file, local_file):
-        with self._lock:
-            logger.debug("add local cache %s for file %s" % (local_file, source_file))
-            self._cache_dict[source_file] = local_file
+    def open_trace(self, trace_path, kind, write, file_stat=None):
+        '''Return the opened file of the artifact of the trace file, like the gzip trace served by the trace view.
+        The artifact is created by calling write with the path of a temporary file if it is not in the cache.
+        It is keyed by the kind, the plugin version and the state of the trace file, so it is created once
+        for a trace and reused after TensorBoard is restarted. file_stat is the StatData of the trace file
+        known by the loader, so that serving a remote trace doesn't request its state again.'''
+        if file_stat is None:
+            file_stat = stat(trace_path)
+        key = "{}|{}|{}|{}|{}|{}".format(kind, __version__, trace_path, file_stat.length, file_stat.mtime,
+                                         file_stat.etag)
+        path = self._traces.get_file(key)
+        if path is not None:
+            try:
+                return open(path, 'rb')
+            except OSError:
+                # evicted meanwhile
+                pass
+        with self._traces.lock(key):
+            # created by another thread or process while waiting for the lock.
+            path = self._traces.get_file(key)
+            if path is None:
+                path = self._traces.put_file(key, write)
+                logger.debug("add the %s trace %s for file %s" % (kind, path, trace_path))
+            return open(path, 'rb')
+
+    def create_temp_file(self, suffix=None):
+        '''Return the path of a new temporary file, which is removed on close.'''
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=self._temp_dir)
+        os.close(fd)
+        return path
 
     def close(self):
-        for key, value in self._cache_dict.items():
-            if key != value:
-                logger.info("remove temporary file %s" % value)
-                os.remove(value)
+        logger.info("remove temporary directory %s" % self._temp_dir)
+        shutil.rmtree(self._temp_dir, ignore_errors=True)
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
-        self._manager.__exit__(exc_type, exc_value, traceback)
-
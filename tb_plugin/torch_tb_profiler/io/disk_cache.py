@@ -0,0 +1,190 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# -------------------------------------------------------------------------
+import hashlib
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from .. import utils
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = utils.get_logger()
+
+
+class DiskCache(object):
+    """A directory of files keyed by string, which survives the restart of the process.
+
+    The entries are written to a temporary file and renamed, so that a reader in another
+    process never sees a partial entry. The modification time of an entry is updated when it is
+    read, and the least recently used entries are removed once the total size exceeds max_size.
+    The total size is counted from the entries put by this instance after a scan of the directory,
+    which is scanned again to evict the entries once the count exceeds max_size.
+    """
+    SUFFIX = ".bin"
+    TEMP_SUFFIX = ".tmp"
+    # The keys are locked by stripes, so that the number of lock files is bounded.
+    LOCK_STRIPES = 64
+    # The temporary files not modified for this long are left by a crashed process, and removed by evict.
+    STALE_TEMP_SECONDS = 3600
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        # The total size of the entries, or None until the directory is scanned.
+        self._size = None
+
+    def path(self, key):
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + self.SUFFIX)
+
+    def get(self, key):
+        """Return the content stored for the key, or None if there is not."""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        try:
+            # mark as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def get_file(self, key):
+        """Return the path of the entry of the key, or None if there is not."""
+        path = self.path(key)
+        try:
+            # mark as recently used
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put_file(self, key, write):
+        """Create the entry of the key by calling write with the path of a temporary file,
+        and return the path of the entry."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=self.TEMP_SUFFIX)
+        os.close(fd)
+        path = self.path(key)
+        try:
+            write(temp_path)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            _remove_temp_file(temp_path)
+
+        self._add_size(size, keep=path)
+        return path
+
+    @contextmanager
+    def lock(self, key):
+        """Lock the key among the processes, e.g. to create its entry only once."""
+        if fcntl is None:
+            yield
+            return
+
+        stripe = int(hashlib.sha256(key.encode("utf-8")).hexdigest()[:8], 16) % self.LOCK_STRIPES
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "%d.lock" % stripe), "wb") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def put(self, key, data):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=self.TEMP_SUFFIX)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, self.path(key))
+            finally:
+                _remove_temp_file(temp_path)
+        except OSError as e:
+            logger.warning("Failed to write the cache file in %s: %s", self.directory, e)
+            return False
+
+        self._add_size(len(data))
+        return True
+
+    def remove(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def _add_size(self, size, keep=None):
+        if self._size is None or self._size + size > self.max_size:
+            # count the entries put by the other processes too.
+            self.evict(keep=keep)
+        else:
+            self._size += size
+
+    def evict(self, keep=None):
+        """Remove the least recently used entries until the total size is under max_size, and the temporary
+        files left by the crashed writers. The entry of the path keep is not removed, even if it is larger
+        than max_size."""
+        entries = []
+        total_size = 0
+        stale_time = time.time() - self.STALE_TEMP_SECONDS
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(self.TEMP_SUFFIX):
+                        try:
+                            if entry.stat().st_mtime < stale_time:
+                                os.remove(entry.path)
+                                logger.debug("remove the stale temporary file %s" % entry.path)
+                        except OSError:
+                            pass
+                        continue
+                    if not entry.name.endswith(self.SUFFIX):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total_size += st.st_size
+        except OSError:
+            return
+
+        self._size = total_size
+        if total_size <= self.max_size:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                logger.debug("evict the cache file %s" % path)
+            except OSError:
+                continue
+            total_size -= size
+            self._size = total_size
+            if total_size <= self.max_size:
+                break
+
+
+def _remove_temp_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        # renamed to the entry.
+        pass
+    except OSError as e:
+        logger.warning("Failed to remove the temporary file %s: %s", path, e)
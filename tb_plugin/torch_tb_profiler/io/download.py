@@ -0,0 +1,51 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# -------------------------------------------------------------------------
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import utils
+
+logger = utils.get_logger()
+
+PREFETCH_WORKERS = int(os.getenv('TORCH_PROFILER_PREFETCH_WORKERS', '4'))
+
+
+class DownloadManager(object):
+    """Download the remote trace files in the plugin process, before they are parsed.
+
+    The files of the runs are downloaded concurrently by a bounded thread pool, and each file is
+    downloaded with concurrent ranged requests by the clients shared by the threads. The caller
+    gets a Future of the local file, so a file could be parsed as soon as it lands.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_workers=PREFETCH_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download")
+
+    @classmethod
+    def instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = DownloadManager()
+            return cls._instance
+
+    def prefetch(self, cache, filename, progress=None):
+        '''Return the Future of the local file of filename in the cache.
+        The time and the bytes of the download are reported as the download stage to the ProgressReporter progress,
+        so that they show in the progress of the file parsed by another process.'''
+        return self._executor.submit(self._download, cache, filename, progress)
+
+    @staticmethod
+    def _download(cache, filename, progress):
+        if progress is None:
+            return cache.get_remote_cache(filename)
+        with progress.run_stage("download"):
+            local_file = cache.get_remote_cache(filename)
+            progress.update(bytes_read=os.path.getsize(local_file))
+        return local_file
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -17,14 +17,17 @@ import os
 import tempfile
 
 from .. import utils
-from .base import BaseFileSystem, LocalPath, RemotePath, StatData
+from .base import (DOWNLOAD_CHUNK_SIZE, DOWNLOAD_CONCURRENCY, BaseFileSystem, ClientCache, LocalPath,
+                   RemotePath, StatData, ThreadLocalClient)
 from .utils import as_bytes, as_text, parse_blob_url
 
 logger = utils.get_logger()
 
 try:
     import boto3
+    import botocore.config
     import botocore.exceptions
+    from boto3.s3.transfer import TransferConfig
 
     S3_ENABLED = True
 except ImportError:
@@ -155,8 +158,8 @@ class LocalFileSystem(LocalPath, BaseFileSystem):
         """Returns file statistics for a given path."""
         # NOTE: Size of the file is given by .st_size as returned from
         # os.stat(), but we convert to .length
-        file_length = os.stat(filename).st_size
-        return StatData(file_length)
+        st = os.stat(filename)
+        return StatData(st.st_size, st.st_mtime)
 
     def walk(self, top, topdown=True, onerror=None):
         # Note on followlinks=True: per the tensorboard documentation [1], users are encouraged to
@@ -177,6 +180,18 @@ class S3FileSystem(RemotePath, BaseFileSystem):
         if access_key and secret_key:
             boto3.setup_default_session(
                 aws_access_key_id=access_key, aws_secret_access_key=secret_key)
+        self._clients = ClientCache()
+        self._resource = ThreadLocalClient(lambda: boto3.resource("s3", endpoint_url=self._s3_endpoint))
+
+    def _get_client(self):
+        # The low-level client is thread safe, so one client (and its connection pool) is shared by the threads.
+        return self._clients.get("client", lambda: boto3.client(
+            "s3", endpoint_url=self._s3_endpoint,
+            config=botocore.config.Config(max_pool_connections=4 * DOWNLOAD_CONCURRENCY)))
+
+    def _get_resource(self):
+        # The resource is not thread safe, so each thread has its own one.
+        return self._resource.get()
 
     def bucket_and_path(self, url):
         """Split an S3-prefixed URL into bucket and path."""
@@ -189,7 +204,7 @@ class S3FileSystem(RemotePath, BaseFileSystem):
 
     def exists(self, filename):
         """Determines whether a path exists or not."""
-        client = boto3.client("s3", endpoint_url=self._s3_endpoint)
+        client = self._get_client()
         bucket, path = self.bucket_and_path(filename)
         r = client.list_objects(Bucket=bucket, Prefix=path, Delimiter="/")
         if r.get("Contents") or r.get("CommonPrefixes"):
@@ -198,7 +213,7 @@ class S3FileSystem(RemotePath, BaseFileSystem):
 
     def read(self, filename, binary_mode=False, size=None, continue_from=None):
         """Reads contents of a file to a string."""
-        s3 = boto3.resource("s3", endpoint_url=self._s3_endpoint)
+        s3 = self._get_resource()
         bucket, path = self.bucket_and_path(filename)
         args = {}
 
@@ -222,7 +237,7 @@ class S3FileSystem(RemotePath, BaseFileSystem):
                 if size is not None:
                     # Asked for too much, so request just to the end. Do this
                     # in a second request so we don't check length in all cases.
-                    client = boto3.client("s3", endpoint_url=self._s3_endpoint)
+                    client = self._get_client()
                     obj = client.head_object(Bucket=bucket, Key=path)
                     content_length = obj["ContentLength"]
                     endpoint = min(content_length, offset + size)
@@ -247,7 +262,7 @@ class S3FileSystem(RemotePath, BaseFileSystem):
 
     def write(self, filename, file_content, binary_mode=False):
         """Writes string file contents to a file."""
-        client = boto3.client("s3", endpoint_url=self._s3_endpoint)
+        client = self._get_client()
         bucket, path = self.bucket_and_path(filename)
         if binary_mode:
             if not isinstance(file_content, bytes):
@@ -256,22 +271,27 @@ class S3FileSystem(RemotePath, BaseFileSystem):
             file_content = as_bytes(file_content)
         client.put_object(Body=file_content, Bucket=bucket, Key=path)
 
-    def download_file(self, filename):
-        fp = tempfile.NamedTemporaryFile(
-            'w+t', suffix='.%s' % self.basename(filename), delete=False)
-        fp.close()
+    def download_file(self, filename, local_file=None):
+        if local_file is None:
+            fp = tempfile.NamedTemporaryFile(
+                'w+t', suffix='.%s' % self.basename(filename), delete=False)
+            fp.close()
+            local_file = fp.name
 
         logger.info("s3: starting downloading file %s as %s" %
-                    (filename, fp.name))
+                    (filename, local_file))
         # Use boto3.resource instead of boto3.client('s3') to support minio.
         # https://docs.min.io/docs/how-to-use-aws-sdk-for-python-with-minio-server.html
         # To support minio, the S3_ENDPOINT need to be set like: S3_ENDPOINT=http://localhost:9000
-        s3 = boto3.resource("s3", endpoint_url=self._s3_endpoint)
+        s3 = self._get_resource()
         bucket, path = self.bucket_and_path(filename)
-        s3.Bucket(bucket).download_file(path, fp.name)
+        # download the big files with the concurrent ranged requests.
+        config = TransferConfig(multipart_threshold=DOWNLOAD_CHUNK_SIZE, multipart_chunksize=DOWNLOAD_CHUNK_SIZE,
+                                max_concurrency=DOWNLOAD_CONCURRENCY)
+        s3.Bucket(bucket).download_file(path, local_file, Config=config)
         logger.info("s3: file %s is downloaded as %s" %
-                        (filename, fp.name))
-        return fp.name
+                        (filename, local_file))
+        return local_file
 
     def glob(self, filename):
         """Returns a list of files that match the given pattern(s)."""
@@ -284,7 +304,7 @@ class S3FileSystem(RemotePath, BaseFileSystem):
             return []
 
         filename = filename[:-1]
-        client = boto3.client("s3", endpoint_url=self._s3_endpoint)
+        client = self._get_client()
         bucket, path = self.bucket_and_path(filename)
         p = client.get_paginator("list_objects")
         keys = []
@@ -297,7 +317,7 @@ class S3FileSystem(RemotePath, BaseFileSystem):
 
     def isdir(self, dirname):
         """Returns whether the path is a directory or not."""
-        client = boto3.client("s3", endpoint_url=self._s3_endpoint)
+        client = self._get_client()
         bucket, path = self.bucket_and_path(dirname)
         if not path.endswith("/"):
             path += "/"
@@ -308,7 +328,7 @@ class S3FileSystem(RemotePath, BaseFileSystem):
 
     def listdir(self, dirname):
         """Returns a list of entries contained within a directory."""
-        client = boto3.client("s3", endpoint_url=self._s3_endpoint)
+        client = self._get_client()
         bucket, path = self.bucket_and_path(dirname)
         p = client.get_paginator("list_objects")
         if not path.endswith("/"):
@@ -324,10 +344,61 @@ class S3FileSystem(RemotePath, BaseFileSystem):
                     keys.append(key)
         return keys
 
+    def walk(self, top, topdown=True, onerror=None):
+        """Walk the directory tree built from the keys listed by the paginated list_objects_v2,
+        instead of a listdir and an isdir request for each directory and each entry."""
+        client = self._get_client()
+        bucket, path = self.bucket_and_path(top)
+        if path and not path.endswith("/"):
+            path += "/"
+
+        tree = {}
+        try:
+            for r in client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=path):
+                for o in r.get("Contents", []):
+                    dirname, basename = self.split(o["Key"][len(path):])
+                    # the empty objects created by makedirs are the directories themselves.
+                    _add_tree_node(tree, dirname, basename)
+        except botocore.exceptions.ClientError as exc:
+            if onerror is not None:
+                onerror(exc)
+            return
+
+        top = "s3://{}/{}".format(bucket, path).rstrip("/")
+        entries = []
+        for dirname in sorted(tree):
+            subdirs, files = tree[dirname]
+            entries.append((self.join(top, dirname) if dirname else top, sorted(subdirs), files))
+        if not topdown:
+            entries.reverse()
+        yield from entries
+
+    def list_files(self, dirname, recursive=True):
+        """Returns the (path, StatData) of the files under the directory, and the paths of its
+        subdirectories if not recursive, from the paginated list_objects_v2."""
+        client = self._get_client()
+        bucket, path = self.bucket_and_path(dirname)
+        if path and not path.endswith("/"):
+            path += "/"
+        args = {} if recursive else {"Delimiter": "/"}
+
+        files = []
+        subdirs = []
+        for r in client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=path, **args):
+            for o in r.get("Contents", []):
+                if o["Key"].endswith("/"):
+                    # the empty objects created by makedirs.
+                    continue
+                last_modified = o.get("LastModified")
+                files.append(("s3://{}/{}".format(bucket, o["Key"]),
+                              StatData(o["Size"], last_modified.timestamp() if last_modified else None, o.get("ETag"))))
+            subdirs.extend("s3://{}/{}".format(bucket, p["Prefix"].rstrip("/")) for p in r.get("CommonPrefixes", []))
+        return files, subdirs
+
     def makedirs(self, dirname):
         """Creates a directory and all parent/intermediate directories."""
         if not self.exists(dirname):
-            client = boto3.client("s3", endpoint_url=self._s3_endpoint)
+            client = self._get_client()
             bucket, path = self.bucket_and_path(dirname)
             if not path.endswith("/"):
                 path += "/"
@@ -336,11 +407,24 @@ class S3FileSystem(RemotePath, BaseFileSystem):
     def stat(self, filename):
         """Returns file statistics for a given path."""
         # Size of the file is given by ContentLength from S3
-        client = boto3.client("s3", endpoint_url=self._s3_endpoint)
+        client = self._get_client()
         bucket, path = self.bucket_and_path(filename)
 
         obj = client.head_object(Bucket=bucket, Key=path)
-        return StatData(obj["ContentLength"])
+        last_modified = obj.get("LastModified")
+        return StatData(obj["ContentLength"], last_modified.timestamp() if last_modified else None, obj.get("ETag"))
+
+
+def _add_tree_node(tree, dirname, basename):
+    """Add the file of the relative path to the tree of dirname => (subdirs, files), with its parent directories."""
+    if dirname not in tree:
+        tree[dirname] = (set(), [])
+        if dirname:
+            parent, name = dirname.rsplit("/", 1) if "/" in dirname else ("", dirname)
+            _add_tree_node(tree, parent, None)
+            tree[parent][0].add(name)
+    if basename:
+        tree[dirname][1].append(basename)
 
 
 register_filesystem("", LocalFileSystem())
@@ -527,9 +611,14 @@ def relpath(path, start):
 def join(path, *paths):
     return get_filesystem(path).join(path, *paths)
 
-def download_file(filename):
-    """Downloads the file, returning a temporary path to the file after finishing."""
-    return get_filesystem(filename).download_file(filename)
+def is_remote(filename):
+    """Returns whether the file is in a remote file system, like S3."""
+    return isinstance(get_filesystem(filename), RemotePath)
+
+def download_file(filename, local_file=None):
+    """Downloads the file, returning a temporary path to the file after finishing.
+    The file is downloaded to local_file if it is given."""
+    return get_filesystem(filename).download_file(filename, local_file)
 
 def glob(filename):
     """Returns a list of files that match the given pattern(s)."""
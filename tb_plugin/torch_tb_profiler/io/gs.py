@@ -6,7 +6,7 @@ import tempfile
 from google.cloud import storage
 
 from .. import utils
-from .base import BaseFileSystem, RemotePath, StatData
+from .base import BaseFileSystem, RemotePath, StatData, ThreadLocalClient
 
 logger = utils.get_logger()
 
@@ -17,6 +17,7 @@ class GoogleBlobSystem(RemotePath, BaseFileSystem):
     def __init__(self):
         if not storage:
             raise ImportError("google-cloud-storage must be installed for Google Cloud Blob support.")
+        self._client = ThreadLocalClient(storage.Client.create_anonymous_client)
 
     def exists(self, dirname):
         """Returns whether the path is a directory or not."""
@@ -34,15 +35,17 @@ class GoogleBlobSystem(RemotePath, BaseFileSystem):
     def glob(self, filename):
         raise NotImplementedError
 
-    def download_file(self, filename):
-        fp = tempfile.NamedTemporaryFile('w+t', suffix='.%s' % self.basename(filename), delete=False)
-        fp.close()
+    def download_file(self, filename, local_file=None):
+        if local_file is None:
+            fp = tempfile.NamedTemporaryFile('w+t', suffix='.%s' % self.basename(filename), delete=False)
+            fp.close()
+            local_file = fp.name
         bucket_name, path = self.bucket_and_path(filename)
         client = self.create_google_cloud_client()
         bucket = client.bucket(bucket_name)
         blob = bucket.blob(path)
-        blob.download_to_filename(fp.name)
-        return fp.name
+        blob.download_to_filename(local_file)
+        return local_file
 
     def isdir(self, dirname):
         """Returns whether the path is a directory or not."""
@@ -77,7 +80,7 @@ class GoogleBlobSystem(RemotePath, BaseFileSystem):
         client = self.create_google_cloud_client()
         bucket = client.bucket(bucket_name)
         blob = bucket.get_blob(path)
-        return StatData(blob.size)
+        return StatData(blob.size, blob.updated.timestamp() if blob.updated else None, blob.etag)
 
     def walk(self, top, topdown=True, onerror=None):
         bucket_name, path = self.bucket_and_path(top)
@@ -91,6 +94,25 @@ class GoogleBlobSystem(RemotePath, BaseFileSystem):
         for key, value in results.items():
             yield key, None, value
 
+    def list_files(self, dirname, recursive=True):
+        """Returns the (path, StatData) of the files under the directory, and the paths of its
+        subdirectories if not recursive."""
+        bucket_name, path = self.bucket_and_path(dirname)
+        if path and not path.endswith("/"):
+            path += "/"
+        client = self.create_google_cloud_client()
+        blobs = client.list_blobs(bucket_name, prefix=path, delimiter=None if recursive else "/")
+
+        files = []
+        for blob in blobs:
+            if blob.name.endswith("/"):
+                continue
+            files.append(("gs://{}/{}".format(bucket_name, blob.name),
+                          StatData(blob.size, blob.updated.timestamp() if blob.updated else None, blob.etag)))
+        # the prefixes are known after all the pages are iterated.
+        subdirs = ["gs://{}/{}".format(bucket_name, prefix.rstrip("/")) for prefix in sorted(blobs.prefixes)]
+        return files, subdirs
+
     def split_blob_path(self, blob_path):
         """ Find the first blob start with blob_path, then get the relative path starting from dirname(blob_path). Finally, split the relative path.
         return (basename(blob_path), [relative splitted paths])
@@ -127,5 +149,6 @@ class GoogleBlobSystem(RemotePath, BaseFileSystem):
 
     def create_google_cloud_client(self):
         # TODO: support client with credential?
-        client = storage.Client.create_anonymous_client()
-        return client
+        # The client keeps its connection pool, so it is reused by the thread. It is not documented
+        # as thread safe, so each thread has its own one.
+        return self._client.get()
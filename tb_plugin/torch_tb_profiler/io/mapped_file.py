@@ -0,0 +1,110 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# -------------------------------------------------------------------------
+import gzip
+import io as sysio
+import mmap
+import os
+import time
+
+
+class MappedFile(sysio.RawIOBase):
+    """Read-only file object over the memory mapping of a local file.
+
+    The pages are shared with the page cache, so reading the same trace in several processes
+    doesn't allocate a copy of the whole file in each of them. `view` gives zero-copy access to
+    the content, and readinto copies the requested bytes only.
+    """
+
+    def __init__(self, filename):
+        super().__init__()
+        with open(filename, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            # an empty file could not be mapped.
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else None
+        # bytes-like content of the file, which supports find and rfind.
+        self.data = self._mmap if self._mmap is not None else b""
+        self.view = memoryview(self.data)
+        self._pos = 0
+
+    def __len__(self):
+        return len(self.view)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self.view) - self._pos)
+        if n <= 0:
+            return 0
+        b[:n] = self.view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=sysio.SEEK_SET):
+        if whence == sysio.SEEK_SET:
+            pos = offset
+        elif whence == sysio.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == sysio.SEEK_END:
+            pos = len(self.view) + offset
+        else:
+            raise ValueError("invalid whence ({}, should be 0, 1 or 2)".format(whence))
+        if pos < 0:
+            raise ValueError("negative seek position {}".format(pos))
+        self._pos = pos
+        return pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self.view.release()
+            if self._mmap is not None:
+                self._mmap.close()
+        super().close()
+
+
+class _MappedGzipFile(gzip.GzipFile):
+    def __init__(self, mapped):
+        super().__init__(fileobj=mapped, mode='rb')
+        # the same as BufferedReader.raw, the position of which is the compressed bytes read.
+        self.raw = mapped
+        # the wall time spent in decompressing, and the decompressed bytes.
+        self.decompress_seconds = 0.0
+        self.decompressed_bytes = 0
+
+    def read(self, size=-1):
+        start = time.time()
+        data = super().read(size)
+        self._add_decompressed(start, data)
+        return data
+
+    def read1(self, size=-1):
+        start = time.time()
+        data = super().read1(size)
+        self._add_decompressed(start, data)
+        return data
+
+    def _add_decompressed(self, start, data):
+        self.decompress_seconds += time.time() - start
+        self.decompressed_bytes += len(data)
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.raw.close()
+
+
+def open_mapped(filename, compressed=False):
+    """Return a binary file object reading the local file through its memory mapping.
+    The content is decompressed on the fly if compressed is True."""
+    mapped = MappedFile(filename)
+    if compressed:
+        return _MappedGzipFile(mapped)
+    return sysio.BufferedReader(mapped)
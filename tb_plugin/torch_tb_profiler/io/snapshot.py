@@ -0,0 +1,63 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# -------------------------------------------------------------------------
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import utils
+from .file import get_filesystem
+
+logger = utils.get_logger()
+
+LIST_CONCURRENCY = int(os.getenv('TORCH_PROFILER_LIST_CONCURRENCY', '8'))
+
+
+class ListingSnapshot(object):
+    """The trace files under a remote logdir, with the size, mtime and etag listed for them.
+
+    refresh lists the top-level directories of the logdir concurrently, with one paginated listing
+    each, and returns the run directories whose trace files are added, changed or removed since the
+    last refresh. The loaders take the files of a run and their states from the snapshot, so there is
+    no listdir or stat request for each run or each file.
+    """
+
+    def __init__(self, logdir, max_workers=LIST_CONCURRENCY):
+        self.logdir = logdir
+        self.max_workers = max_workers
+        # run dir => {file name => StatData}
+        self._runs = {}
+
+    @property
+    def run_dirs(self):
+        return sorted(self._runs)
+
+    def get_files(self, run_dir):
+        '''Return file name => StatData of the trace files in the run directory, or None if it is not listed.'''
+        files = self._runs.get(run_dir)
+        return None if files is None else dict(files)
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+
+    def refresh(self):
+        '''List the logdir again, and return the set of the run directories whose trace files changed.'''
+        fs = get_filesystem(self.logdir)
+        files, subdirs = fs.list_files(self.logdir, recursive=False)
+        if subdirs:
+            with ThreadPoolExecutor(min(self.max_workers, len(subdirs)), thread_name_prefix="list") as executor:
+                for subdir_files, _ in executor.map(fs.list_files, subdirs):
+                    files.extend(subdir_files)
+
+        runs = {}
+        for path, file_stat in files:
+            run_dir, name = fs.split(path)
+            if utils.is_chrome_trace_file(name):
+                runs.setdefault(run_dir, {})[name] = file_stat
+
+        changed = {run_dir for run_dir in set(runs) | set(self._runs) if runs.get(run_dir) != self._runs.get(run_dir)}
+        if changed:
+            logger.debug("The trace files of %d run directories changed under %s", len(changed), self.logdir)
+        # replaced as a whole, so the readers see either the old or the new listing.
+        self._runs = runs
+        return changed
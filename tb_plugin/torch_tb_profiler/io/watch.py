@@ -0,0 +1,341 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# -------------------------------------------------------------------------
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+
+from .. import utils
+
+logger = utils.get_logger()
+
+# The trace files modified in this interval are checked again by the scan, since they could be still being written.
+SETTLE_TIME_IN_SECONDS = 60
+# The events coming together, like the trace files written by the workers at the same step, are handled at once.
+MIN_REFRESH_INTERVAL_IN_SECONDS = 1
+
+# inotify doesn't report the changes made by the other hosts of a network filesystem, so these are scanned.
+_NETWORK_FILESYSTEMS = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "ncpfs", "afs", "9p", "lustre", "gpfs",
+                        "ceph", "glusterfs", "beegfs", "fuse")
+
+# from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF |
+               IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT = struct.Struct("iIII")
+
+
+class Inotify(object):
+    """The inotify instance of Linux, called by ctypes."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        # AttributeError on the platforms without inotify.
+        self._init = libc.inotify_init1
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self.fd = self._init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            self._raise_error()
+
+    def add_watch(self, path, mask=_WATCH_MASK):
+        '''Return the watch descriptor of the directory, which is the same for the paths of a directory.'''
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            self._raise_error(path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self):
+        '''Return the (watch descriptor, mask, name) of the events arrived, without blocking.'''
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                events.append((wd, mask, os.fsdecode(data[offset:offset + length].rstrip(b"\0"))))
+                offset += length
+
+    def wait(self, timeout):
+        '''Return whether any event arrives in timeout seconds.'''
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        return bool(readable)
+
+    def close(self):
+        os.close(self.fd)
+
+    @staticmethod
+    def _raise_error(path=None):
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error), path)
+
+
+def is_network_filesystem(path):
+    """Returns whether the path is on a network filesystem, from the longest mount point containing it."""
+    path = os.path.realpath(path)
+    fs_type = None
+    mount_point = ""
+    try:
+        with open("/proc/self/mounts", "r") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # the spaces in the mount point are escaped as \040.
+                point = fields[1].replace("\\040", " ")
+                if (path == point or path.startswith(point.rstrip(os.sep) + os.sep)) and len(point) >= len(mount_point):
+                    mount_point, fs_type = point, fields[2]
+    except OSError:
+        return False
+    return fs_type is not None and fs_type.split(".")[0] in _NETWORK_FILESYSTEMS
+
+
+class LogdirWatcher(object):
+    """The run directories under a local logdir, which are the directories containing trace files.
+
+    On Linux the directories are watched by inotify, so refresh only reads the events and lists the
+    directories in which a trace file is written, moved or removed, or a subdirectory is added or removed.
+    The symlinked subtrees are followed and watched in the same way.
+    The directories where inotify is not available, like on a network filesystem or out of the watches
+    of the user, are scanned instead: refresh stats them and only lists the ones whose mtime changed,
+    and stats again the trace files modified recently, since they could be still being written.
+    """
+
+    def __init__(self, logdir, use_inotify=True):
+        self.logdir = logdir
+        # dir => (mtime, subdirs, trace file names)
+        self._dirs = {}
+        # run dir => {trace file name => (size, mtime)}
+        self._runs = {}
+        # The scanned directories, and the watch descriptor => paths of the watched directories.
+        self._polled = set()
+        self._watches = {}
+        self._wds = {}
+        # st_dev => whether it is a network filesystem
+        self._network_devices = {}
+        self._full_scan = True
+        self._inotify = None
+        if use_inotify:
+            try:
+                self._inotify = Inotify()
+            except (OSError, AttributeError) as ex:
+                logger.info("inotify is not available, the logdir is scanned instead. Exception=%s", ex)
+
+    @property
+    def run_dirs(self):
+        return sorted(self._runs)
+
+    def refresh(self):
+        '''Update the run directories, and return the set of the run directories whose trace files changed.'''
+        changed = set()
+        if self._full_scan or self.logdir not in self._dirs:
+            # the logdir could be created after TensorBoard starts.
+            self._full_scan = False
+            self._walk([self.logdir], set(), changed, full=True)
+            return changed
+
+        dirty = set()
+        if self._inotify is not None:
+            dirty = self._read_events()
+            if dirty is None:
+                logger.warning("The inotify events of %s overflowed, scan it again.", self.logdir)
+                self._walk([self.logdir], set(), changed, full=True)
+                return changed
+        self._walk(sorted(dirty | self._polled), dirty, changed)
+        return changed
+
+    def wait(self, timeout):
+        '''Wait for timeout seconds or until a watched directory changes.'''
+        if self._inotify is None or self._full_scan:
+            time.sleep(timeout)
+            return
+        start = time.time()
+        if self._inotify.wait(timeout):
+            time.sleep(max(0, min(MIN_REFRESH_INTERVAL_IN_SECONDS, timeout - (time.time() - start))))
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _read_events(self):
+        '''Return the directories to list again, or None if the events overflowed.'''
+        dirty = set()
+        for wd, mask, name in self._inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:
+                # the directory is removed, or its watch is removed.
+                for path in self._watches.pop(wd, ()):
+                    self._wds.pop(path, None)
+                continue
+            for path in self._watches.get(wd, ()):
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    dirty.add(path)
+                elif mask & (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO):
+                    # the trace files created are listed when they are closed.
+                    if (mask & IN_ISDIR or name in self._dirs.get(path, (None, ()))[1] or
+                            os.path.islink(os.path.join(path, name)) or
+                            not mask & IN_CREATE and utils.is_chrome_trace_file(name)):
+                        dirty.add(path)
+                elif mask & IN_CLOSE_WRITE and utils.is_chrome_trace_file(name):
+                    dirty.add(path)
+        return dirty
+
+    def _walk(self, roots, dirty, changed, full=False):
+        '''Walk the trees of the roots. List the directories which are new, dirty or scanned with a changed mtime,
+        and descend into the subdirectories which are new or scanned, or all of them if full.'''
+        # (path, (st_dev, st_ino) of the ancestors), to skip the symlink loops.
+        stack = [(root, self._get_ancestors(root)) for root in reversed(roots)]
+        visited = set()
+        while stack:
+            path, ancestors = stack.pop()
+            if path in visited:
+                continue
+            visited.add(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._forget(path, changed)
+                continue
+            inode = (st.st_dev, st.st_ino)
+            if inode in ancestors:
+                continue
+
+            known = self._dirs.get(path)
+            if known is None:
+                self._watch(path, st)
+            if full or known is None or path in dirty or (path in self._polled and known[0] != st.st_mtime_ns):
+                subdirs, names = self._list_dir(path)
+                if known is not None:
+                    for subdir in set(known[1]) - set(subdirs):
+                        self._forget(os.path.join(path, subdir), changed)
+                self._dirs[path] = (st.st_mtime_ns, subdirs, names)
+                self._update_run(path, names, True, changed)
+            else:
+                subdirs, names = known[1], known[2]
+                if path in self._polled:
+                    self._update_run(path, names, False, changed)
+
+            ancestors = ancestors | {inode}
+            for subdir in reversed(subdirs):
+                child = os.path.join(path, subdir)
+                if full or child not in self._dirs or child in self._polled:
+                    stack.append((child, ancestors))
+
+    def _get_ancestors(self, path):
+        ancestors = set()
+        while path != self.logdir and path.startswith(self.logdir):
+            path = os.path.dirname(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            ancestors.add((st.st_dev, st.st_ino))
+        return frozenset(ancestors)
+
+    def _watch(self, path, st):
+        '''Watch the new directory by inotify, or scan it if that is not available.'''
+        if self._inotify is not None and not self._is_network_device(path, st.st_dev):
+            try:
+                wd = self._inotify.add_watch(path)
+                self._watches.setdefault(wd, set()).add(path)
+                self._wds[path] = wd
+                return
+            except OSError as ex:
+                if ex.errno == errno.ENOSPC:
+                    logger.warning("Out of the inotify watches, the directories not watched are scanned instead. "
+                                   "The limit could be raised by fs.inotify.max_user_watches.")
+                else:
+                    logger.debug("Failed to watch %s. Exception=%s", path, ex)
+        self._polled.add(path)
+
+    def _is_network_device(self, path, device):
+        if device not in self._network_devices:
+            self._network_devices[device] = is_network_filesystem(path)
+            if self._network_devices[device]:
+                logger.info("%s is on a network filesystem, it is scanned instead of watched.", path)
+        return self._network_devices[device]
+
+    def _list_dir(self, path):
+        subdirs = []
+        names = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        # follow the symlinks, like os.walk(followlinks=True).
+                        if entry.is_dir():
+                            subdirs.append(entry.name)
+                        elif utils.is_chrome_trace_file(entry.name):
+                            names.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError as ex:
+            logger.debug("Failed to list %s. Exception=%s", path, ex)
+        return sorted(subdirs), sorted(names)
+
+    def _update_run(self, path, names, listed, changed):
+        '''Stat the trace files of the directory, only the recently modified ones if it is not listed again.'''
+        old = self._runs.get(path, {})
+        if not names and not old:
+            return
+        now = time.time()
+        files = {}
+        for name in names:
+            state = old.get(name)
+            if listed or state is None or now - state[1] < SETTLE_TIME_IN_SECONDS:
+                try:
+                    st = os.stat(os.path.join(path, name))
+                except OSError:
+                    continue
+                state = (st.st_size, st.st_mtime)
+            files[name] = state
+
+        if files != old:
+            changed.add(path)
+        if files:
+            self._runs[path] = files
+        else:
+            self._runs.pop(path, None)
+
+    def _forget(self, path, changed):
+        '''Remove the directory and its subdirectories, which are removed or moved away.'''
+        prefix = path + os.sep
+        for dirname in [dirname for dirname in self._dirs if dirname == path or dirname.startswith(prefix)]:
+            del self._dirs[dirname]
+            self._polled.discard(dirname)
+            if self._runs.pop(dirname, None) is not None:
+                changed.add(dirname)
+            wd = self._wds.pop(dirname, None)
+            if wd is not None:
+                paths = self._watches.get(wd, set())
+                paths.discard(dirname)
+                if not paths:
+                    self._watches.pop(wd, None)
+                    self._inotify.rm_watch(wd)
@@ -3,23 +3,31 @@
 # --------------------------------------------------------------------------
 import atexit
 import gzip
+import hashlib
 import json
 import multiprocessing as mp
 import os
 import sys
-import tempfile
 import threading
 import time
+import weakref
 from collections import OrderedDict
-from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
 
 import werkzeug
 from tensorboard.plugins import base_plugin
 from werkzeug import exceptions, wrappers
+from werkzeug.wsgi import wrap_file
 
 from . import consts, io, utils
 from .profiler import RunLoader
-from .run import DistributedRunProfile, Run, RunProfile
+from .profiler.loader import open_projected_trace, open_trace, open_trace_slice
+from .profiler.pool import ParsePool
+from .profiler.profile_cache import ProfileCache
+from .profiler.residency import ProfileResidency
+from .profiler.trace_stream import TraceProjection
+from .run import DistributedRunProfile, PendingRunProfile, Run, RunProfile
+from .table_index import TableIndex
 
 logger = utils.get_logger()
 
@@ -48,28 +56,42 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
         if start_method:
             mp.set_start_method(start_method, force=True)
         self.logdir = io.abspath(context.logdir.rstrip('/'))
+        # In the lazy mode, the trace files are only parsed when their profiles are requested.
+        self._lazy = os.getenv('TORCH_PROFILER_LAZY_LOAD', '0').upper() in ("1", "TRUE", "ON")
 
         self._load_lock = threading.Lock()
-        self._load_threads = []
+        # The run directories loaded for the first time, and all the directories scheduled to be (re)loaded.
+        self._loading_run_dirs = set()
+        self._scheduled_run_dirs = set()
+        self._loaders = {}
+        # The remote logdir is listed with the states of its files, and the local logdir is watched,
+        # so that only the runs whose trace files changed are reloaded.
+        self._snapshot = io.ListingSnapshot(self.logdir) if io.is_remote(self.logdir) else None
+        self._watcher = self._snapshot
+        if self._watcher is None and os.getenv('TORCH_PROFILER_WATCH_LOGDIR', '1').upper() in ("1", "TRUE", "ON"):
+            self._watcher = io.LogdirWatcher(self.logdir)
+        self._changed_run_dirs = set()
+        # Evict the least recently used profiles if TORCH_PROFILER_PROFILE_MEMORY_MB is set.
+        self._residency = ProfileResidency.create(self._add_run)
+        # The runs are loaded in a few threads, and their files are parsed by the shared ParsePool.
+        self._load_executor = ThreadPoolExecutor(max_workers=consts.MAX_LOADING_RUNS, thread_name_prefix="load_run")
 
         self._runs = OrderedDict()
         self._runs_lock = threading.Lock()
 
         self._cache = io.Cache()
-        self._queue = Queue()
-        self._gpu_metrics_file_dict = {}
+        # The generated profiles survive the restart of TensorBoard, unless TORCH_PROFILER_PROFILE_CACHE=0.
+        self._profile_cache = ProfileCache.create()
+        # profile => {view key => (etag, compressed json)}, released with the profile.
+        self._responses = weakref.WeakKeyDictionary()
+        self._responses_lock = threading.Lock()
         monitor_runs = threading.Thread(target=self._monitor_runs, name="monitor_runs", daemon=True)
         monitor_runs.start()
 
-        receive_runs = threading.Thread(target=self._receive_runs, name="receive_runs", daemon=True)
-        receive_runs.start()
-
         def clean():
             logger.debug("starting cleanup...")
+            ParsePool.instance().shutdown(wait=False)
             self._cache.__exit__(*sys.exc_info())
-            for temp_file in self._gpu_metrics_file_dict.values():
-                logger.info("remove temporary file %s with gpu metrics" % temp_file)
-                os.remove(temp_file)
 
         atexit.register(clean)
 
@@ -85,6 +107,7 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
             "/trace_viewer_full.html": self.static_file_route,
             "/trace_embedding.html": self.static_file_route,
             "/runs": self.runs_route,
+            "/progress": self.progress_route,
             "/views": self.views_route,
             "/workers": self.workers_route,
             "/spans": self.spans_route,
@@ -109,26 +132,47 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
     def runs_route(self, request):
         with self._runs_lock:
             names = list(self._runs.keys())
+            states = {name: self._loaders[run.run_dir].state for name, run in self._runs.items()}
 
         with self._load_lock:
-            loading = bool(self._load_threads)
+            loading = bool(self._loading_run_dirs)
 
         data = {
             "runs": names,
-            "loading": loading
+            "loading": loading,
+            "states": states
         }
-        return self.respond_as_json(data)
+        return self.respond_as_json(data, request)
+
+    @wrappers.Request.application
+    def progress_route(self, request):
+        name = request.args.get("run")
+        progress = {}
+        for loader in list(self._loaders.values()):
+            if name is None or loader.run_name == name:
+                progress[loader.run_name] = loader.get_progress()
+        if name is not None and not progress:
+            raise exceptions.NotFound("could not find the run for %s" % (name))
+        return self.respond_as_json(progress, request)
 
     @wrappers.Request.application
     def views_route(self, request):
         name = request.args.get("run")
         self._validate(run=name)
         run = self._get_run(name)
+        self._check_run(run, name)
         views = run.views
+        if not views:
+            # Parse the first profile of the run to know its views.
+            for worker, span in sorted(run.profiles.keys()):
+                run = self._materialize_run(run.run_dir, worker, span) or run
+                views = run.views
+                if views:
+                    break
         views_list = []
         for view in views:
             views_list.append(view.display_name)
-        return self.respond_as_json(views_list)
+        return self.respond_as_json(views_list, request)
 
     @wrappers.Request.application
     def workers_route(self, request):
@@ -137,7 +181,7 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
         self._validate(run=name, view=view)
         run = self._get_run(name)
         self._check_run(run, name)
-        return self.respond_as_json(run.get_workers(view))
+        return self.respond_as_json(run.get_workers(view), request)
 
     @wrappers.Request.application
     def spans_route(self, request):
@@ -146,7 +190,7 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
         self._validate(run=name, worker=worker)
         run = self._get_run(name)
         self._check_run(run, name)
-        return self.respond_as_json(run.get_spans(worker))
+        return self.respond_as_json(run.get_spans(worker), request)
 
     @wrappers.Request.application
     def overview_route(self, request):
@@ -168,7 +212,7 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
                                    "data": gpu_metrics_data,
                                    "tooltip": gpu_metrics_tooltip}
 
-        return self.respond_as_json(data)
+        return self.respond_as_json(data, request)
 
     @wrappers.Request.application
     def operation_pie_route(self, request):
@@ -176,9 +220,10 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
 
         group_by = request.args.get("group_by")
         if group_by == "OperationAndInputShape":
-            return self.respond_as_json(profile.operation_pie_by_name_input)
+            return self._respond_profile_json(request, profile, "operation_pie_by_name_input",
+                                              profile.operation_pie_by_name_input)
         else:
-            return self.respond_as_json(profile.operation_pie_by_name)
+            return self._respond_profile_json(request, profile, "operation_pie_by_name", profile.operation_pie_by_name)
 
     @wrappers.Request.application
     def operation_table_route(self, request):
@@ -186,9 +231,10 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
 
         group_by = request.args.get("group_by")
         if group_by == "OperationAndInputShape":
-            return self.respond_as_json(profile.operation_table_by_name_input)
+            return self._respond_table(request, profile, "operation_table_by_name_input",
+                                       profile.operation_table_by_name_input)
         else:
-            return self.respond_as_json(profile.operation_table_by_name)
+            return self._respond_table(request, profile, "operation_table_by_name", profile.operation_table_by_name)
 
     @wrappers.Request.application
     def operation_stack_route(self, request):
@@ -199,15 +245,18 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
         group_by = request.args.get("group_by")
         input_shape = request.args.get("input_shape")
         if group_by == "OperationAndInputShape":
-            return self.respond_as_json(profile.operation_stack_by_name_input[str(op_name)+"###"+str(input_shape)])
+            key = str(op_name)+"###"+str(input_shape)
+            return self._respond_profile_json(request, profile, ("operation_stack_by_name_input", key),
+                                              profile.operation_stack_by_name_input[key])
         else:
-            return self.respond_as_json(profile.operation_stack_by_name[str(op_name)])
+            return self._respond_profile_json(request, profile, ("operation_stack_by_name", str(op_name)),
+                                              profile.operation_stack_by_name[str(op_name)])
 
     @wrappers.Request.application
     def kernel_pie_route(self, request):
         profile = self._get_profile_for_request(request)
 
-        return self.respond_as_json(profile.kernel_pie)
+        return self._respond_profile_json(request, profile, "kernel_pie", profile.kernel_pie)
 
     @wrappers.Request.application
     def kernel_table_route(self, request):
@@ -215,64 +264,62 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
 
         group_by = request.args.get("group_by")
         if group_by == "Kernel":
-            return self.respond_as_json(profile.kernel_table)
+            return self._respond_table(request, profile, "kernel_table", profile.kernel_table)
         else:
-            return self.respond_as_json(profile.kernel_op_table)
+            return self._respond_table(request, profile, "kernel_op_table", profile.kernel_op_table)
 
     @wrappers.Request.application
     def trace_route(self, request):
         profile = self._get_profile_for_request(request)
 
-        if not profile.has_kernel:# Pure CPU.
-            raw_data = self._cache.read(profile.trace_file_path)
-            if not profile.trace_file_path.endswith('.gz'):
-                raw_data = gzip.compress(raw_data, 1)
+        trace_range = self._get_trace_range(request)
+        if trace_range is not None:
+            # Only the events of the steps or the time range, for the traces too big for the trace viewer.
+            start_step, end_step, begin_ts, end_ts = trace_range
+            try:
+                if start_step is not None:
+                    f = open_trace_slice(self._cache, profile, start_step=start_step, end_step=end_step)
+                else:
+                    f = open_trace_slice(self._cache, profile, begin_ts=begin_ts, end_ts=end_ts)
+            except ValueError as e:
+                raise exceptions.BadRequest(str(e))
         else:
-            file_with_gpu_metrics = self._gpu_metrics_file_dict.get(profile.trace_file_path)
-            if file_with_gpu_metrics:
-                raw_data = io.read(file_with_gpu_metrics)
-            else:
-                raw_data = self._cache.read(profile.trace_file_path)
-                if profile.trace_file_path.endswith('.gz'):
-                    raw_data = gzip.decompress(raw_data)
-                raw_data = profile.append_gpu_metrics(raw_data)
-
-                # write the data to temp file
-                fp = tempfile.NamedTemporaryFile('w+b', suffix='.json.gz', delete=False)
-                fp.close()
-                # Already compressed, no need to gzip.open
-                with open(fp.name, mode='wb') as file:
-                    file.write(raw_data)
-                self._gpu_metrics_file_dict[profile.trace_file_path] = fp.name
-
-        headers = [('Content-Encoding', 'gzip')]
-        headers.extend(TorchProfilerPlugin.headers)
-        return werkzeug.Response(raw_data, content_type="application/json", headers=headers)
+            # The traces are served gzipped, from the trace cache unless they are already gzipped.
+            f = open_trace(self._cache, profile)
+
+        # The comma separated pids, tids, categories and arg keys to keep only some threads or to drop the heavy args.
+        projection = TraceProjection(*(
+            [value for arg in request.args.getlist(name) for value in arg.split(",") if value]
+            for name in ("pids", "tids", "exclude_cats", "strip_args")))
+        if projection:
+            with f:
+                f = open_projected_trace(self._cache, profile, f, projection)
+        return self._respond_file(request, f, gzipped=True)
 
     @wrappers.Request.application
     def dist_gpu_info_route(self, request):
         profile = self._get_profile_for_request(request, True)
-        return self.respond_as_json(profile.gpu_info)
+        return self._respond_profile_json(request, profile, "gpu_info", profile.gpu_info)
 
     @wrappers.Request.application
     def comm_overlap_route(self, request):
         profile = self._get_profile_for_request(request, True)
-        return self.respond_as_json(profile.steps_to_overlap)
+        return self._respond_profile_json(request, profile, "steps_to_overlap", profile.steps_to_overlap)
 
     @wrappers.Request.application
     def comm_wait_route(self, request):
         profile = self._get_profile_for_request(request, True)
-        return self.respond_as_json(profile.steps_to_wait)
+        return self._respond_profile_json(request, profile, "steps_to_wait", profile.steps_to_wait)
 
     @wrappers.Request.application
     def comm_ops_route(self, request):
         profile = self._get_profile_for_request(request, True)
-        return self.respond_as_json(profile.comm_ops)
+        return self._respond_profile_json(request, profile, "comm_ops", profile.comm_ops)
 
     @wrappers.Request.application
     def memory_route(self, request):
         profile = self._get_profile_for_request(request)
-        return self.respond_as_json(profile.memory_view)
+        return self._respond_profile_json(request, profile, "memory_view", profile.memory_view)
 
     @wrappers.Request.application
     def static_file_route(self, request):
@@ -297,9 +344,128 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
         )
 
     @staticmethod
-    def respond_as_json(obj):
-        content = json.dumps(obj)
-        return werkzeug.Response(content, content_type="application/json", headers=TorchProfilerPlugin.headers)
+    def _get_arg(request, name, type, default=None):
+        '''Return the arg of the request converted by type, or default if it is not given.
+        BadRequest is raised if the arg is not a valid number.'''
+        value = request.args.get(name)
+        if value is None:
+            return default
+        try:
+            number = type(value)
+        except ValueError:
+            number = None
+        if number is None or number != number:
+            raise exceptions.BadRequest("Invalid {} {}".format(name, value))
+        return number
+
+    @staticmethod
+    def _get_trace_range(request):
+        '''Return (start_step, end_step, begin_ts, end_ts) of the trace slice requested by the steps or the time range,
+        or None if the whole trace is requested. BadRequest is raised for an invalid or inverted range.'''
+        if not any(name in request.args for name in ("start_step", "end_step", "begin_ts", "end_ts")):
+            return None
+
+        get_arg = TorchProfilerPlugin._get_arg
+        start_step = get_arg(request, "start_step", int)
+        end_step = get_arg(request, "end_step", int, start_step)
+        begin_ts = get_arg(request, "begin_ts", float, float("-inf"))
+        end_ts = get_arg(request, "end_ts", float, float("inf"))
+        if start_step is None:
+            if end_step is not None:
+                raise exceptions.BadRequest("start_step is required with end_step")
+            if begin_ts >= end_ts:
+                raise exceptions.BadRequest("begin_ts {} must be less than end_ts {}".format(begin_ts, end_ts))
+        else:
+            if "begin_ts" in request.args or "end_ts" in request.args:
+                raise exceptions.BadRequest("The steps and the time range can't be both given")
+            if start_step > end_step:
+                raise exceptions.BadRequest("start_step {} is after end_step {}".format(start_step, end_step))
+        return start_step, end_step, begin_ts, end_ts
+
+    @staticmethod
+    def _respond_file(request, f, gzipped=False):
+        '''Stream the opened file from the disk in chunks, with the support of Range requests,
+        so that an interrupted download could be resumed. The ranges of a gzipped file are of its compressed bytes.'''
+        st = os.fstat(f.fileno())
+        headers = [('Content-Encoding', 'gzip')] if gzipped else []
+        headers.extend(TorchProfilerPlugin.headers)
+        response = werkzeug.Response(wrap_file(request.environ, f, consts.TRACE_RESPONSE_CHUNK_SIZE),
+                                     content_type="application/json", headers=headers, direct_passthrough=True)
+        # the validators of If-Range.
+        response.set_etag("{}-{}".format(st.st_size, st.st_mtime_ns))
+        response.last_modified = st.st_mtime
+        return response.make_conditional(request, accept_ranges=True, complete_length=st.st_size)
+
+    @staticmethod
+    def respond_as_json(obj, request=None):
+        if request is None:
+            content = json.dumps(obj)
+            return werkzeug.Response(content, content_type="application/json", headers=TorchProfilerPlugin.headers)
+        return TorchProfilerPlugin._respond_encoded_json(request, *TorchProfilerPlugin._encode_json(obj))
+
+    def _respond_profile_json(self, request, profile, key, obj):
+        '''Respond the json of a view of the profile, which is serialized and compressed once,
+        and kept until the profile is released.'''
+        with self._responses_lock:
+            encoded = self._responses.get(profile, {}).get(key)
+        if encoded is None:
+            encoded = self._encode_json(obj)
+            with self._responses_lock:
+                self._responses.setdefault(profile, {})[key] = encoded
+        return self._respond_encoded_json(request, *encoded)
+
+    def _respond_table(self, request, profile, key, table):
+        '''Respond the table of the profile as a whole, or a page of it if any of offset, limit, sort_by, order,
+        search or regex is given. The page has the total number of the rows matching the search.'''
+        if table is None or not any(name in request.args for name in consts.TABLE_PAGE_ARGS):
+            return self._respond_profile_json(request, profile, key, table)
+
+        with self._responses_lock:
+            responses = self._responses.setdefault(profile, {})
+            index = responses.get(("table_index", key))
+            if index is None:
+                index = responses[("table_index", key)] = TableIndex(table)
+        try:
+            total, rows = index.get_page(offset=self._get_arg(request, "offset", int, 0),
+                                         limit=self._get_arg(request, "limit", int),
+                                         sort_by=request.args.get("sort_by"),
+                                         order=request.args.get("order", "desc"),
+                                         search=request.args.get("search"),
+                                         regex=request.args.get("regex", "0").upper() in ("1", "TRUE", "ON"))
+        except ValueError as e:
+            raise exceptions.BadRequest(str(e))
+        if isinstance(table, dict):
+            page = {"data": {"columns": table["data"]["columns"], "rows": rows}, "total": total}
+        else:
+            page = {"data": rows, "total": total}
+        return self.respond_as_json(page, request)
+
+    @staticmethod
+    def _encode_json(obj):
+        '''Return the strong etag and the gzip-compressed bytes of the json of obj.'''
+        content = json.dumps(obj).encode("utf-8")
+        return hashlib.sha1(content).hexdigest(), gzip.compress(content, consts.JSON_COMPRESS_LEVEL)
+
+    @staticmethod
+    def _respond_encoded_json(request, etag, compressed):
+        '''Respond the compressed json as is if the client accepts gzip, otherwise decompressed.
+        The client having the same content gets 304 Not Modified.'''
+        headers = [('Vary', 'Accept-Encoding')]
+        headers.extend(TorchProfilerPlugin.headers)
+        gzipped = bool(request.accept_encodings['gzip'])
+        if gzipped:
+            # the compressed and decompressed contents are different representations of the response.
+            etag += "-gzip"
+        if etag in request.if_none_match:
+            response = werkzeug.Response(status=304, headers=headers)
+        elif gzipped:
+            headers.append(('Content-Encoding', 'gzip'))
+            response = werkzeug.Response(compressed, content_type="application/json", headers=headers)
+        else:
+            response = werkzeug.Response(gzip.decompress(compressed), content_type="application/json",
+                                         headers=headers)
+        response.set_etag(etag)
+        return response
 
     def _monitor_runs(self):
         logger.info("Monitor runs begin")
@@ -309,20 +475,34 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
             while True:
                 try:
                     logger.debug("Scan run dir")
-                    run_dirs = self._get_run_dirs()
+                    if self._watcher is not None:
+                        changed = self._watcher.refresh()
+                        with self._load_lock:
+                            self._changed_run_dirs.update(changed)
+                        run_dirs = self._watcher.run_dirs
+                    else:
+                        run_dirs = self._get_run_dirs()
 
                     has_dir = False
-                    # Assume no deletion on run directories, trigger async load if find a new run
+                    # Assume no deletion on run directories, trigger async load if find a new run,
+                    # and reload the known runs to pick up their new or changed trace files.
+                    # The known runs are only reloaded if the watcher or the listing shows them changed.
                     for run_dir in run_dirs:
                         has_dir = True
-                        if run_dir not in touched:
-                            touched.add(run_dir)
-                            logger.info("Find run directory %s", run_dir)
-                            # Use threading to avoid UI stall and reduce data parsing time
-                            t = threading.Thread(target=self._load_run, args=(run_dir,))
-                            t.start()
-                            with self._load_lock:
-                                self._load_threads.append(t)
+                        with self._load_lock:
+                            if run_dir in self._scheduled_run_dirs:
+                                continue
+                            if (self._watcher is not None and run_dir in self._loaders
+                                    and run_dir not in self._changed_run_dirs):
+                                continue
+                            self._changed_run_dirs.discard(run_dir)
+                            self._scheduled_run_dirs.add(run_dir)
+                            if run_dir not in touched:
+                                touched.add(run_dir)
+                                logger.info("Find run directory %s", run_dir)
+                                self._loading_run_dirs.add(run_dir)
+                        # Load asynchronously to avoid UI stall
+                        self._load_executor.submit(self._load_run, run_dir)
 
                     if not has_dir:
                         # handle directory removed case.
@@ -330,22 +510,23 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
                 except Exception as ex:
                     logger.warning("Failed to scan runs. Exception=%s", ex, exc_info=True)
 
-                time.sleep(consts.MONITOR_RUN_REFRESH_INTERNAL_IN_SECONDS)
+                if self._watcher is not None:
+                    # returns early when a watched directory changes.
+                    self._watcher.wait(consts.MONITOR_RUN_REFRESH_INTERNAL_IN_SECONDS)
+                else:
+                    time.sleep(consts.MONITOR_RUN_REFRESH_INTERNAL_IN_SECONDS)
         except:
             logger.exception("Failed to start monitor_runs")
 
-    def _receive_runs(self):
-        while True:
-            run = self._queue.get()
-            if run is None:
-                continue
-
+    def _add_run(self, loader):
+        with self._runs_lock:
+            # Read the run in the lock, so that a run built earlier by another thread doesn't overwrite the latest one.
+            run = loader.run
             logger.info("Add run %s", run.name)
-            with self._runs_lock:
-                is_new = run.name not in self._runs
-                self._runs[run.name] = run
-                if is_new:
-                    self._runs = OrderedDict(sorted(self._runs.items()))
+            is_new = run.name not in self._runs
+            self._runs[run.name] = run
+            if is_new:
+                self._runs = OrderedDict(sorted(self._runs.items()))
 
     def _get_run_dirs(self):
         """Scan logdir, find PyTorch Profiler run directories.
@@ -364,23 +545,42 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
                     break
 
     def _load_run(self, run_dir):
+        name = self._get_run_name(run_dir)
         try:
-            name = self._get_run_name(run_dir)
-            logger.info("Load run %s", name)
-            # Currently, assume run data is immutable, so just load once
-            loader = RunLoader(name, run_dir, self._cache)
+            loader = self._loaders.get(run_dir)
+            if loader is None:
+                logger.info("Load run %s", name)
+                loader = RunLoader(name, run_dir, self._cache, self._lazy, self._residency, self._snapshot,
+                                   self._profile_cache)
+                self._loaders[run_dir] = loader
+            # Only the new or changed trace files are parsed when the run is loaded again.
             run = loader.load()
-            logger.info("Run %s loaded", name)
-            self._queue.put(run)
+            if run is not None:
+                logger.info("Run %s loaded", name)
+                self._add_run(loader)
         except Exception as ex:
-            logger.warning("Failed to load run %s. Exception=%s", ex, name, exc_info=True)
+            logger.warning("Failed to load run %s. Exception=%s", name, ex, exc_info=True)
+            with self._load_lock:
+                # load it again in the next scan.
+                self._changed_run_dirs.add(run_dir)
 
-        t = threading.current_thread()
         with self._load_lock:
-            try:
-                self._load_threads.remove(t)
-            except ValueError:
-                logger.warning("could not find the thread {}".format(run_dir))
+            self._loading_run_dirs.discard(run_dir)
+            self._scheduled_run_dirs.discard(run_dir)
+
+    def _materialize_run(self, run_dir, worker, span):
+        """Parse the trace files of the worker and span in the lazy mode, and return the updated Run."""
+        loader = self._loaders.get(run_dir)
+        if loader is None:
+            return None
+        run = loader.materialize(worker, span)
+        if run is None:
+            return None
+        self._add_run(loader)
+        if worker != 'All' and loader.has_pending_communication(span):
+            # Parse the other workers of the span in background for the distributed view.
+            self._load_executor.submit(self._materialize_run, run_dir, 'All', span)
+        return run
 
     def _get_run(self, name) -> Run:
         with self._runs_lock:
@@ -413,6 +613,11 @@ class TorchProfilerPlugin(base_plugin.TBPlugin):
         run = self._get_run(name)
         self._check_run(run, name)
         profile = run.get_profile(worker, span)
+        if isinstance(profile, PendingRunProfile):
+            run = self._materialize_run(run.run_dir, worker, span) or self._get_run(name)
+            profile = run.get_profile(worker, span)
+        elif self._residency is not None and profile is not None:
+            self._residency.touch(self._loaders[run.run_dir], worker, span)
         if profile is None:
             raise exceptions.NotFound("could not find the profile for %s/%s/%s " %(name, worker, span))
         return profile
@@ -4,22 +4,33 @@
 import gzip
 import io as sysio
 import json
+import os
 import re
-import tempfile
 from json.decoder import JSONDecodeError
 
 from .. import io, utils
-from . import trace
 from .communication import analyze_communication_nodes
 from .event_parser import EventParser, ProfileRole
+from .event_table import EventDispatcher, EventTableBuilder, to_event_table
 from .gpu_metrics_parser import GPUMetricsParser
 from .kernel_parser import KernelParser
 from .memory_parser import MemoryParser
 from .module_parser import ModuleParser
 from .overall_parser import OverallParser
+from .trace_stream import TraceStream, write_patched_trace
 
 logger = utils.get_logger()
 
+STREAMING_PARSE = os.getenv('TORCH_PROFILER_STREAMING_PARSE', '1').upper() in ("1", "TRUE", "ON")
+
+# The "Record Window End" event is removed from the trace when it is farther than this
+# from the "Iteration Start" event, to avoid the huge end timestamp.
+MAX_RECORD_WINDOW_DURATION = 24 * 3600 * 1000
+
+# The progress of the streaming parse is reported every this number of events.
+PROGRESS_EVENTS = 65536
+
+
 class RunProfileData(object):
     def __init__(self, worker, span=None):
         self.worker = worker
@@ -73,10 +84,16 @@ class RunProfileData(object):
         return False
 
     @staticmethod
-    def parse(run_dir, worker, span, path, caches):
+    def parse(run_dir, worker, span, path, caches, progress=None):
         logger.debug("Parse trace, run_dir=%s, worker=%s", run_dir, path)
 
-        trace_path, trace_json = RunProfileData._preprocess_file(caches, io.join(run_dir, path))
+        if STREAMING_PARSE:
+            try:
+                return RunProfileData._parse_stream(caches, io.join(run_dir, path), worker, span, progress)
+            except JSONDecodeError as e:
+                logger.info("Could not parse %s incrementally (%s), fall back to the full parse", path, e)
+
+        trace_path, trace_json = RunProfileData._preprocess_file(caches, io.join(run_dir, path), progress)
 
         profile = RunProfileData(worker, span)
         profile.trace_file_path = trace_path
@@ -86,23 +103,90 @@ class RunProfileData(object):
             profile.device_props = trace_json.get("deviceProperties", None)
             trace_json = trace_json["traceEvents"]
 
-        profile.events = []
+        builder = EventTableBuilder()
         for data in trace_json:
-            event = trace.create_event(data)
-            if event is not None:
-                profile.events.append(event)
+            builder.append(data)
+        profile.events = builder.build()
 
         return profile
 
     @staticmethod
-    def _preprocess_file(caches, trace_path):
+    def _parse_stream(caches, trace_path, worker, span, progress=None):
+        """Decompress and tokenize the trace incrementally and create the events on the fly,
+        so that neither the raw json nor its dict tree is held in memory as a whole."""
         if not io.exists(trace_path):
             raise FileNotFoundError(trace_path)
 
         local_file = caches.get_remote_cache(trace_path)
-        data = io.read(local_file)
-        if trace_path.endswith('.gz'):
-            data = gzip.decompress(data)
+
+        profile = RunProfileData(worker, span)
+        profile.trace_file_path = trace_path
+        builder = EventTableBuilder()
+
+        # Find the "Record Window End" event in the same way as _preprocess_file.
+        start_ts = None
+        end_event = None
+        last_end_event = None
+        last_end_event_before_start = None
+        compressed = trace_path.endswith('.gz')
+        with TraceStream.open(local_file, compressed) as stream:
+            for count, data in enumerate(stream.events(), 1):
+                if progress is not None and count % PROGRESS_EVENTS == 0:
+                    progress.update(stream.bytes_read, count)
+
+                name = data.get("name")
+                if name == "Record Window End":
+                    # keep the span of the event to remove it from the trace.
+                    event = (data.get("ts"), stream.event_span)
+                    if start_ts is not None and end_event is None:
+                        end_event = event
+                    last_end_event = event
+                elif isinstance(name, str) and name.startswith("Iteration Start:"):
+                    start_ts = data.get("ts")
+                    end_event = None
+                    last_end_event_before_start = last_end_event
+
+                builder.append(data)
+
+            profile.events = builder.build()
+            if progress is not None:
+                progress.update(stream.bytes_read, len(profile.events))
+                if compressed:
+                    progress.add_stage("decompress", *stream.decompression)
+            profile.data_schema_version = stream.metadata.get("schemaVersion", None)
+            profile.distributed_info = stream.metadata.get("distributedInfo", None)
+            profile.device_props = stream.metadata.get("deviceProperties", None)
+
+            patches = stream.get_patches()
+            if patches:
+                logger.warning("Replace %d invalid N/A values in %s" % (len(patches), trace_path))
+            if start_ts is not None:
+                if end_event is None:
+                    end_event = last_end_event_before_start
+                if end_event is not None and end_event[0] - start_ts > MAX_RECORD_WINDOW_DURATION:
+                    patches.append(stream.get_removal(end_event[1]))
+
+        if patches:
+            # The trace shown in the browser must be patched too. Only the patched spans are
+            # rewritten and the rest of the text is copied as is.
+            temp_file = caches.create_temp_file(suffix='.json.gz')
+            write_patched_trace(local_file, compressed, temp_file, patches)
+            profile.trace_file_path = temp_file
+
+        return profile
+
+    @staticmethod
+    def _preprocess_file(caches, trace_path, progress=None):
+        if not io.exists(trace_path):
+            raise FileNotFoundError(trace_path)
+
+        local_file = caches.get_remote_cache(trace_path)
+        # decompress from the mapping of the file, without a copy of the compressed data.
+        compressed = trace_path.endswith('.gz')
+        with io.open_mapped(local_file, compressed) as f:
+            data = f.read()
+            if progress is not None and compressed:
+                progress.add_stage("decompress", f.decompress_seconds, f.decompressed_bytes)
 
         json_reencode = False
         try:
@@ -135,23 +219,32 @@ class RunProfileData(object):
 
         if start_index is not None and end_index is not None:
             dur = event_list[end_index]["ts"] - event_list[start_index]["ts"]
-            if dur > 24 * 3600 * 1000:
+            if dur > MAX_RECORD_WINDOW_DURATION:
                 del trace_json["traceEvents"][end_index]
                 json_reencode = True
 
         if json_reencode:
-            fp = tempfile.NamedTemporaryFile('w+t', suffix='.json.gz', delete=False)
-            fp.close()
-            with gzip.open(fp.name, mode='wt') as fzip:
+            temp_file = caches.create_temp_file(suffix='.json.gz')
+            with gzip.open(temp_file, mode='wt') as fzip:
                 fzip.write(json.dumps(trace_json))
-            caches.add_file(local_file, fp.name)
-            trace_path = fp.name
+            trace_path = temp_file
 
         return trace_path, trace_json
 
     def process(self):
+        self.events = to_event_table(self.events)
+
+        # All the parsers consume the events in a single pass over the table.
+        dispatcher = EventDispatcher()
         parser = EventParser()
-        node_context = parser.parse(self.events)
+        parser.register_consumers(dispatcher)
+        gpu_metrics_parser = GPUMetricsParser()
+        gpu_metrics_parser.register_consumers(dispatcher)
+        memory_parser = MemoryParser()
+        memory_parser.register_consumers(dispatcher)
+        dispatcher.dispatch(self.events)
+
+        node_context = parser.finish()
 
         self.has_runtime = parser.has_runtime
         self.has_kernel = parser.has_kernel
@@ -185,9 +278,8 @@ class RunProfileData(object):
 
         logger.debug("GPUMetricsParser")
         self.runtime_node_list = parser.runtime_node_list
-        gpu_metrics_parser = GPUMetricsParser()
-        gpu_metrics_parser.parse_events(self.events, parser.global_start_ts, parser.global_end_ts,
-                                        parser.steps[0][0], parser.steps[-1][1])
+        gpu_metrics_parser.calculate_gpu_metrics(parser.global_start_ts, parser.global_end_ts,
+                                                 parser.steps[0][0], parser.steps[-1][1])
         self.gpu_ids = gpu_metrics_parser.gpu_ids
         self.gpu_utilization = gpu_metrics_parser.gpu_utilization
         self.sm_efficiency = gpu_metrics_parser.avg_approximated_sm_efficiency_per_device
@@ -197,8 +289,7 @@ class RunProfileData(object):
         self.blocks_per_sm_count = gpu_metrics_parser.blocks_per_sm_count
         self.occupancy_count = gpu_metrics_parser.occupancy_count
 
-        memory_parser = MemoryParser(module_parser.tid2tree, module_parser.op_list_groupby_name)
-        memory_parser.parse_events(self.events)
+        memory_parser.update_nodes(module_parser.tid2tree, module_parser.op_list_groupby_name)
         self.memory_stats = memory_parser.get_memory_statistics()
 
         if self.has_kernel:
@@ -7,14 +7,17 @@ from enum import IntEnum
 
 from .. import utils
 from .communication import generate_communication_nodes
+from .event_table import EventDispatcher
 from .node import (CommunicationNode, DeviceNode, OperatorNode,
                    ProfilerStepNode, RuntimeNode)
-from .range_utils import merge_ranges
-from .trace import EventTypes
+from .range_utils import IntervalSet
+from .trace import EventTypes, Supported_EventTypes
 
 logger = utils.get_logger()
 
 CommunicationOpNameSet = ['nccl:broadcast', 'nccl:reduce', 'nccl:all_reduce', 'nccl:all_gather', 'nccl:reduce_scatter']
+# All the event types except the memory events, which are handled by the MemoryParser.
+NODE_EVENT_TYPES = [t for t in Supported_EventTypes if t != EventTypes.MEMORY] + [EventTypes.PROFILER_STEP]
 ProfileRole = IntEnum('ProfileRole', ['Kernel', 'Memcpy', 'Memset', 'Communication', 'Runtime', 'DataLoader', 'CpuOp', 'Other', 'Total'], start=0)
 
 
@@ -45,7 +48,14 @@ class NodeParserMixin:
         self.use_ddp = False
         self.use_nccl = False
 
-    def parse_nodes(self, events):
+        self.tid2list = defaultdict(list) # value is a list of OperatorNode and ProfilerStepNode. Do not include RuntimeNode
+        self.tid2zero_rt_list = defaultdict(list)  # value is a list of RuntimeNode with external_id=0. They will be attached to root nodes.
+        self.corrid_to_device = defaultdict(list)  # value is a list of DeviceNode
+
+        self.corrid_to_runtime = {}  # value is a RuntimeNode
+        self.externalid_to_runtime = defaultdict(list)  # value is a list of RuntimeNode
+
+    def register_node_consumers(self, dispatcher):
         # For OperatorNode and ProfilerStepNode:
         #   Use time interval containing relationship to build father-child correlation,
         #   which is consistent with autograd profiler.
@@ -53,24 +63,18 @@ class NodeParserMixin:
         #   Use external_id to build correlation with its father OperatorNode or ProfilerStepNode.
         #   Because in the case when RuntimeNode has duration 0 and starts at same time as a OperatorNode,
         #   just use interval containing relationship can't tell it is child or brother of the OperatorNode.
-        tid2list = defaultdict(list) # value is a list of OperatorNode and ProfilerStepNode. Do not include RuntimeNode
-        tid2zero_rt_list = defaultdict(list)  # value is a list of RuntimeNode with external_id=0. They will be attached to root nodes.
-        corrid_to_device = defaultdict(list)  # value is a list of DeviceNode
-
-        corrid_to_runtime = {}  # value is a RuntimeNode
-        externalid_to_runtime = defaultdict(list)  # value is a list of RuntimeNode
+        dispatcher.register(self._parse_node, *NODE_EVENT_TYPES)
 
-        for event in events:
-            if event.type == EventTypes.MEMORY:
-                continue
-            self._parse_node(event, corrid_to_device, corrid_to_runtime, externalid_to_runtime, tid2list, tid2zero_rt_list)
-
-        for event in events:
-            if event.type == EventTypes.KERNEL:
-                self._update_communication_node(event)
+    def finish_nodes(self):
+        # The communication nodes are only complete after all the events are parsed.
+        if self.communication_data:
+            for device_node in self.device_node_list:
+                if device_node.type == EventTypes.KERNEL:
+                    self._update_communication_node(device_node)
 
         # associate CUDA Runtimes with CPU events
-        for _, op_list in tid2list.items():
+        externalid_to_runtime = self.externalid_to_runtime
+        for _, op_list in self.tid2list.items():
             for op in op_list:
                 runtime_nodes = externalid_to_runtime.pop(op.external_id, [])
                 if runtime_nodes:
@@ -80,17 +84,15 @@ class NodeParserMixin:
                 logger.warning("{} Runtime with external id {} don't correlate to any operator!".format(
                     len(externalid_to_runtime[ext_id]), ext_id))
 
-        return NodeContext(tid2list, tid2zero_rt_list, corrid_to_device)
+        return NodeContext(self.tid2list, self.tid2zero_rt_list, self.corrid_to_device)
 
-    def _update_communication_node(self, event):
-        '''Update the communication node by using the TraceEvent instance'''
-        external_id = event.external_id
+    def _update_communication_node(self, device_node):
+        '''Update the communication node by using the DeviceNode of the kernel'''
+        external_id = device_node.external_id
         comm_node = self.communication_data.get(external_id)
         if comm_node:
-            ts = event.ts
-            dur = event.duration
-            comm_node.kernel_ranges.append((ts, ts + dur))
-            comm_node.total_time += dur
+            comm_node.kernel_ranges.append((device_node.start_time, device_node.end_time))
+            comm_node.total_time += device_node.end_time - device_node.start_time
 
         return comm_node is not None
 
@@ -160,8 +162,10 @@ class NodeParserMixin:
 
         return StepContext(prev_step_end_time, steps_device, steps_matched_device_nodes)
 
-    def _parse_node(self, event, corrid_to_device, corrid_to_runtime, externalid_to_runtime, tid2list, tid2zero_rt_list):
-        corrid = event.args.get("correlation", None)
+    def _parse_node(self, event):
+        corrid_to_device = self.corrid_to_device
+        corrid_to_runtime = self.corrid_to_runtime
+        corrid = event.correlation
         tid = event.tid
         if event.type in [EventTypes.KERNEL, EventTypes.MEMCPY, EventTypes.MEMSET]:
             self.used_devices.add(event.pid)
@@ -183,11 +187,11 @@ class NodeParserMixin:
             device_nodes = corrid_to_device.pop(corrid, None)
             rt_node = RuntimeNode.create(event, device_nodes)
             corrid_to_runtime[corrid] = rt_node
-            externalid_to_runtime[rt_node.external_id].append(rt_node)
+            self.externalid_to_runtime[rt_node.external_id].append(rt_node)
             # Some runtimes has external_id 0, which will not be correlated to any operator.
             # So get them and attach them to root node.
             if rt_node.external_id == 0:
-                tid2zero_rt_list[tid].append(rt_node)
+                self.tid2zero_rt_list[tid].append(rt_node)
             self.runtime_node_list.append(rt_node)
 
             # check the external_id
@@ -208,7 +212,7 @@ class NodeParserMixin:
                 self.use_dp = True
             if event.name == "DistributedDataParallel.forward":
                 self.use_ddp = True
-            tid2list[int(tid)].append(op_node)
+            self.tid2list[int(tid)].append(op_node)
 
 
 class StepParser:
@@ -228,16 +232,22 @@ class StepParser:
         # If not exists, assign global_min_ts and global_max_ts to them.
         self.global_start_ts = sys.maxsize
         self.global_end_ts = -sys.maxsize - 1
+        # (start, end, external_id) of the kernels, they are split into Kernel and Communication by finish_steps.
+        self.kernel_ranges = []
+
+    def register_step_consumers(self, dispatcher):
+        dispatcher.register(self._parse_step, *NODE_EVENT_TYPES)
+
+    def finish_steps(self, comm_nodes):
+        # The communication nodes are only known after all the events are parsed,
+        # so the kernel ranges are classified here.
+        for ts, end, external_id in self.kernel_ranges:
+            if external_id in comm_nodes:
+                self.role_ranges[ProfileRole.Communication].append((ts, end))
+            else:
+                self.role_ranges[ProfileRole.Kernel].append((ts, end))
+        self.kernel_ranges = []
 
-    def parse_steps(self, events, comm_nodes):
-        for event in events:
-            if event.type == EventTypes.MEMORY:
-                continue
-
-            self._parse_step(event, comm_nodes)
-            if event.type == EventTypes.TRACE and event.name == "PyTorch Profiler (0)":
-                self.global_start_ts = event.ts
-                self.global_end_ts = event.ts + event.duration
         if self.global_start_ts == sys.maxsize:
             self.global_start_ts = self.global_min_ts
         if self.global_end_ts == -sys.maxsize - 1:
@@ -248,7 +258,7 @@ class StepParser:
             self.steps_names.append("0")
 
         for i in range(len(self.role_ranges)):
-            self.role_ranges[i] = merge_ranges(self.role_ranges[i])
+            self.role_ranges[i] = IntervalSet.from_ranges(self.role_ranges[i])
 
     @property
     def has_runtime(self):
@@ -266,15 +276,12 @@ class StepParser:
     def has_memcpy_or_memset(self):
         return bool(self.role_ranges[ProfileRole.Memcpy] or self.role_ranges[ProfileRole.Memset])
 
-    def _parse_step(self, event, comm_nodes):
+    def _parse_step(self, event):
         ts = event.ts
         dur = event.duration
         evt_type = event.type
         if evt_type == EventTypes.KERNEL:
-            if event.external_id in comm_nodes:
-                self.role_ranges[ProfileRole.Communication].append((ts, ts + dur))
-            else:
-                self.role_ranges[ProfileRole.Kernel].append((ts, ts + dur))
+            self.kernel_ranges.append((ts, ts + dur, event.external_id))
         elif evt_type == EventTypes.MEMCPY:
             self.role_ranges[ProfileRole.Memcpy].append((ts, ts + dur))
         elif evt_type == EventTypes.MEMSET:
@@ -298,6 +305,10 @@ class StepParser:
         self.global_min_ts = min(self.global_min_ts, ts)
         self.global_max_ts = max(self.global_max_ts, ts + dur)
 
+        if evt_type == EventTypes.TRACE and event.name == "PyTorch Profiler (0)":
+            self.global_start_ts = ts
+            self.global_end_ts = ts + dur
+
     def update_steps_duration(self, context):
         '''Update self.steps considering device side events launched by each host side step.
         Update self.steps_names if some tail steps are removed.'''
@@ -349,9 +360,20 @@ class EventParser(NodeParserMixin, StepParser):
     def __init__(self):
         super().__init__()
 
+    def register_consumers(self, dispatcher):
+        self.register_node_consumers(dispatcher)
+        self.register_step_consumers(dispatcher)
+
     def parse(self, events):
-        node_context = self.parse_nodes(events)
-        self.parse_steps(events, self.communication_data)
+        dispatcher = EventDispatcher()
+        self.register_consumers(dispatcher)
+        dispatcher.dispatch(events)
+        return self.finish()
+
+    def finish(self):
+        '''Complete the parsing once all the events are dispatched to the consumers.'''
+        node_context = self.finish_nodes()
+        self.finish_steps(self.communication_data)
 
         # Move the interleaved logic out of each NodeParser and StepParser
         steps_context = self.find_device_steps(self.steps)
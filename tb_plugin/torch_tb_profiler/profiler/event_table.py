@@ -0,0 +1,395 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# --------------------------------------------------------------------------
+from array import array
+from collections import defaultdict
+
+import numpy as np
+
+from .. import utils
+from .trace import DeviceType, EventTypes, get_event_type
+
+__all__ = ["EventDispatcher", "EventTable", "EventTableBuilder", "to_event_table"]
+
+logger = utils.get_logger()
+
+# The type codes stored in the type column.
+EVENT_TYPES = [EventTypes.TRACE, EventTypes.OPERATOR, EventTypes.PROFILER_STEP, EventTypes.RUNTIME,
+               EventTypes.KERNEL, EventTypes.MEMCPY, EventTypes.MEMSET, EventTypes.PYTHON, EventTypes.MEMORY]
+TYPE_CODES = {t: i for i, t in enumerate(EVENT_TYPES)}
+
+# Marks a missing value in the integer columns.
+NO_VALUE = np.iinfo(np.int64).min
+
+# The number of rows materialized at a time when iterating the table.
+ROW_BLOCK_SIZE = 64 * 1024
+
+
+class _NumberColumn(object):
+    '''Store the numbers as integers until a non-integral value is appended, and as floats after that,
+    so that the integers are exact. The values whose python type differs from the column and the
+    missing values are marked, so that the values read back keep the python type of the trace and None.'''
+    INT = 0
+    FLOAT = 1
+    MISSING = 2
+
+    def __init__(self):
+        self.values = array('q')
+        self.kinds = bytearray()
+
+    def append(self, value):
+        if value is None:
+            self.kinds.append(self.MISSING)
+            self.values.append(0)
+            return
+
+        if isinstance(value, float):
+            self.kinds.append(self.FLOAT)
+            if self.values.typecode == 'q':
+                if value.is_integer() and -2 ** 63 <= value < 2 ** 63:
+                    self.values.append(int(value))
+                    return
+                self.values = array('d', self.values)
+        else:
+            self.kinds.append(self.INT)
+        self.values.append(value)
+
+    def build(self):
+        '''Return the numpy array of the values, and the masks of the missing and retyped values,
+        which are None if there is no such value.'''
+        is_int = self.values.typecode == 'q'
+        values = np.frombuffer(self.values, dtype=np.int64 if is_int else np.float64)
+        kinds = np.frombuffer(self.kinds, dtype=np.uint8)
+        missing = kinds == self.MISSING
+        retyped = kinds == (self.FLOAT if is_int else self.INT)
+        return values, missing if missing.any() else None, retyped if retyped.any() else None
+
+
+class _InternedColumn(object):
+    '''Store the index of each value in a list of unique values.'''
+
+    def __init__(self):
+        self.indexes = array('i')
+        self.values = []
+        self._value_to_index = {}
+
+    def append(self, value):
+        index = self._value_to_index.get(value)
+        if index is None:
+            index = len(self.values)
+            self._value_to_index[value] = index
+            self.values.append(value)
+        self.indexes.append(index)
+
+    def to_numpy(self):
+        return np.frombuffer(self.indexes, dtype=np.int32)
+
+
+def _get_int(args, key):
+    value = args.get(key)
+    return NO_VALUE if value is None else int(value)
+
+
+def _get_float(args, key):
+    value = args.get(key)
+    return np.nan if value is None else value
+
+
+class EventTableBuilder(object):
+    """Append events one by one and build the EventTable at the end.
+    Only the args used by the parsers are kept, the other ones are dropped right away.
+    """
+
+    def __init__(self):
+        self._types = array('b')
+        self._names = _InternedColumn()
+        self._ts = _NumberColumn()
+        self._duration = _NumberColumn()
+        self._pids = _InternedColumn()
+        self._tids = _InternedColumn()
+        self._external_id = array('q')
+        self._correlation = array('q')
+        self._device = array('q')
+        self._blocks_per_sm = array('d')
+        self._occupancy = array('d')
+        self._device_type = array('q')
+        self._device_id = array('q')
+        self._bytes = array('q')
+        # Interned to the names since the stacks are repeated by each call of the operator.
+        self._call_stack = array('i')
+        self._input_shape = []
+        self._input_type = []
+
+    def __len__(self):
+        return len(self._types)
+
+    def append(self, data):
+        """Append a raw event of the trace json. Return False if the event is not used by the profiler."""
+        try:
+            type = get_event_type(data)
+            if type is None:
+                return False
+
+            self._append(type, data.get("name"), data.get("ts"), data.get("dur"), data.get("pid"), data.get("tid"),
+                         data.get("args", {}))
+            return True
+        except Exception as ex:
+            logger.warning("Failed to parse profile event. Exception=%s. Event=%s", ex, data, exc_info=True)
+            raise
+
+    def append_event(self, event):
+        """Append a TraceEvent or MemoryEvent created by trace.create_event."""
+        self._append(event.type, event.name, event.ts, getattr(event, "duration", None), event.pid, event.tid,
+                     event.args)
+
+    def _append(self, type, name, ts, duration, pid, tid, args):
+        self._types.append(TYPE_CODES[type])
+        self._names.append(name)
+        self._ts.append(ts)
+        self._duration.append(duration)
+        self._pids.append(pid)
+        self._tids.append(tid)
+
+        external_id = args.get("external id")
+        if external_id is None:
+            external_id = args.get("External id")
+        self._external_id.append(NO_VALUE if external_id is None else external_id)
+        self._correlation.append(_get_int(args, "correlation"))
+        self._device.append(_get_int(args, "device"))
+        self._blocks_per_sm.append(_get_float(args, "blocks per SM"))
+        self._occupancy.append(_get_float(args, "est. achieved occupancy %"))
+
+        if type == EventTypes.MEMORY:
+            self._device_type.append(_get_int(args, "Device Type"))
+            self._device_id.append(_get_int(args, "Device Id"))
+            self._bytes.append(int(args.get("Bytes", 0)))
+        else:
+            self._device_type.append(NO_VALUE)
+            self._device_id.append(NO_VALUE)
+            self._bytes.append(0)
+
+        if type in (EventTypes.PYTHON, EventTypes.OPERATOR, EventTypes.PROFILER_STEP):
+            self._names.append(args.get("Call stack", ""))
+            self._call_stack.append(self._names.indexes.pop())
+            shape = args.get("Input Dims")
+            if shape is None:
+                shape = args.get("Input dims")
+            self._input_shape.append(shape)
+            self._input_type.append(args.get("Input type"))
+        else:
+            self._call_stack.append(-1)
+            self._input_shape.append(None)
+            self._input_type.append(None)
+
+    def build(self):
+        ts, ts_missing, ts_retyped = self._ts.build()
+        duration, duration_missing, duration_retyped = self._duration.build()
+        return EventTable(
+            types=np.frombuffer(self._types, dtype=np.int8),
+            names=self._names.to_numpy(),
+            name_values=self._names.values,
+            ts=ts,
+            duration=duration,
+            pids=self._pids.to_numpy(),
+            pid_values=self._pids.values,
+            tids=self._tids.to_numpy(),
+            tid_values=self._tids.values,
+            external_id=np.frombuffer(self._external_id, dtype=np.int64),
+            correlation=np.frombuffer(self._correlation, dtype=np.int64),
+            device=np.frombuffer(self._device, dtype=np.int64),
+            blocks_per_sm=np.frombuffer(self._blocks_per_sm, dtype=np.float64),
+            occupancy=np.frombuffer(self._occupancy, dtype=np.float64),
+            device_type=np.frombuffer(self._device_type, dtype=np.int64),
+            device_id=np.frombuffer(self._device_id, dtype=np.int64),
+            bytes=np.frombuffer(self._bytes, dtype=np.int64),
+            call_stack=np.frombuffer(self._call_stack, dtype=np.int32),
+            input_shape=self._input_shape,
+            input_type=self._input_type,
+            ts_masks=(ts_missing, ts_retyped),
+            duration_masks=(duration_missing, duration_retyped))
+
+
+class EventRow(object):
+    """A read-only view of one event of the table, with the same attributes as TraceEvent and MemoryEvent."""
+    __slots__ = ["type", "name", "ts", "duration", "pid", "tid", "external_id", "correlation", "device",
+                 "blocks_per_sm", "occupancy", "callstack", "input_shape", "input_type",
+                 "device_id", "bytes", "_device_type"]
+
+    @property
+    def step(self):
+        # torch.profiler.profile.step will invoke record_function with name like "ProfilerStep#5"
+        return int(self.name.split("#")[1])
+
+    @property
+    def scope(self):
+        # Only the memory events with thread scope are kept in the table.
+        return "t"
+
+    @property
+    def device_type(self):
+        if self._device_type is None:
+            return None
+
+        try:
+            return DeviceType(self._device_type)
+        except ValueError:
+            return None
+
+
+class EventTable(object):
+    """Columnar store of the trace events.
+
+    Each column is a typed numpy array with one item per event. The names, pids and tids are
+    stored as indexes into the lists of unique values. Missing integer values are NO_VALUE,
+    missing float values are NaN. The missing ts and duration are 0 in their arrays and marked by
+    their masks, with the values stored in the other type than their array.
+    """
+
+    def __init__(self, types, names, name_values, ts, duration, pids, pid_values, tids, tid_values,
+                 external_id, correlation, device, blocks_per_sm, occupancy, device_type, device_id, bytes,
+                 call_stack, input_shape, input_type, ts_masks=(None, None), duration_masks=(None, None)):
+        self.types = types
+        self.names = names
+        self.name_values = name_values
+        self.ts = ts
+        self.duration = duration
+        self.pids = pids
+        self.pid_values = pid_values
+        self.tids = tids
+        self.tid_values = tid_values
+        self.external_id = external_id
+        self.correlation = correlation
+        self.device = device
+        self.blocks_per_sm = blocks_per_sm
+        self.occupancy = occupancy
+        self.device_type = device_type
+        self.device_id = device_id
+        self.bytes = bytes
+        self.call_stack = call_stack
+        self.input_shape = input_shape
+        self.input_type = input_type
+        # (mask of the missing values or None, mask of the values stored in the other type or None)
+        self.ts_masks = ts_masks
+        self.duration_masks = duration_masks
+
+    @classmethod
+    def from_events(cls, events):
+        builder = EventTableBuilder()
+        for event in events:
+            builder.append_event(event)
+        return builder.build()
+
+    def __len__(self):
+        return len(self.types)
+
+    def __iter__(self):
+        return self.rows()
+
+    def mask(self, *types):
+        """Return the boolean mask of the events in the given types."""
+        return np.isin(self.types, [TYPE_CODES[t] for t in types])
+
+    def indexes(self, *types):
+        return np.flatnonzero(self.mask(*types))
+
+    def get_names(self, indexes):
+        return [self.name_values[i] for i in self.names[indexes].tolist()]
+
+    def get_pids(self, indexes):
+        return [self.pid_values[i] for i in self.pids[indexes].tolist()]
+
+    def get_tids(self, indexes):
+        return [self.tid_values[i] for i in self.tids[indexes].tolist()]
+
+    def rows(self, indexes=None):
+        """Yield the EventRow of the events in order. The rows are materialized block by block,
+        so only a small part of the table is held as python objects at any time."""
+        if indexes is None:
+            indexes = np.arange(len(self))
+
+        for start in range(0, len(indexes), ROW_BLOCK_SIZE):
+            block = indexes[start:start + ROW_BLOCK_SIZE]
+            columns = zip(
+                self.types[block].tolist(),
+                self.get_names(block),
+                _get_numbers(self.ts, self.ts_masks, block),
+                _get_numbers(self.duration, self.duration_masks, block),
+                self.get_pids(block),
+                self.get_tids(block),
+                self.external_id[block].tolist(),
+                self.correlation[block].tolist(),
+                self.device[block].tolist(),
+                self.blocks_per_sm[block].tolist(),
+                self.occupancy[block].tolist(),
+                self.call_stack[block].tolist(),
+                self.device_type[block].tolist(),
+                self.device_id[block].tolist(),
+                self.bytes[block].tolist(),
+                block.tolist())
+            for (type, name, ts, duration, pid, tid, external_id, correlation, device, blocks_per_sm, occupancy,
+                 call_stack, device_type, device_id, bytes, index) in columns:
+                row = EventRow()
+                row.type = EVENT_TYPES[type]
+                row.name = name
+                row.ts = ts
+                row.duration = duration
+                row.pid = pid
+                row.tid = tid
+                row.external_id = None if external_id == NO_VALUE else external_id
+                row.correlation = None if correlation == NO_VALUE else correlation
+                row.device = None if device == NO_VALUE else device
+                row.blocks_per_sm = None if blocks_per_sm != blocks_per_sm else blocks_per_sm
+                row.occupancy = None if occupancy != occupancy else occupancy
+                row.callstack = "" if call_stack < 0 else self.name_values[call_stack]
+                row.input_shape = self.input_shape[index]
+                row.input_type = self.input_type[index]
+                row._device_type = None if device_type == NO_VALUE else device_type
+                row.device_id = None if device_id == NO_VALUE else device_id
+                row.bytes = bytes
+                yield row
+
+
+def _get_numbers(values, masks, indexes):
+    '''Return the list of the numbers of the column at the indexes, in their python types and None if missing.'''
+    numbers = values[indexes].tolist()
+    missing, retyped = masks
+    if retyped is not None:
+        convert = float if values.dtype == np.int64 else int
+        for i in np.flatnonzero(retyped[indexes]).tolist():
+            numbers[i] = convert(numbers[i])
+    if missing is not None:
+        for i in np.flatnonzero(missing[indexes]).tolist():
+            numbers[i] = None
+    return numbers
+
+
+class EventDispatcher(object):
+    """Walk the event table once and route each event to the consumers registered for its type.
+
+    A consumer is a callable taking the EventRow. The parsers register their consumers with
+    `register_consumers(dispatcher)`, so that a new analysis can be plugged in without another
+    scan of the events. The consumers of an event are called in the order of their registration.
+    """
+
+    def __init__(self):
+        self._consumers = defaultdict(list)
+
+    def register(self, consumer, *types):
+        for type in types:
+            self._consumers[type].append(consumer)
+
+    def dispatch(self, events):
+        consumers = self._consumers
+        if not consumers:
+            return
+
+        for event in events.rows(events.indexes(*consumers.keys())):
+            for consumer in consumers[event.type]:
+                consumer(event)
+
+
+def to_event_table(events):
+    """Return the events as EventTable, the list of TraceEvent is converted."""
+    if isinstance(events, EventTable):
+        return events
+    return EventTable.from_events(events)
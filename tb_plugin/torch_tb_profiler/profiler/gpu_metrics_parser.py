@@ -2,9 +2,7 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # --------------------------------------------------------------------------
 from .. import consts, utils
-from .range_utils import (get_ranges_sum, intersection_ranges_lists,
-                          intersection_ranges_lists_with_value, merge_ranges,
-                          merge_ranges_with_value)
+from .range_utils import IntervalSet
 from .trace import EventTypes
 
 logger = utils.get_logger()
@@ -54,12 +52,10 @@ class GPUMetricsParser(object):
 
         gpu_utilization_timeline = [[] for _ in range(consts.MAX_GPU_PER_NODE)]
         for gpu_id in self.gpu_ids:
-            self.kernel_ranges_per_device[gpu_id] = merge_ranges(self.kernel_ranges_per_device[gpu_id])
+            kernel_ranges = IntervalSet.from_ranges(self.kernel_ranges_per_device[gpu_id])
 
             # Top-level number still consider steps, to be consistent with overview's breakdown.
-            kernel_ranges_all_steps = intersection_ranges_lists(
-                self.kernel_ranges_per_device[gpu_id], [(steps_start_time, steps_end_time)])
-            ranges_sum = get_ranges_sum(kernel_ranges_all_steps)
+            ranges_sum = kernel_ranges.clip(steps_start_time, steps_end_time).sum()
             self.gpu_utilization[gpu_id] = ranges_sum / (steps_end_time - steps_start_time)
 
             # The timeline will use "PyTorch Profiler (0)" as start,
@@ -72,36 +68,10 @@ class GPUMetricsParser(object):
                                        global_start_time + (i + 1) * bucket_size if i < buckets - 1
                                        else global_end_time))  # The last bucket may be longer.
             gpu_utilization_timeline[gpu_id] = [0] * buckets
-            if len(self.kernel_ranges_per_device[gpu_id]) > 0:
-                current_range_index = 0
-                current_range = self.kernel_ranges_per_device[gpu_id][current_range_index]
-                current_bucket_index = 0
-                current_bucket = buckets_ranges[0]
-                while current_range_index < len(self.kernel_ranges_per_device[gpu_id]) and current_bucket_index < buckets:
-                    if current_bucket[1] <= current_range[0]:
-                        current_bucket_index += 1
-                        current_bucket = buckets_ranges[current_bucket_index] if current_bucket_index < buckets \
-                            else None
-                    elif current_bucket[0] >= current_range[1]:
-                        current_range_index += 1
-                        if current_range_index < len(self.kernel_ranges_per_device[gpu_id]):
-                            current_range = self.kernel_ranges_per_device[gpu_id][current_range_index]
-                    else:
-                        left_bound = max(current_range[0], current_bucket[0])
-                        right_bound = min(current_range[1], current_bucket[1])
-                        gpu_utilization_timeline[gpu_id][current_bucket_index] += (right_bound - left_bound)
-                        if current_bucket[1] < current_range[1]:
-                            current_bucket_index += 1
-                            current_bucket = buckets_ranges[current_bucket_index] if current_bucket_index < buckets \
-                                else None
-                        else:
-                            current_range_index += 1
-                            if current_range_index < len(self.kernel_ranges_per_device[gpu_id]):
-                                current_range = self.kernel_ranges_per_device[gpu_id][current_range_index]
-                for i_bucket in range(buckets):
-                    bucket_size = buckets_ranges[i_bucket][1] - buckets_ranges[i_bucket][0]
-                    gpu_utilization_timeline[gpu_id][i_bucket] /= bucket_size
-                    start_time = buckets_ranges[i_bucket][0]
+            if len(kernel_ranges) > 0:
+                for i_bucket, (start_time, end_time) in enumerate(buckets_ranges):
+                    gpu_utilization_timeline[gpu_id][i_bucket] = \
+                        kernel_ranges.clip(start_time, end_time).sum() / (end_time - start_time)
                     self.gpu_util_buckets[gpu_id].append((start_time, gpu_utilization_timeline[gpu_id][i_bucket]))
                 start_time = buckets_ranges[-1][1]
                 self.gpu_util_buckets[gpu_id].append((start_time, 0))
@@ -110,28 +80,25 @@ class GPUMetricsParser(object):
 
     def calculate_approximated_sm_efficiency(self, steps_start_time, steps_end_time):
         def calculate_avg(approximated_sm_efficiency_ranges, total_dur):
-            total_weighted_sm_efficiency = 0.0
-            for r in approximated_sm_efficiency_ranges:
-                dur = r[1] - r[0]
-                total_weighted_sm_efficiency += r[2] * dur
+            total_weighted_sm_efficiency = approximated_sm_efficiency_ranges.weighted_sum()
             avg_approximated_sm_efficiency = total_weighted_sm_efficiency / total_dur
             return avg_approximated_sm_efficiency
 
         total_dur = steps_end_time - steps_start_time
         for gpu_id in self.gpu_ids:
             blocks_per_sm_ranges = self.blocks_per_sm_per_device[gpu_id]
-            approximated_sm_efficiency_ranges = merge_ranges_with_value(blocks_per_sm_ranges)
+            approximated_sm_efficiency_ranges = IntervalSet.from_ranges_with_value(blocks_per_sm_ranges)
             # To be consistent with GPU utilization, here it must also intersect with all steps,
             # in order to remove the kernels out of steps range.
-            approximated_sm_efficiency_ranges_all_steps = intersection_ranges_lists_with_value(
-                approximated_sm_efficiency_ranges, [(steps_start_time, steps_end_time)])
+            approximated_sm_efficiency_ranges_all_steps = approximated_sm_efficiency_ranges.clip(
+                steps_start_time, steps_end_time)
             if len(approximated_sm_efficiency_ranges_all_steps) > 0:
                 avg_approximated_sm_efficiency = calculate_avg(approximated_sm_efficiency_ranges_all_steps, total_dur)
                 self.avg_approximated_sm_efficiency_per_device[gpu_id] = avg_approximated_sm_efficiency
 
             # The timeline still uses all kernels including out of steps scope's.
             if len(approximated_sm_efficiency_ranges) > 0:
-                self.approximated_sm_efficiency_ranges[gpu_id] = approximated_sm_efficiency_ranges
+                self.approximated_sm_efficiency_ranges[gpu_id] = approximated_sm_efficiency_ranges.to_ranges()
 
         self.blocks_per_sm_per_device = None  # Release memory.
 
@@ -151,12 +118,18 @@ class GPUMetricsParser(object):
             if total_time > 0:
                 self.avg_occupancy_per_device[gpu_id] = total_occupancy / total_time
 
+    def register_consumers(self, dispatcher):
+        dispatcher.register(self.parse_event, EventTypes.KERNEL)
+
     def parse_events(self, events, global_start_time, global_end_time, steps_start_time, steps_end_time):
         logger.debug("GPU Metrics, parse events")
-        for event in events:
-            if event.type == EventTypes.KERNEL:
-                self.parse_event(event)
+        for event in events.rows(events.indexes(EventTypes.KERNEL)):
+            self.parse_event(event)
+
+        self.calculate_gpu_metrics(global_start_time, global_end_time, steps_start_time, steps_end_time)
 
+    def calculate_gpu_metrics(self, global_start_time, global_end_time, steps_start_time, steps_end_time):
+        '''Calculate the metrics once all the kernels are parsed.'''
         self.calculate_gpu_utilization(global_start_time, global_end_time, steps_start_time, steps_end_time)
         self.calculate_approximated_sm_efficiency(steps_start_time, steps_end_time)
         self.calculate_occupancy(steps_start_time, steps_end_time)
@@ -164,7 +137,7 @@ class GPUMetricsParser(object):
     def parse_event(self, event):
         ts = event.ts
         dur = event.duration
-        gpu_id = event.args.get("device", None)
+        gpu_id = event.device
         if gpu_id != event.pid:
             logger.warning("pid '{}' is not equal to args.device '{}' on event with ts '{}'".format(
                 event.pid, gpu_id, event.ts))
@@ -172,8 +145,8 @@ class GPUMetricsParser(object):
             if gpu_id not in self.gpu_ids:
                 self.gpu_ids.add(gpu_id)
             self.kernel_ranges_per_device[gpu_id].append((ts, ts + dur))
-            if "blocks per SM" in event.args:
-                blocks_per_sm = event.args.get("blocks per SM")
+            blocks_per_sm = event.blocks_per_sm
+            if blocks_per_sm is not None:
                 if blocks_per_sm > 0.0:
                     self.blocks_per_sm_per_device[gpu_id].append((ts, ts + dur, blocks_per_sm))
                     self.blocks_per_sm_count[gpu_id] += 1
@@ -181,8 +154,8 @@ class GPUMetricsParser(object):
                     # Workaround for negative value input.
                     logger.warning("blocks per SM {} with ts {} is not positive!".format(blocks_per_sm, ts))
 
-            if "est. achieved occupancy %" in event.args:
-                occupancy = event.args.get("est. achieved occupancy %")
+            occupancy = event.occupancy
+            if occupancy is not None:
                 if occupancy >= 0.0:
                     self.occupancy_per_device[gpu_id].append((ts, ts + dur, occupancy))
                     self.occupancy_count[gpu_id] += 1
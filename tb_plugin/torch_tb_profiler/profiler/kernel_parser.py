@@ -12,15 +12,13 @@ class KernelParser:
         self.kernel_stat = None
 
     def parse_events(self, events):
-        events_dict = []
-        for event in events:
-            if event.type == EventTypes.KERNEL:
-                events_dict.append(vars(event))
-                events_dict[-1]["blocks_per_sm"] = event.args.get("blocks per SM", 0)
-                events_dict[-1]["occupancy"] = event.args.get("est. achieved occupancy %", 0)
-        events = events_dict
-        events = pd.DataFrame(events)
-        events = events.astype({"type": "category", "category": "category", "name": "string"}, copy=False)
+        # Build the frame from the columns of the kernels directly, the missing metrics are counted as 0.
+        indexes = events.indexes(EventTypes.KERNEL)
+        events = pd.DataFrame({
+            "name": pd.array(events.get_names(indexes), dtype="string"),
+            "duration": events.duration[indexes],
+            "blocks_per_sm": np.nan_to_num(events.blocks_per_sm[indexes], nan=0),
+            "occupancy": np.nan_to_num(events.occupancy[indexes], nan=0)})
 
         def weighted_avg(x):
             try:
@@ -4,29 +4,209 @@
 import bisect
 import os
 import sys
+import threading
+import time
 from collections import defaultdict
-from multiprocessing import Barrier, Process, Queue
+from concurrent.futures import Future, as_completed
+from functools import partial
 
 from .. import consts, io, utils
-from ..run import Run
+from ..run import PendingRunProfile, Run
+from . import transport
 from .data import DistributedRunProfileData, RunProfileData
+from .pool import ParsePool
+from .progress import STAGES, ProgressReporter, create_progress_file, get_fraction, read_progress
+from .profile_cache import ProfileCache
 from .run_generator import DistributedRunGenerator, RunGenerator
+from .trace_slice import TRACE_INDEX_MIN_SIZE_MB, TraceIndex, write_trace_index
+from .trace_stream import write_compressed_trace, write_projected_trace, write_trace_with_counters
 
 logger = utils.get_logger()
 
 
 class RunLoader(object):
-    def __init__(self, name, run_dir, caches):
+    """Load the profiles of a run directory.
+
+    The loader keeps the profiles of the parsed files, so that calling load again only parses
+    the new or changed trace files and rebuilds the distributed profiles of the spans whose files changed.
+    In the lazy mode, load only registers the trace files, which are parsed when materialize is called
+    for their worker and span. The profiles evicted by the residency are materialized in the same way.
+    With a ListingSnapshot, the trace files and their states are taken from the listing of the logdir.
+    With a ProfileCache, the generated profiles are stored on disk and reused instead of parsing the files again.
+    """
+
+    def __init__(self, name, run_dir, caches, lazy=False, residency=None, snapshot=None, profile_cache=None):
         self.run_name = name
         self.run_dir = run_dir
         self.caches = caches
-        self.queue = Queue()
+        self.profile_cache = profile_cache
+        self.lazy = lazy
+        self.residency = residency
+        self.snapshot = snapshot
+        # The Run built by the last load or materialize.
+        self.run = None
+
+        self._lock = threading.Lock()
+        # path => (state, worker, span index) of the parsed files and the files not parsed yet.
+        self._files = {}
+        self._pending = {}
+        # path => ((state, worker, span index), future) of the files being parsed.
+        self._parsing = {}
+        # futures of self._parsing whose results are being loaded by _collect.
+        self._collecting = set()
+        # path => views of the parsed files whose profiles are evicted.
+        self._evicted = {}
+        # path => progress file of the files being parsed, and the last progress of the parsed files.
+        self._progress_files = {}
+        self._last_progress = {}
+        self._load_start = None
+        self._profiles = {}
+        self._dist_data = {}
+        # span => (files of the span, distributed profile or None)
+        self._distributed_profiles = {}
+
+    @property
+    def state(self):
+        if self._parsing:
+            return "loading"
+        if self._pending:
+            return "pending"
+        return "loaded"
 
     def load(self):
+        """Return the Run with the profiles of all the trace files,
+        or None if no trace file is added, changed or removed since the last load."""
+        files = {}
+        if self.snapshot is not None:
+            states = self.snapshot.get_files(self.run_dir) or {}
+            for path, (worker, span) in self._list_files(states).items():
+                files[path] = (states[path], worker, span)
+        else:
+            for path, (worker, span) in self._list_files().items():
+                files[path] = (self._get_file_state(path), worker, span)
+
+        with self._lock:
+            known = dict(self._files)
+            known.update(self._pending)
+            known.update((path, file) for path, (file, _) in self._parsing.items())
+            changed = [path for path, file in files.items() if known.get(path) != file]
+            removed = [path for path in known if path not in files]
+            if self.run is not None and not changed and not removed:
+                return None
+
+            for path in removed:
+                logger.info("Trace file %s of Run %s is removed", path, self.run_name)
+                self._remove_file(path)
+            for path in changed:
+                self._remove_file(path)
+                self._pending[path] = files[path]
+            if not self.lazy:
+                submitted, jobs = self._submit(self._pending)
+
+        if not self.lazy:
+            self._start(jobs)
+            self._collect(submitted)
+        with self._lock:
+            return self._build_run()
+
+    def materialize(self, worker, span):
+        """Parse the files of the worker and span (the key of the profile in the Run, like "1" or "default"),
+        and return the updated Run, or None if there is no such file to parse.
+        The files of all the workers of the span are parsed if worker is 'All'."""
+        with self._lock:
+            files = {path: file for path, file in self._pending.items()
+                     if (worker == 'All' or file[1] == worker) and _get_span_key(file[2]) == span}
+            for path in self._evicted:
+                file = self._files[path]
+                if (worker == 'All' or file[1] == worker) and _get_span_key(file[2]) == span:
+                    files[path] = file
+            if not files:
+                return None
+            submitted, jobs = self._submit(files)
+
+        self._start(jobs)
+        self._collect(submitted)
+        with self._lock:
+            return self._build_run()
+
+    def get_progress(self):
+        """Return the loading progress of the run: the percent of the loaded bytes, the estimated seconds
+        to finish the files being parsed, and the wall time of the stages and the downloaded bytes summed
+        over the files."""
+        with self._lock:
+            total = done = 0.0
+            parsing_total = parsing_done = 0.0
+            stages = dict.fromkeys(STAGES, 0.0)
+            downloaded_bytes = 0
+            loaded_files = 0
+            files = dict(self._files)
+            files.update(self._pending)
+            for path, (state, _, _) in files.items():
+                weight = state.length if state is not None and state.length else 1
+                progress = None
+                if path in self._parsing:
+                    progress = read_progress(self._progress_files[path])
+                    fraction = get_fraction(progress)
+                    parsing_total += weight
+                    parsing_done += weight * fraction
+                elif path in self._pending:
+                    fraction = 0.0
+                else:
+                    fraction = 1.0
+                    progress = self._last_progress.get(path)
+                    loaded_files += 1
+                total += weight
+                done += weight * fraction
+                if progress is not None:
+                    for stage, seconds in progress["stages"].items():
+                        stages[stage] += seconds
+                    downloaded_bytes += progress.get("stage_bytes", {}).get("download", 0)
+
+            eta = None
+            if parsing_done > 0:
+                elapsed = time.time() - self._load_start
+                eta = round(elapsed * (parsing_total - parsing_done) / parsing_done, 1)
+
+            return {
+                "state": self.state,
+                "percent": round(100 * done / total, 1) if total else 100.0,
+                "eta": eta,
+                "files": len(files),
+                "loaded_files": loaded_files,
+                "stages": {stage: round(seconds, 3) for stage, seconds in stages.items()},
+                "downloaded_bytes": downloaded_bytes
+            }
+
+    def evict(self, worker, span):
+        """Drop the profile of the worker and span, and return True if it is evicted.
+        The profile is replaced by a placeholder in the Run, and parsed again by materialize."""
+        with self._lock:
+            for path, profile in self._profiles.items():
+                if profile.worker == worker and _get_span_key(profile.span) == span:
+                    break
+            else:
+                return False
+            del self._profiles[path]
+            self._evicted[path] = profile.views
+            self._build_run()
+            return True
+
+    def has_pending_communication(self, span):
+        """Return True if a parsed file of the span has communication and other files of the span are not parsed,
+        so that its distributed profile could only be built after parsing the others."""
+        with self._lock:
+            if not any(_get_span_key(file[2]) == span for file in self._pending.values()):
+                return False
+            return any(data.has_communication and _get_span_key(data.span) == span
+                       for data in self._dist_data.values())
+
+    def _list_files(self, names=None):
+        """Return path => (worker, span index) of the trace files in the run directory,
+        or of the given file names of the run directory."""
         workers = []
         spans_by_workers = defaultdict(list)
-        for path in io.listdir(self.run_dir):
-            if io.isdir(io.join(self.run_dir, path)):
+        for path in io.listdir(self.run_dir) if names is None else names:
+            if names is None and io.isdir(io.join(self.run_dir, path)):
                 continue
             match = consts.WORKER_PATTERN.match(path)
             if not match:
@@ -46,80 +226,180 @@ class RunLoader(object):
             for i, span in enumerate(span_array, 1):
                 span_index_map[(worker, span)] = i
 
-        barrier = Barrier(len(workers) + 1)
-        for worker, span, path in workers:
-            # convert the span timestamp to the index.
-            span_index = None if span is None else span_index_map[(worker, span)]
-            p = Process(target=self._process_data, args=(worker, span_index, path, barrier))
-            p.start()
+        # convert the span timestamp to the index.
+        return {path: (worker, None if span is None else span_index_map[(worker, span)])
+                for worker, span, path in workers}
+
+    def _submit(self, files):
+        """Register the files to parse, the files already being parsed are not registered again.
+        Return path => ((state, worker, span index), future), and the jobs to pass to _start
+        out of the lock, since the pool blocks until their memory fits in the budget."""
+        submitted = {}
+        jobs = []
+        for path, file in files.items():
+            if path not in self._parsing:
+                state, worker, span = file
+                length = state.length if state is not None and state.length else 0
+                if not self._parsing:
+                    self._load_start = time.time()
+                progress_file = create_progress_file()
+                # completed with the result of the parsing process once it is started.
+                future = Future()
+                self._parsing[path] = (file, future)
+                self._progress_files[path] = progress_file
+                jobs.append((future, path, (self.run_name, self.run_dir, worker, span, path), progress_file, length))
+            submitted[path] = self._parsing[path]
+        return submitted, jobs
 
+    def _start(self, jobs):
+        # The files are parsed by the pool shared with the other runs, and collected as soon as
+        # each one is done.
+        for future, path, args, progress_file, length in jobs:
+            memory = ParsePool.estimate_memory(path, length)
+            trace_path = io.join(self.run_dir, path)
+            if io.is_remote(trace_path):
+                # Download the file in this process with the shared clients, and parse it as soon as it lands.
+                download = io.DownloadManager.instance().prefetch(self.caches, trace_path,
+                                                                  ProgressReporter(progress_file, length))
+                download.add_done_callback(
+                    partial(_parse_downloaded, future, trace_path, args, self.caches, progress_file, length, memory,
+                            self.profile_cache))
+            else:
+                _parse(future, args, self.caches, progress_file, length, memory, self.profile_cache)
+
+    def _collect(self, submitted):
+        futures = {future: (path, file) for path, (file, future) in submitted.items()}
         logger.info("starting all processing")
-        # since there is one queue, its data must be read before join.
-        # https://stackoverflow.com/questions/31665328/python-3-multiprocessing-queue-deadlock-when-calling-join-before-the-queue-is-em
-        #   The queue implementation in multiprocessing that allows data to be transferred between processes relies on standard OS pipes.
-        #   OS pipes are not infinitely long, so the process which queues data could be blocked in the OS during the put()
-        #   operation until some other process uses get() to retrieve data from the queue.
-        # During my testing, I found that the maximum buffer length is 65532 in my test machine.
-        # If I increase the message size to 65533, the join would hang the process.
-        barrier.wait()
+        for future in as_completed(futures):
+            path, file = futures[future]
+            with self._lock:
+                if self._parsing.get(path, (None, None))[1] is not future or future in self._collecting:
+                    # collected by another thread, or the file is changed or removed meanwhile.
+                    continue
+                self._collecting.add(future)
+
+            # The results are passed by the handles of their files instead of through the pipe of the pool,
+            # so that the big profiles don't queue up behind each other. They are loaded out of the lock,
+            # which is only taken to attach them.
+            try:
+                handle = future.result()
+                size = transport.get_size(handle)
+                r, d = transport.load(handle)
+            except Exception as ex:
+                # The process parsing the file crashed, like killed by the OOM killer.
+                logger.warning("Failed to parse profile data for Run %s on %s. Exception=%s",
+                               self.run_name, file[1], ex)
+                r = d = None
+
+            with self._lock:
+                self._collecting.discard(future)
+                if self._parsing.get(path, (None, None))[1] is not future:
+                    # the file is changed or removed while loading its result.
+                    continue
+                del self._parsing[path]
+                progress_file = self._progress_files.pop(path)
+                progress = read_progress(progress_file)
+                self._last_progress[path] = progress
+                _remove_progress_file(progress_file)
+                self._pending.pop(path, None)
+                self._evicted.pop(path, None)
+                # A file failed to parse is not retried until it is changed, e.g. it was still being written.
+                self._files[path] = file
+                if r is not None:
+                    state = file[0]
+                    r.trace_file_state = state
+                    self._profiles[path] = r
+                    length = state.length if state is not None and state.length else 0
+                    if r.has_kernel:
+                        # Appending the counters reads and compresses the whole trace, so it is done by
+                        # the ParsePool instead of the first request of the trace view.
+                        ParsePool.instance().submit_background(
+                            _build_trace_with_gpu_metrics, self.caches, r.trace_file_path, state, r.get_gpu_metrics(),
+                            memory=ParsePool.estimate_memory(path, length, rewrite=True))
+                    if length >= TRACE_INDEX_MIN_SIZE_MB * 1024 * 1024:
+                        # The big traces are indexed in advance, so that their slices are cut at once.
+                        ParsePool.instance().submit_background(
+                            _build_trace_index, self.caches, r.trace_file_path, state,
+                            memory=ParsePool.estimate_memory(path, length, rewrite=True))
+                if d is not None:
+                    self._dist_data[path] = d
+
+            if r is not None and self.residency is not None:
+                # out of the lock, since it could evict the profiles of this loader.
+                self.residency.add(self, r.worker, _get_span_key(r.span), self.residency.estimate_memory(size))
 
+    def _remove_file(self, path):
+        self._files.pop(path, None)
+        self._pending.pop(path, None)
+        self._evicted.pop(path, None)
+        profile = self._profiles.pop(path, None)
+        if profile is not None and self.residency is not None:
+            self.residency.remove(self, profile.worker, _get_span_key(profile.span))
+        self._dist_data.pop(path, None)
+        self._last_progress.pop(path, None)
+        parsing = self._parsing.pop(path, None)
+        if parsing is not None:
+            progress_file = self._progress_files.pop(path)
+            if parsing[1] in self._collecting:
+                # the result being loaded is dropped by _collect.
+                _remove_progress_file(progress_file)
+            else:
+                # nobody collects the result of the stale file.
+                parsing[1].add_done_callback(lambda future: _discard_result(future, progress_file))
+
+    def _build_run(self):
         distributed_run = Run(self.run_name, self.run_dir)
         run = Run(self.run_name, self.run_dir)
-        for _ in range(len(workers)):
-            r, d = self.queue.get()
-            if r is not None:
-                run.add_profile(r)
-            if d is not None:
-                distributed_run.add_profile(d)
-
-        distributed_profiles = self._process_spans(distributed_run)
-        if distributed_profiles is not None:
-            if isinstance(distributed_profiles, list):
-                for d in distributed_profiles:
-                    run.add_profile(d)
-            else:
-                run.add_profile(distributed_profiles)
+        for profile in self._profiles.values():
+            run.add_profile(profile)
+        for _, worker, span in self._pending.values():
+            run.add_profile(PendingRunProfile(worker, span))
+        for path, views in self._evicted.items():
+            _, worker, span = self._files[path]
+            run.add_profile(PendingRunProfile(worker, span, views))
+        for data in self._dist_data.values():
+            distributed_run.add_profile(data)
 
-        # for no daemon process, no need to join them since it will automatically join
-        return run
+        for profile in self._update_distributed_profiles(distributed_run):
+            run.add_profile(profile)
 
-    def _process_data(self, worker, span, path, barrier):
-        import absl.logging
-        absl.logging.use_absl_handler()
+        self.run = run
+        return run
 
+    def _get_file_state(self, path):
         try:
-            logger.debug("starting process_data")
-            data = RunProfileData.parse(self.run_dir, worker, span, path, self.caches)
-            data.process()
-            data.analyze()
-
-            generator = RunGenerator(worker, span, data)
-            profile = generator.generate_run_profile()
-            dist_data = DistributedRunProfileData(data)
-
-            self.queue.put((profile, dist_data))
-        except KeyboardInterrupt:
-            logger.warning("tb_plugin receive keyboard interrupt signal, process %d will exit" % (os.getpid()))
-            sys.exit(1)
+            return io.stat(io.join(self.run_dir, path))
         except Exception as ex:
-            logger.warning("Failed to parse profile data for Run %s on %s. Exception=%s",
-                               self.run_name, worker, ex, exc_info=True)
-            self.queue.put((None, None))
-        barrier.wait()
-        logger.debug("finishing process data")
+            logger.debug("Failed to get the state of %s. Exception=%s", path, ex)
+            return None
 
-    def _process_spans(self, distributed_run):
+    def _update_distributed_profiles(self, distributed_run):
+        """Return the distributed profiles of the spans.
+        The profile of a span is only rebuilt when the files of the span are changed."""
         spans = distributed_run.get_spans()
+        groups = {}
         if spans is None:
-            return self._process_distributed_profiles(distributed_run.get_profiles(), None)
+            groups[None] = distributed_run.get_profiles()
         else:
-            span_profiles = []
             for span in spans:
-                profiles = distributed_run.get_profiles(span=span)
-                p = self._process_distributed_profiles(profiles, span)
-                if p is not None:
-                    span_profiles.append(p)
-            return span_profiles
+                groups[span] = distributed_run.get_profiles(span=span)
+
+        pending_spans = set(_get_span_key(span) for _, _, span in self._pending.values())
+        distributed_profiles = {}
+        for span, profiles in groups.items():
+            if _get_span_key(span) in pending_spans:
+                # wait for all the files of the span to be parsed.
+                continue
+            ids = set(id(data) for data in profiles)
+            files = frozenset((path, self._files[path]) for path, data in self._dist_data.items() if id(data) in ids)
+            previous = self._distributed_profiles.get(span)
+            if previous is not None and previous[0] == files:
+                distributed_profiles[span] = previous
+            else:
+                distributed_profiles[span] = (files, self._process_distributed_profiles(profiles, span))
+        self._distributed_profiles = distributed_profiles
+
+        return [profile for _, profile in distributed_profiles.values() if profile is not None]
 
     def _process_distributed_profiles(self, profiles, span):
         has_communication = True
@@ -141,6 +421,10 @@ class RunLoader(object):
             return None
 
         worker_num = len(comm_node_lists)
+        # The profiles of the span are processed again when its files are changed.
+        for comm_node_list in comm_node_lists:
+            for node in comm_node_list:
+                node.real_time = 0
         for i, node in enumerate(comm_node_lists[0]):
             kernel_range_size = len(node.kernel_ranges)
             # loop for all communication kernel ranges in order
@@ -165,3 +449,170 @@ class RunLoader(object):
         generator = DistributedRunGenerator(profiles, span)
         profile = generator.generate_run_profile()
         return profile
+
+
+def _get_span_key(span):
+    return "default" if span is None else str(span)
+
+
+def _parse_downloaded(future, trace_path, args, caches, progress_file, length, memory, profile_cache, download):
+    try:
+        caches = caches.with_local_file(trace_path, download.result())
+    except Exception as ex:
+        # let the parsing process download it again and report the error.
+        logger.warning("Failed to download %s. Exception=%s", trace_path, ex)
+    _parse(future, args, caches, progress_file, length, memory, profile_cache)
+
+
+def _parse(future, args, caches, progress_file, length, memory, profile_cache):
+    '''Submit the file to the ParsePool, and complete future with the result.'''
+    try:
+        parse = ParsePool.instance().submit(_process_data, *args, caches, progress_file, length, profile_cache,
+                                            memory=memory)
+    except Exception as ex:
+        future.set_exception(ex)
+        return
+
+    def copy_result(parse):
+        if parse.exception() is not None:
+            future.set_exception(parse.exception())
+        else:
+            future.set_result(parse.result())
+    parse.add_done_callback(copy_result)
+
+
+def open_trace(caches, profile):
+    """Return the opened gzip trace of the profile to be served by the trace view.
+    The trace with the gpu metrics counters, or the compressed trace, is created once in the trace cache,
+    and the gzipped trace without kernels is served as it is."""
+    trace_path = profile.trace_file_path
+    # the state of the trace file at load, which saves a stat request of the remote trace for every view.
+    file_stat = profile.trace_file_state
+    if profile.has_kernel:
+        return _open_trace_with_gpu_metrics(caches, trace_path, file_stat, profile.get_gpu_metrics)
+    if trace_path.endswith('.gz'):
+        return open(caches.get_remote_cache(trace_path, file_stat), 'rb')
+    return caches.open_trace(trace_path, "gzip",
+                             lambda output_file: write_compressed_trace(caches.get_remote_cache(trace_path, file_stat),
+                                                                        output_file),
+                             file_stat)
+
+
+def _open_trace_with_gpu_metrics(caches, trace_path, file_stat, get_counters):
+    def write(output_file):
+        local_file = caches.get_remote_cache(trace_path, file_stat)
+        write_trace_with_counters(local_file, trace_path.endswith('.gz'), output_file, get_counters())
+    return caches.open_trace(trace_path, "gpu_metrics", write, file_stat)
+
+
+def _build_trace_with_gpu_metrics(caches, trace_path, file_stat, counters):
+    _open_trace_with_gpu_metrics(caches, trace_path, file_stat, lambda: counters).close()
+
+
+def open_trace_slice(caches, profile, start_step=None, end_step=None, begin_ts=None, end_ts=None):
+    """Return the opened gzip trace of the events overlapping the steps from start_step to end_step,
+    or the time range [begin_ts, end_ts) in the time unit of the trace, with the metadata and the counters.
+    The slice is cut from the index of the trace and kept in the trace cache.
+    ValueError is raised if the steps are not in the trace."""
+    trace_path = profile.trace_file_path
+    file_stat = profile.trace_file_state
+    if start_step is not None:
+        kind = "slice|step|{}|{}".format(start_step, end_step)
+    else:
+        kind = "slice|ts|{}|{}".format(begin_ts, end_ts)
+
+    def write(output_file):
+        with _open_trace_index(caches, trace_path, file_stat) as f:
+            index = TraceIndex(f)
+            if start_step is not None:
+                begin, end = index.get_step_range(start_step, end_step)
+            else:
+                begin, end = begin_ts, end_ts
+            counters = profile.get_gpu_metrics() if profile.has_kernel else None
+            index.write_slice(begin, end, output_file, counters)
+    return caches.open_trace(trace_path, kind, write, file_stat)
+
+
+def open_projected_trace(caches, profile, trace_file, projection):
+    """Return the opened gzip trace of the TraceProjection of trace_file, which is the opened gzip trace
+    or slice served for the profile. It is written once for each projection and kept in the trace cache."""
+    # the name of the served file is unique to its trace and kind.
+    kind = "projection|{}|{}".format(os.path.basename(trace_file.name), projection.key)
+    return caches.open_trace(profile.trace_file_path, kind,
+                             partial(write_projected_trace, trace_file.name, True, projection=projection),
+                             profile.trace_file_state)
+
+
+def _open_trace_index(caches, trace_path, file_stat):
+    def write(output_file):
+        write_trace_index(caches.get_remote_cache(trace_path, file_stat), trace_path.endswith('.gz'), output_file)
+    return caches.open_trace(trace_path, "index", write, file_stat)
+
+
+def _build_trace_index(caches, trace_path, file_stat):
+    _open_trace_index(caches, trace_path, file_stat).close()
+
+
+def _discard_result(future, progress_file):
+    try:
+        transport.discard(future.result())
+    except Exception:
+        pass
+    _remove_progress_file(progress_file)
+
+
+def _remove_progress_file(progress_file):
+    try:
+        os.remove(progress_file)
+    except OSError:
+        pass
+
+
+def _process_data(run_name, run_dir, worker, span, path, caches, progress_file=None, length=0, profile_cache=None):
+    import absl.logging
+    absl.logging.use_absl_handler()
+
+    try:
+        logger.debug("starting process_data")
+        progress = ProgressReporter.resume(progress_file, length)
+        trace_path = io.join(run_dir, path)
+        cache_key = None
+        cached = None
+        if profile_cache is not None:
+            cache_key = ProfileCache.get_key(trace_path)
+            cached = profile_cache.load(cache_key, trace_path)
+
+        if cached is not None:
+            profile, dist_data = cached
+            # The worker and span index are assigned by the run, not by the trace file.
+            profile.worker, profile.span = worker, span
+            dist_data.worker, dist_data.span = worker, span
+        else:
+            if "download" not in progress.stages:
+                # the remote files are downloaded by the plugin process, which reports the stage.
+                with progress.run_stage("download"):
+                    local_file = caches.get_remote_cache(trace_path)
+                    if local_file != trace_path:
+                        progress.update(bytes_read=os.path.getsize(local_file))
+            with progress.run_stage("parse"):
+                data = RunProfileData.parse(run_dir, worker, span, path, caches, progress)
+            with progress.run_stage("process"):
+                data.process()
+            with progress.run_stage("analyze"):
+                data.analyze()
+
+            with progress.run_stage("generate"):
+                generator = RunGenerator(worker, span, data)
+                profile = generator.generate_run_profile()
+                dist_data = DistributedRunProfileData(data)
+            if profile_cache is not None:
+                profile_cache.save(cache_key, trace_path, profile, dist_data)
+
+        logger.debug("finishing process data")
+        return transport.dump((profile, dist_data))
+    except KeyboardInterrupt:
+        logger.warning("tb_plugin receive keyboard interrupt signal, process %d will exit" % (os.getpid()))
+    except Exception as ex:
+        logger.warning("Failed to parse profile data for Run %s on %s. Exception=%s",
+                       run_name, worker, ex, exc_info=True)
+    return transport.ResultHandle(None, (None, None))
@@ -51,9 +51,9 @@ class MemoryRecord:
 
 
 class MemoryParser:
-    def __init__(self, tid2tree, op_list):
-        self.tid2tree = tid2tree
-        self.op_list = op_list
+    def __init__(self):
+        self.tid2tree = None
+        self.op_list = None
 
         self.records_by_tid = defaultdict(list)
 
@@ -74,11 +74,21 @@ class MemoryParser:
         self.processed_node_normal = set()
         self.unreached_node_normal = defaultdict(list)
 
+    def register_consumers(self, dispatcher):
+        dispatcher.register(self.parse_event, EventTypes.MEMORY)
+
     def parse_events(self, events):
-        for event in events:
-            if event.type == EventTypes.MEMORY:
-                record = MemoryRecord(event.scope, event.pid, event.tid, event.ts, event.device_type, event.device_id, event.bytes)
-                self.records_by_tid[record.tid].append(record)
+        for event in events.rows(events.indexes(EventTypes.MEMORY)):
+            self.parse_event(event)
+
+    def parse_event(self, event):
+        record = MemoryRecord(event.scope, event.pid, event.tid, event.ts, event.device_type, event.device_id, event.bytes)
+        self.records_by_tid[record.tid].append(record)
+
+    def update_nodes(self, tid2tree, op_list):
+        '''Attach the parsed memory records to the operator nodes of the trees.'''
+        self.tid2tree = tid2tree
+        self.op_list = op_list
 
         for val in self.records_by_tid.values():
             val.sort(key=lambda x: x.ts)
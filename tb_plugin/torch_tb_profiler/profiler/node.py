@@ -164,8 +164,8 @@ class DeviceNode(BaseNode):
     def get_node_argument(event):
         kwargs = BaseNode.get_node_argument(event)
         if event.type == EventTypes.KERNEL:
-            kwargs["blocks_per_sm"] = event.args.get("blocks per SM", 0)
-            kwargs["occupancy"] = event.args.get("est. achieved occupancy %", 0)
+            kwargs["blocks_per_sm"] = 0 if event.blocks_per_sm is None else event.blocks_per_sm
+            kwargs["occupancy"] = 0 if event.occupancy is None else event.occupancy
         return kwargs
 
 def is_operator_node(node):
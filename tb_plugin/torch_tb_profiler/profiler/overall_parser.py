@@ -3,7 +3,8 @@
 # --------------------------------------------------------------------------
 from .. import utils
 from .event_parser import ProfileRole
-from .range_utils import (get_ranges_sum, intersection_ranges_lists,
+# the list functions are re-exported for the callers importing them from this module.
+from .range_utils import (IntervalSet, get_ranges_sum, intersection_ranges_lists,
                           merge_ranges, subtract_ranges_lists)
 
 logger = utils.get_logger()
@@ -18,7 +19,7 @@ class OverallParser(object):
         def calculate_costs(cls, statistics, step):
             cost_obj = cls()
             for i in range(len(statistics.cost_ranges)):
-                cost_obj.costs[i] = get_ranges_sum(statistics.cost_ranges[i])
+                cost_obj.costs[i] = statistics.cost_ranges[i].sum()
             cost_obj.costs[ProfileRole.Total] = step[1] - step[0]
             return cost_obj
 
@@ -34,15 +35,15 @@ class OverallParser(object):
             assert len(role_ranges) == ProfileRole.Total - 1
 
             cost_ranges = []
-            slots = []
+            slots = IntervalSet()
             for role in role_ranges:
                 if slots:
-                    range = intersection_ranges_lists(slots, role)
+                    range = slots.intersection(role)
                 else:
                     range = role
-                    slots = merge_ranges(list(steps))
+                    slots = IntervalSet.from_ranges(steps)
                 cost_ranges.append(range)
-                slots = subtract_ranges_lists(slots, range)
+                slots = slots.subtract(range)
             # The last one is ProfileRole.Other
             cost_ranges.append(slots)
 
@@ -50,9 +51,8 @@ class OverallParser(object):
 
         def intersection_with_step(self, step):
             cost_ranges = []
-            step = [step]
             for range in self.cost_ranges:
-                cost_ranges.append(intersection_ranges_lists(step, range))
+                cost_ranges.append(range.clip(*step))
 
             return OverallParser.Statistics(cost_ranges)
 
@@ -71,7 +71,7 @@ class OverallParser(object):
     def aggregate(self, steps, role_ranges):
         logger.debug("Overall, statistics")
         global_stats = OverallParser.Statistics.create_statistics(steps, role_ranges)
-        comm_kernel_overlap = intersection_ranges_lists(role_ranges[ProfileRole.Kernel], role_ranges[ProfileRole.Communication])
+        comm_kernel_overlap = role_ranges[ProfileRole.Kernel].intersection(role_ranges[ProfileRole.Communication])
 
         logger.debug("Overall, aggregation")
         valid_steps = len(steps)
@@ -82,9 +82,9 @@ class OverallParser(object):
                 self.avg_costs.costs[cost_index] += self.steps_costs[i].costs[cost_index]
 
             comm_costs = OverallParser.StepCommunicationCosts()
-            comm_costs.overlap = get_ranges_sum(intersection_ranges_lists([steps[i]], comm_kernel_overlap))
-            comm_costs.computation = get_ranges_sum(intersection_ranges_lists([steps[i]], role_ranges[ProfileRole.Kernel]))
-            comm_costs.communication = get_ranges_sum(intersection_ranges_lists([steps[i]], role_ranges[ProfileRole.Communication]))
+            comm_costs.overlap = comm_kernel_overlap.clip(*steps[i]).sum()
+            comm_costs.computation = role_ranges[ProfileRole.Kernel].clip(*steps[i]).sum()
+            comm_costs.communication = role_ranges[ProfileRole.Communication].clip(*steps[i]).sum()
             comm_costs.other = self.steps_costs[i].costs[ProfileRole.Total] + comm_costs.overlap - comm_costs.computation - comm_costs.communication
             self.communication_overlap.append(comm_costs)
 
@@ -0,0 +1,148 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# --------------------------------------------------------------------------
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from .. import utils
+
+logger = utils.get_logger()
+
+NUM_WORKERS = int(os.getenv('TORCH_PROFILER_NUM_WORKERS', '0'))
+MEMORY_BUDGET_MB = int(os.getenv('TORCH_PROFILER_MEMORY_BUDGET_MB', '0'))
+
+# The rough peak memory of parsing a trace file, relative to its size.
+COMPRESSED_TRACE_MEMORY_RATIO = 40
+TRACE_MEMORY_RATIO = 4
+# The rough peak memory of rewriting a trace file event by event, like appending the counters, relative to its size.
+COMPRESSED_TRACE_REWRITE_MEMORY_RATIO = 10
+TRACE_REWRITE_MEMORY_RATIO = 1
+
+
+class MemoryBudget(object):
+    """Admit the tasks as long as the sum of their estimated memory is in the budget.
+    A task larger than the whole budget is admitted when no other task is running."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.used = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size):
+        size = min(size, self.budget)
+        with self._condition:
+            while self.used > 0 and self.used + size > self.budget:
+                self._condition.wait()
+            self.used += size
+        return size
+
+    def release(self, size):
+        with self._condition:
+            self.used -= size
+            self._condition.notify_all()
+
+
+class ParsePool(object):
+    """The process pool shared by all the runs to parse the trace files.
+
+    The number of processes follows the CPUs available to TensorBoard (affinity and cgroup quota),
+    and the files are only submitted while their estimated memory fits in the memory budget,
+    so that loading a big logdir doesn't exhaust the host. The worker processes are kept alive
+    between the files, and a pool broken by a killed worker is replaced on the next submit.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_workers=None, memory_budget=None):
+        if not max_workers:
+            max_workers = utils.get_cpu_count()
+        if not memory_budget:
+            memory_limit = utils.get_memory_limit()
+            # leave half of the memory to TensorBoard and the others.
+            memory_budget = memory_limit // 2 if memory_limit else 4 * 1024 * 1024 * 1024
+        self.max_workers = max_workers
+        self._budget = MemoryBudget(memory_budget)
+        self._lock = threading.Lock()
+        self._executor = None
+        # The thread waiting for the memory budget of the tasks submitted by submit_background.
+        self._submitter = None
+        logger.info("Parse the trace files with %d processes and %d MB memory budget" %
+                    (max_workers, memory_budget // 1024 // 1024))
+
+    @classmethod
+    def instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = ParsePool(NUM_WORKERS, MEMORY_BUDGET_MB * 1024 * 1024)
+            return cls._instance
+
+    @staticmethod
+    def estimate_memory(path, size, rewrite=False):
+        '''Return the rough peak memory of parsing the trace file of size bytes, or of rewriting it if rewrite.'''
+        if rewrite:
+            ratio = COMPRESSED_TRACE_REWRITE_MEMORY_RATIO if path.endswith('.gz') else TRACE_REWRITE_MEMORY_RATIO
+        else:
+            ratio = COMPRESSED_TRACE_MEMORY_RATIO if path.endswith('.gz') else TRACE_MEMORY_RATIO
+        return size * ratio
+
+    def submit(self, fn, *args, memory=0):
+        """Submit fn(*args) to the pool and return its Future.
+        It blocks until the memory of the task fits in the budget."""
+        memory = self._budget.acquire(memory)
+        try:
+            future = self._submit(fn, *args)
+        except BaseException:
+            self._budget.release(memory)
+            raise
+        future.add_done_callback(lambda _: self._budget.release(memory))
+        return future
+
+    def submit_background(self, fn, *args, memory=0):
+        """Submit fn(*args) to the pool like submit, but wait for the memory budget in a background thread
+        instead of the caller, e.g. for the tasks submitted while holding a lock. Return the Future of its result."""
+        future = Future()
+
+        def submit():
+            try:
+                task = self.submit(fn, *args, memory=memory)
+            except BaseException as ex:
+                future.set_exception(ex)
+                return
+            task.add_done_callback(partial(_copy_result, future))
+
+        with self._lock:
+            if self._submitter is None:
+                self._submitter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parse_pool_submit")
+            self._submitter.submit(submit)
+        return future
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._executor is not None:
+                try:
+                    return self._executor.submit(fn, *args)
+                except BrokenProcessPool:
+                    logger.warning("The trace parsing pool is broken, probably a process was killed. Restart it.")
+                    self._executor.shutdown(wait=False)
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor.submit(fn, *args)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            submitter, self._submitter = self._submitter, None
+        if submitter is not None:
+            submitter.shutdown(wait=wait)
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+def _copy_result(future, task):
+    if task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
@@ -0,0 +1,76 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# --------------------------------------------------------------------------
+import os
+import pickle
+
+from .. import __version__, io, utils
+
+logger = utils.get_logger()
+
+PROFILE_CACHE = os.getenv('TORCH_PROFILER_PROFILE_CACHE', '1').upper() in ("1", "TRUE", "ON")
+PROFILE_CACHE_DIR = os.getenv('TORCH_PROFILER_PROFILE_CACHE_DIR',
+                              os.path.join(os.getenv('XDG_CACHE_HOME', os.path.join('~', '.cache')),
+                                           'torch_tb_profiler', 'profiles'))
+PROFILE_CACHE_SIZE_MB = int(os.getenv('TORCH_PROFILER_PROFILE_CACHE_SIZE_MB', '2048'))
+
+
+class ProfileCache(object):
+    """Persist the RunProfile and DistributedRunProfileData generated from a trace file,
+    so that the trace doesn't need to be parsed again after TensorBoard is restarted.
+
+    The entries are keyed by the trace path, its size, mtime, etag and the plugin version.
+    A modified trace or a new plugin version simply doesn't find its entry, and the stale
+    entries are removed by the LRU eviction of the DiskCache.
+    """
+
+    def __init__(self, directory=PROFILE_CACHE_DIR, max_size=PROFILE_CACHE_SIZE_MB * 1024 * 1024):
+        self._cache = io.DiskCache(os.path.abspath(os.path.expanduser(directory)), max_size)
+
+    @staticmethod
+    def create():
+        '''Return the ProfileCache, or None if it is disabled.'''
+        if not PROFILE_CACHE:
+            return None
+        return ProfileCache()
+
+    @staticmethod
+    def get_key(trace_path):
+        '''Return the cache key of the trace file, or None if its state could not be read.'''
+        try:
+            stat = io.stat(trace_path)
+        except Exception as ex:
+            logger.warning("Failed to get the state of %s, skip the profile cache. Exception=%s", trace_path, ex)
+            return None
+        return "{}|{}|{}|{}|{}".format(__version__, trace_path, stat.length, stat.mtime, stat.etag)
+
+    def load(self, key, trace_path):
+        '''Return the (RunProfile, DistributedRunProfileData) stored for the key, or None.'''
+        if key is None:
+            return None
+
+        data = self._cache.get(key)
+        if data is None:
+            return None
+
+        try:
+            profile, dist_data = pickle.loads(data)
+        except Exception as ex:
+            logger.warning("Failed to load the cached profile of %s. Exception=%s", trace_path, ex)
+            self._cache.remove(key)
+            return None
+
+        logger.debug("Load the cached profile of %s", trace_path)
+        return profile, dist_data
+
+    def save(self, key, trace_path, profile, dist_data):
+        if key is None or profile.trace_file_path != trace_path:
+            # The trace was re-encoded to a temporary file, which is removed when TensorBoard exits.
+            return
+
+        try:
+            data = pickle.dumps((profile, dist_data), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as ex:
+            logger.warning("Failed to serialize the profile of %s. Exception=%s", profile.trace_file_path, ex)
+            return
+        self._cache.put(key, data)
@@ -0,0 +1,139 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# --------------------------------------------------------------------------
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from .. import utils
+from .transport import TRANSPORT_DIR
+
+logger = utils.get_logger()
+
+# The stages of loading a trace file, and their rough share of the loading time.
+STAGES = ("download", "decompress", "parse", "process", "analyze", "generate")
+STAGE_WEIGHTS = {"download": 0.1, "decompress": 0.1, "parse": 0.4, "process": 0.2, "analyze": 0.1, "generate": 0.1}
+# The trace is decompressed on the fly while it is parsed, so the decompress stage advances with the parse stage
+# and is done with it, including for the trace not compressed.
+CONCURRENT_STAGES = {"parse": ("decompress",)}
+
+# The progress file is written at most once in this interval, except at the end of the stages.
+REPORT_INTERVAL_IN_SECONDS = 0.5
+
+
+def create_progress_file():
+    '''Return the path of a new file for a ProgressReporter, which is removed by the caller.'''
+    fd, path = tempfile.mkstemp(prefix='torch_tb_profiler_progress_', suffix='.json', dir=TRANSPORT_DIR)
+    os.close(fd)
+    return path
+
+
+def read_progress(path):
+    '''Return the progress written by the ProgressReporter, or None if it is not written yet.'''
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class ProgressReporter(object):
+    """Report the progress of loading a trace file from the process parsing it.
+
+    The stage, the bytes read and the events parsed, and the wall time and bytes of the finished stages
+    are written as json to a small file, which is replaced atomically so the plugin could read it
+    at any time. Nothing is written if path is None.
+    """
+
+    def __init__(self, path=None, total_bytes=0):
+        self.path = path
+        self.total_bytes = total_bytes
+        self.stage = None
+        self.bytes = 0
+        self.events = 0
+        # stage => wall time in seconds, and bytes read
+        self.stages = {}
+        self.stage_bytes = {}
+        self._last_report = 0
+        # wall time of the stages added within the running stage.
+        self._added_seconds = 0.0
+
+    @classmethod
+    def resume(cls, path=None, total_bytes=0):
+        '''Return the reporter continuing the finished stages written to path, like the download stage
+        reported by the plugin process before the file is parsed by another process.'''
+        reporter = cls(path, total_bytes)
+        progress = read_progress(path) if path is not None else None
+        if progress is not None:
+            reporter.stages = progress["stages"]
+            reporter.stage_bytes = progress.get("stage_bytes", {})
+        return reporter
+
+    @contextmanager
+    def run_stage(self, stage):
+        self.stage = stage
+        self.bytes = 0
+        self._added_seconds = 0.0
+        self._report(force=True)
+        start = time.time()
+        try:
+            yield self
+        finally:
+            self.stages[stage] = time.time() - start - self._added_seconds
+            self.stage_bytes[stage] = self.bytes
+            self._report(force=True)
+
+    def add_stage(self, stage, seconds, bytes_read):
+        '''Add the stage measured within the running stage, like the decompression of the trace by the
+        parse stage. Its wall time is not counted in the running stage.'''
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        self.stage_bytes[stage] = self.stage_bytes.get(stage, 0) + bytes_read
+        self._added_seconds += seconds
+
+    def update(self, bytes_read=None, events=None):
+        if bytes_read is not None:
+            self.bytes = bytes_read
+        if events is not None:
+            self.events = events
+        self._report()
+
+    def _report(self, force=False):
+        if self.path is None:
+            return
+        now = time.time()
+        if not force and now - self._last_report < REPORT_INTERVAL_IN_SECONDS:
+            return
+        self._last_report = now
+
+        data = {
+            "stage": self.stage,
+            "bytes": self.bytes,
+            "total_bytes": self.total_bytes,
+            "events": self.events,
+            "stages": self.stages,
+            "stage_bytes": self.stage_bytes
+        }
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except OSError as ex:
+            logger.debug("Failed to write the progress to %s. Exception=%s", self.path, ex)
+
+
+def get_fraction(progress):
+    '''Return the done fraction of loading a trace file from its progress.'''
+    if progress is None:
+        return 0.0
+    done = set(progress["stages"])
+    for stage in progress["stages"]:
+        done.update(CONCURRENT_STAGES.get(stage, ()))
+    fraction = sum(STAGE_WEIGHTS[stage] for stage in done)
+    stage = progress["stage"]
+    if stage is not None and stage not in done and progress["total_bytes"]:
+        weight = sum(STAGE_WEIGHTS[s] for s in (stage,) + CONCURRENT_STAGES.get(stage, ()) if s not in done)
+        fraction += weight * min(progress["bytes"] / progress["total_bytes"], 1.0)
+    return min(fraction, 1.0)
@@ -3,6 +3,8 @@
 # -------------------------------------------------------------------------
 from enum import IntEnum
 
+import numpy as np
+
 EndpointTypes = IntEnum('EndpointTypes', ['START', 'END'], start=0)
 
 
@@ -184,3 +186,120 @@ def merge_ranges(src_ranges, is_sorted=False):
                     merged_ranges.append(
                         (src_ranges[src_id][0], src_ranges[src_id][1]))
     return merged_ranges
+
+
+class IntervalSet(object):
+    """A set of ranges sorted by time, held as the arrays of their starts and ends, and optionally of their values.
+
+    The ranges are disjoint, except that the ranges with values merged by from_ranges_with_value may touch.
+    The operations are vectorized with sorted merges and binary searches over the arrays, and give the same
+    ranges as the functions above on the lists of tuples. The ranges of zero length are dropped, which
+    don't change any sum. The sums are accumulated in the order of the ranges like the loops above,
+    so that they are the same to the last bit.
+    """
+
+    def __init__(self, starts=None, ends=None, values=None):
+        self.starts = np.zeros(0, dtype=np.int64) if starts is None else starts
+        self.ends = np.zeros(0, dtype=np.int64) if ends is None else ends
+        self.values = values
+
+    @classmethod
+    def from_ranges(cls, ranges):
+        """Merge the (start, end) ranges like merge_ranges."""
+        if len(ranges) == 0:
+            return cls()
+        starts = np.array([r[0] for r in ranges])
+        ends = np.array([r[1] for r in ranges])
+        order = np.argsort(starts, kind="stable")
+        starts = starts[order]
+        ends = np.maximum.accumulate(ends[order])
+        # a range starts a new group if it starts after the end of all the ranges before it.
+        first = np.concatenate(([True], starts[1:] > ends[:-1]))
+        last = np.concatenate((first[1:], [True]))
+        return cls(starts[first], ends[last])._drop_empty()
+
+    @classmethod
+    def from_ranges_with_value(cls, ranges):
+        """Merge the (start, end, value) ranges like merge_ranges_with_value, which sums the values of
+        the overlapping ranges and limits them to 1.0."""
+        if len(ranges) == 0:
+            return cls(values=np.zeros(0))
+        count = len(ranges)
+        times = np.concatenate((np.array([r[0] for r in ranges]), np.array([r[1] for r in ranges])))
+        values = np.array([r[2] for r in ranges], dtype=np.float64)
+        deltas = np.concatenate((values, -values))
+        # the START is in front of END at the same time, and the endpoints of the same type are kept in order.
+        types = np.repeat([0, 1], count)
+        positions = np.concatenate((np.arange(count) * 2, np.arange(count) * 2 + 1))
+        order = np.lexsort((positions, types, times))
+        times = times[order]
+        values = np.cumsum(deltas[order])
+        keep = (times[1:] > times[:-1]) & (values[:-1] > 0.0)
+        return cls(times[:-1][keep], times[1:][keep], np.minimum(values[:-1][keep], 1.0))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def to_ranges(self):
+        """Return the list of the (start, end) or (start, end, value) tuples."""
+        columns = [self.starts.tolist(), self.ends.tolist()]
+        if self.values is not None:
+            columns.append(self.values.tolist())
+        return list(zip(*columns))
+
+    def sum(self):
+        """Return the total length of the ranges."""
+        if len(self) == 0:
+            return 0
+        return np.cumsum(self.ends - self.starts)[-1].item()
+
+    def weighted_sum(self):
+        """Return the total length of the ranges weighted by their values."""
+        if len(self) == 0:
+            return 0.0
+        return np.cumsum(self.values * (self.ends - self.starts))[-1].item()
+
+    def clip(self, start, end):
+        """Return the parts of the ranges in [start, end), with their values."""
+        first = np.searchsorted(self.ends, start, side="right")
+        last = np.searchsorted(self.starts, end, side="left")
+        if first >= last:
+            return self._take(slice(0, 0))
+        clipped = self._take(slice(first, last))
+        # copied, and promoted to float by the float bounds of the int ranges.
+        clipped.starts = clipped.starts.astype(np.result_type(clipped.starts, start))
+        clipped.ends = clipped.ends.astype(np.result_type(clipped.ends, end))
+        clipped.starts[0] = max(clipped.starts[0], start)
+        clipped.ends[-1] = min(clipped.ends[-1], end)
+        return clipped
+
+    def intersection(self, other):
+        """Return the parts of the ranges overlapping the disjoint ranges of other, like intersection_ranges_lists,
+        or intersection_ranges_lists_with_value if the ranges have values."""
+        if len(other) == 1:
+            return self.clip(other.starts[0], other.ends[0])
+        # the ranges of other overlapping each range, which are contiguous in other.
+        first = np.searchsorted(other.ends, self.starts, side="right")
+        counts = np.maximum(np.searchsorted(other.starts, self.ends, side="left") - first, 0)
+        indexes = np.repeat(np.arange(len(self)), counts)
+        offsets = np.cumsum(counts) - counts
+        other_indexes = np.repeat(first - offsets, counts) + np.arange(counts.sum())
+        values = None if self.values is None else self.values[indexes]
+        return IntervalSet(np.maximum(self.starts[indexes], other.starts[other_indexes]),
+                           np.minimum(self.ends[indexes], other.ends[other_indexes]), values)
+
+    def subtract(self, other):
+        """Return the parts of the ranges not overlapping the ranges of other, like subtract_ranges_lists."""
+        if len(self) == 0 or len(other) == 0:
+            return self._take(slice(None))
+        # the gaps between the ranges of other, which cover the ranges of self.
+        gaps = IntervalSet(np.concatenate(([min(self.starts[0], other.starts[0])], other.ends)),
+                           np.concatenate((other.starts, [max(self.ends[-1], other.ends[-1])])))
+        return self.intersection(gaps._drop_empty())
+
+    def _take(self, indexes):
+        return IntervalSet(self.starts[indexes], self.ends[indexes],
+                           None if self.values is None else self.values[indexes])
+
+    def _drop_empty(self):
+        return self._take(self.ends > self.starts)
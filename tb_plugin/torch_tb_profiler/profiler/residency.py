@@ -0,0 +1,77 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# --------------------------------------------------------------------------
+import os
+import threading
+from collections import OrderedDict
+
+from .. import utils
+
+logger = utils.get_logger()
+
+PROFILE_MEMORY_MB = int(os.getenv('TORCH_PROFILER_PROFILE_MEMORY_MB', '0'))
+
+# The rough memory of the unpickled profile, relative to its pickled size.
+PROFILE_MEMORY_RATIO = 5
+
+
+class ProfileResidency(object):
+    """Keep the estimated memory of the loaded profiles in the budget.
+
+    The profiles are tracked by (loader, worker, span), and the least recently used ones
+    are evicted from their loaders when the budget is exceeded. An evicted profile is replaced
+    by a placeholder in the Run, and parsed again (normally hitting the profile cache) when requested.
+    """
+
+    def __init__(self, budget, on_evict=None):
+        self.budget = budget
+        self.used = 0
+        self._on_evict = on_evict
+        self._lock = threading.Lock()
+        self._profiles = OrderedDict()
+
+    @staticmethod
+    def create(on_evict=None):
+        '''Return the ProfileResidency, or None if there is no memory budget for the profiles.'''
+        if PROFILE_MEMORY_MB <= 0:
+            return None
+        return ProfileResidency(PROFILE_MEMORY_MB * 1024 * 1024, on_evict)
+
+    @staticmethod
+    def estimate_memory(size):
+        return size * PROFILE_MEMORY_RATIO
+
+    def add(self, loader, worker, span, memory):
+        with self._lock:
+            key = (loader, worker, span)
+            self.used -= self._profiles.pop(key, 0)
+            self._profiles[key] = memory
+            self.used += memory
+            victims = self._pop_victims()
+        self._evict(victims)
+
+    def touch(self, loader, worker, span):
+        with self._lock:
+            key = (loader, worker, span)
+            if key in self._profiles:
+                self._profiles.move_to_end(key)
+
+    def remove(self, loader, worker, span):
+        with self._lock:
+            self.used -= self._profiles.pop((loader, worker, span), 0)
+
+    def _pop_victims(self):
+        victims = []
+        # the most recent profile is kept even if it is larger than the budget.
+        while self.used > self.budget and len(self._profiles) > 1:
+            key, memory = self._profiles.popitem(last=False)
+            self.used -= memory
+            victims.append(key)
+        return victims
+
+    def _evict(self, victims):
+        # The loaders are called out of the lock, since they call remove in their own locks.
+        for loader, worker, span in victims:
+            logger.info("Evict the profile of Run %s on %s/%s", loader.run_name, worker, span)
+            if loader.evict(worker, span) and self._on_evict is not None:
+                self._on_evict(loader)
@@ -5,7 +5,7 @@ from enum import IntEnum
 
 from .. import utils
 
-__all__ = ["EventTypes", "create_event"]
+__all__ = ["EventTypes", "create_event", "get_event_type"]
 
 logger = utils.get_logger()
 
@@ -63,6 +63,22 @@ class TraceEvent(BaseEvent):
     def input_type(self):
         return self.args.get("Input type")
 
+    @property
+    def correlation(self):
+        return self.args.get("correlation")
+
+    @property
+    def device(self):
+        return self.args.get("device")
+
+    @property
+    def blocks_per_sm(self):
+        return self.args.get("blocks per SM")
+
+    @property
+    def occupancy(self):
+        return self.args.get("est. achieved occupancy %")
+
 class ProfilerStepEvent(TraceEvent):
     def __init__(self, data):
         super().__init__(EventTypes.PROFILER_STEP, data)
@@ -93,27 +109,33 @@ class MemoryEvent(BaseEvent):
     def bytes(self):
         return self.args.get("Bytes", 0)
 
+def get_event_type(event):
+    """Return the EventTypes of the raw event, or None if the event is not used by the profiler."""
+    type = event.get("ph")
+    if type == "X":
+        category = event.get("cat")
+        if category == "Operator":
+            name = event.get("name")
+            if name and name.startswith("ProfilerStep#"):
+                return EventTypes.PROFILER_STEP
+
+        if category in Supported_EventTypes:
+            return category
+    elif type == "i" and event.get('s') == 't':
+        return EventTypes.MEMORY
+    return None
+
 def create_event(event):
     try:
-        type = event.get("ph")
-        if type == "X":
-            return create_trace_event(event)
-        elif type == "i" and event.get('s') == 't':
-            return MemoryEvent(EventTypes.MEMORY, event)
-        else:
+        type = get_event_type(event)
+        if type is None:
             return None
+        elif type == EventTypes.MEMORY:
+            return MemoryEvent(type, event)
+        elif type == EventTypes.PROFILER_STEP:
+            return ProfilerStepEvent(event)
+        else:
+            return TraceEvent(type, event)
     except Exception as ex:
         logger.warning("Failed to parse profile event. Exception=%s. Event=%s", ex, event, exc_info=True)
         raise
-
-def create_trace_event(event):
-    category = event.get("cat")
-    if category == "Operator":
-        name = event.get("name")
-        if name and name.startswith("ProfilerStep#"):
-            return ProfilerStepEvent(event)
-
-    if category in Supported_EventTypes:
-        return TraceEvent(category, event)
-    else:
-        return None
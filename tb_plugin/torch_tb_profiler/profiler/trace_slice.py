@@ -0,0 +1,197 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# --------------------------------------------------------------------------
+import gzip
+import json
+import os
+import re
+import struct
+import zlib
+from array import array
+
+import numpy as np
+
+from .. import utils
+from .trace_stream import TraceStream
+
+__all__ = ["TraceIndex", "write_trace_index"]
+
+logger = utils.get_logger()
+
+# The index of the traces larger than this is built when they are loaded, and the others on the first slice request.
+TRACE_INDEX_MIN_SIZE_MB = int(os.getenv('TORCH_PROFILER_TRACE_INDEX_MIN_SIZE_MB', '100'))
+# Number of characters of the trace text compressed in each segment, which is the unit read by a slice.
+SEGMENT_SIZE = 1024 * 1024
+
+STEP_NAME_PATTERN = re.compile(r"ProfilerStep#(\d+)$")
+_ARRAYS = ("segment_offsets", "event_starts", "event_ends", "ts", "end_ts",
+           "step_numbers", "step_begins", "step_ends", "metadata")
+# The offset of the arrays, and the segment size.
+_FOOTER = struct.Struct("<QQ")
+
+
+class _SegmentWriter(object):
+    """Write the text in segments of segment_size characters, each compressed on its own."""
+
+    def __init__(self, fout, segment_size):
+        self.offsets = [fout.tell()]
+        self._fout = fout
+        self._segment_size = segment_size
+        self._pending = ""
+
+    def write(self, text):
+        self._pending += text
+        while len(self._pending) >= self._segment_size:
+            self._write_segment(self._pending[:self._segment_size])
+            self._pending = self._pending[self._segment_size:]
+
+    def close(self):
+        if self._pending:
+            self._write_segment(self._pending)
+            self._pending = ""
+
+    def _write_segment(self, text):
+        self._fout.write(zlib.compress(text.encode("utf-8"), 1))
+        self.offsets.append(self._fout.tell())
+
+
+def write_trace_index(local_file, compressed, output_file, segment_size=SEGMENT_SIZE):
+    """Write the index of the trace to output_file, to cut the slices of a time range without parsing the trace.
+
+    The decoded text of the trace is copied in compressed segments, followed by the columns of the
+    text span, start and end time of every event, the time range of every ProfilerStep#N and the
+    top-level members other than traceEvents. A slice only decompresses the segments of the events
+    overlapping its time range, which are selected by a scan of the time columns.
+    """
+    event_starts = array('q')
+    event_ends = array('q')
+    ts = array('d')
+    end_ts = array('d')
+    # step number => [begin, end]
+    steps = {}
+    with open(output_file, 'wb') as fout:
+        segments = _SegmentWriter(fout, segment_size)
+        with TraceStream.open(local_file, compressed, text_sink=segments.write) as stream:
+            for data in stream.events():
+                start, end, _ = stream.event_span
+                event_starts.append(start)
+                event_ends.append(end)
+                begin = data.get("ts")
+                if data.get("ph") == "M" or not isinstance(begin, (int, float)):
+                    # the metadata events are in every slice.
+                    ts.append(float("nan"))
+                    end_ts.append(float("nan"))
+                    continue
+                duration = data.get("dur")
+                finish = begin + duration if isinstance(duration, (int, float)) else begin
+                ts.append(begin)
+                end_ts.append(finish)
+
+                name = data.get("name")
+                match = STEP_NAME_PATTERN.match(name) if isinstance(name, str) else None
+                if match is not None and data.get("ph") == "X":
+                    step = steps.setdefault(int(match.group(1)), [begin, finish])
+                    step[0] = min(step[0], begin)
+                    step[1] = max(step[1], finish)
+            metadata = stream.metadata
+        segments.close()
+
+        numbers = sorted(steps)
+        arrays = {
+            "segment_offsets": np.array(segments.offsets, dtype=np.int64),
+            "event_starts": np.frombuffer(event_starts, dtype=np.int64),
+            "event_ends": np.frombuffer(event_ends, dtype=np.int64),
+            "ts": np.frombuffer(ts, dtype=np.float64),
+            "end_ts": np.frombuffer(end_ts, dtype=np.float64),
+            "step_numbers": np.array(numbers, dtype=np.int64),
+            "step_begins": np.array([steps[n][0] for n in numbers], dtype=np.float64),
+            "step_ends": np.array([steps[n][1] for n in numbers], dtype=np.float64),
+            "metadata": np.frombuffer(json.dumps(metadata).encode("utf-8"), dtype=np.uint8),
+        }
+        offset = fout.tell()
+        for name in _ARRAYS:
+            np.save(fout, arrays[name], allow_pickle=False)
+        fout.write(_FOOTER.pack(offset, segment_size))
+
+
+class TraceIndex(object):
+    """The index of a trace written by write_trace_index, read from the opened file."""
+
+    def __init__(self, f):
+        self._file = f
+        # the last decompressed segment, which is shared by the runs of events close to each other.
+        self._segment = None
+        self._text = None
+        f.seek(-_FOOTER.size, os.SEEK_END)
+        offset, self.segment_size = _FOOTER.unpack(f.read(_FOOTER.size))
+        f.seek(offset)
+        for name in _ARRAYS:
+            setattr(self, name, np.load(f, allow_pickle=False))
+        self.metadata = json.loads(self.metadata.tobytes().decode("utf-8"))
+
+    def get_step_range(self, start_step, end_step):
+        '''Return the time range from the start of start_step to the start of the step after end_step,
+        so that it covers the GPU work of the steps which runs after their CPU ops. The range of the last
+        step lasts to the end of the trace.'''
+        numbers = self.step_numbers.tolist()
+        if start_step not in numbers or end_step not in numbers or start_step > end_step:
+            raise ValueError("The steps {}-{} are not in the trace, whose steps are {}".format(
+                start_step, end_step, numbers))
+        begin = self.step_begins[numbers.index(start_step)]
+        next_index = numbers.index(end_step) + 1
+        if next_index < len(numbers):
+            end = self.step_begins[next_index]
+        else:
+            # the events at the end of the trace are in the range too.
+            end = np.nextafter(max(np.nanmax(self.end_ts), self.step_ends[-1]), np.inf)
+        return float(begin), float(end)
+
+    def write_slice(self, begin, end, output_file, counters=None):
+        '''Write the gzip trace of the events overlapping [begin, end) to output_file, with the top-level
+        members and the metadata events of the trace. counters are the bytes of the counter events
+        appended by write_trace_with_counters, which are filtered in the same way.'''
+        # the instant events like the counters are selected by their timestamps.
+        selected = ((self.ts < end) & ((self.end_ts > begin) | (self.ts >= begin))) | np.isnan(self.ts)
+        indexes = np.flatnonzero(selected)
+        # the consecutive events are copied as a whole, with the separators between them.
+        breaks = np.flatnonzero(np.diff(indexes) != 1)
+        run_starts = self.event_starts[indexes[np.concatenate(([0], breaks + 1))]] if len(indexes) else []
+        run_ends = self.event_ends[indexes[np.concatenate((breaks, [len(indexes) - 1]))]] if len(indexes) else []
+
+        with gzip.open(output_file, 'wt', encoding="utf-8", newline="", compresslevel=1) as fout:
+            head = json.dumps(self.metadata)
+            fout.write(head[:-1] + ", " if self.metadata else "{")
+            fout.write('"traceEvents": [')
+            separator = ""
+            for start, stop in zip(run_starts, run_ends):
+                fout.write(separator)
+                for text in self._read(int(start), int(stop)):
+                    fout.write(text)
+                separator = ", "
+
+            if counters:
+                for event in json.loads("[{}]".format(counters.decode("utf-8").lstrip(" ,"))):
+                    if begin <= event["ts"] < end:
+                        fout.write(separator)
+                        fout.write(json.dumps(event))
+                        separator = ", "
+            fout.write("]}")
+        logger.debug("Write the slice [%s, %s) of %d events", begin, end, len(indexes))
+
+    def _read(self, start, end):
+        '''Yield the text of [start, end) from the segments.'''
+        while start < end:
+            segment = start // self.segment_size
+            text = self._read_segment(segment)
+            segment_start = segment * self.segment_size
+            yield text[start - segment_start:end - segment_start]
+            start = segment_start + len(text)
+
+    def _read_segment(self, segment):
+        if self._segment == segment:
+            return self._text
+        begin, end = self.segment_offsets[segment], self.segment_offsets[segment + 1]
+        self._file.seek(int(begin))
+        self._segment = segment
+        self._text = zlib.decompress(self._file.read(int(end - begin))).decode("utf-8")
+        return self._text
@@ -0,0 +1,432 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# --------------------------------------------------------------------------
+import bisect
+import gzip
+import io as sysio
+import json
+import re
+import struct
+import zlib
+from json.decoder import JSONDecodeError
+
+from .. import io, utils
+
+__all__ = ["TraceProjection", "TraceStream", "TRACE_EVENTS", "write_patched_trace", "write_projected_trace"]
+
+logger = utils.get_logger()
+
+TRACE_EVENTS = "traceEvents"
+# Number of characters decoded from the (decompressed) trace on each read.
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Kineto may export the invalid value N/A without surrounding double quote.
+INVALID_VALUE = "N/A"
+INVALID_VALUE_REPLACEMENT = '"N/A"'
+# The text up to the next N/A out of the json strings. The strings are skipped as a whole, and the match
+# stops at the quote of a string cut at the end of the window.
+INVALID_VALUE_PREFIX = re.compile(r'(?:[^"N]+|"[^"\\]*(?:\\.[^"\\]*)*"|N(?!/A))*', re.DOTALL)
+# The longest token that may be cut at the end of the window, the decode errors after it are not truncations.
+MAX_TOKEN_LENGTH = len("-Infinity")
+
+
+class TraceStream(object):
+    """Incrementally tokenize a chrome trace document.
+
+    Only a window of the decompressed text is kept in memory. The elements of the
+    "traceEvents" array are decoded one by one and yielded to the caller, and
+    the other top-level members (schemaVersion, deviceProperties, ...) are collected
+    into `metadata` as they are encountered. Both the object format and the
+    legacy array-only format of the trace are supported.
+
+    The invalid N/A values are replaced by the string "N/A" as the text is read. The replaced spans
+    and the span of the last yielded event are tracked, so that the caller can write a patched
+    copy of the trace with write_patched_trace instead of serializing the whole json again.
+    The decoded text is passed to text_sink in order once it is consumed, so the event spans
+    are the positions in the concatenated text.
+    """
+
+    def __init__(self, fileobj, chunk_size=DEFAULT_CHUNK_SIZE, text_sink=None):
+        self.metadata = {}
+        self.text_sink = text_sink
+        # (start, end, previous_end) of the last event yielded by events().
+        self.event_span = None
+        self._fileobj = fileobj
+        # The file of the source bytes, to report the reading progress.
+        self._source = None
+        # The gzip reader of a compressed trace, to report the decompression.
+        self._decompressor = None
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder(strict=False)
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        # Position of the buffer start in the decoded text.
+        # All the positions are in the decoded text with the replaced N/A values.
+        self._offset = 0
+        self._patch_positions = []
+        # Position in the buffer up to which the N/A values are replaced, which is out of any string.
+        self._patched = 0
+        self._first_separator = None
+
+    @classmethod
+    def open(cls, local_file, compressed, chunk_size=DEFAULT_CHUNK_SIZE, text_sink=None):
+        binary = io.open_mapped(local_file, compressed)
+        # keep the line endings so that the positions match the ones of write_patched_trace.
+        stream = cls(sysio.TextIOWrapper(binary, encoding="utf-8", newline=""), chunk_size, text_sink)
+        stream._source = binary.raw
+        if compressed:
+            stream._decompressor = binary
+        return stream
+
+    @property
+    def bytes_read(self):
+        """The number of the source bytes read, which are compressed bytes for a compressed trace."""
+        if self._source is None or self._source.closed:
+            return 0
+        return self._source.tell()
+
+    @property
+    def decompression(self):
+        """The (seconds, bytes) spent decompressing the trace so far, or None if it is not compressed."""
+        if self._decompressor is None:
+            return None
+        return self._decompressor.decompress_seconds, self._decompressor.decompressed_bytes
+
+    @property
+    def event_text(self):
+        """The text of the last event yielded by events(), which is valid until the next event is yielded."""
+        start, end, _ = self.event_span
+        return self._buffer[start - self._offset:end - self._offset]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._fileobj.close()
+
+    def events(self):
+        """Yield the raw dict of every item in the "traceEvents" array."""
+        token = self._peek()
+        if token == '[':
+            self._pos += 1
+            yield from self._iter_array()
+        elif token == '{':
+            self._pos += 1
+            yield from self._iter_object()
+        else:
+            raise JSONDecodeError("Expecting '{' or '['", self._buffer, self._pos)
+        self._consume()
+
+    def _iter_object(self):
+        if self._peek() == '}':
+            self._pos += 1
+            return
+
+        while True:
+            key = self._decode()
+            if not isinstance(key, str):
+                raise JSONDecodeError("Expecting property name enclosed in double quotes", self._buffer, self._pos)
+            self._expect(':')
+            if key == TRACE_EVENTS and self._peek() == '[':
+                self._pos += 1
+                yield from self._iter_array()
+            else:
+                self.metadata[key] = self._decode()
+
+            token = self._peek()
+            self._pos += 1
+            if token == '}':
+                break
+            elif token != ',':
+                raise JSONDecodeError("Expecting ',' delimiter", self._buffer, self._pos - 1)
+
+    def get_patches(self):
+        """Return the (start, end, replacement) of the N/A values replaced so far,
+        with the positions in the original text."""
+        return [(self._to_source(p), self._to_source(p) + len(INVALID_VALUE), INVALID_VALUE_REPLACEMENT)
+                for p in self._patch_positions]
+
+    def get_removal(self, event_span):
+        """Return the (start, end, replacement) to remove the event of event_span from the array,
+        with its separator. It must be called after the following event is yielded."""
+        start, end, previous_end = event_span
+        if previous_end is not None:
+            # remove from the end of the previous event, including the comma.
+            start = previous_end
+        elif self._first_separator is not None:
+            # the first event, remove the comma after it.
+            end = self._first_separator + 1
+        return (self._to_source(start), self._to_source(end), "")
+
+    def _to_source(self, pos):
+        # Each replacement of N/A inserts 2 characters before the positions after it.
+        growth = len(INVALID_VALUE_REPLACEMENT) - len(INVALID_VALUE)
+        return pos - growth * bisect.bisect_left(self._patch_positions, pos)
+
+    def _iter_array(self):
+        if self._peek() == ']':
+            self._pos += 1
+            return
+
+        previous_end = None
+        while True:
+            self._peek()
+            start = self._offset + self._pos
+            value = self._decode()
+            end = self._offset + self._pos
+            self.event_span = (start, end, previous_end)
+            yield value
+
+            token = self._peek()
+            if token == ',' and previous_end is None:
+                self._first_separator = self._offset + self._pos
+            self._pos += 1
+            previous_end = end
+            if token == ']':
+                break
+            elif token != ',':
+                raise JSONDecodeError("Expecting ',' delimiter", self._buffer, self._pos - 1)
+
+    def _decode(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except JSONDecodeError as e:
+                # Only a value cut at the end of the window is decoded again with more data,
+                # the other errors are raised without reading the rest of the trace.
+                if self._eof or not self._is_truncated(e):
+                    raise
+                self._fill()
+                continue
+            if end == len(self._buffer) and not self._eof:
+                # A number or literal at the end of the window might be truncated, decode it again with more data.
+                self._fill()
+                continue
+            self._pos = end
+            return value
+
+    def _is_truncated(self, error):
+        # An unterminated string reaches the end of the window, as the strings may contain control characters.
+        return error.msg.startswith("Unterminated string") or error.pos >= len(self._buffer) - MAX_TOKEN_LENGTH
+
+    def _expect(self, token):
+        if self._peek() != token:
+            raise JSONDecodeError("Expecting '{}' delimiter".format(token), self._buffer, self._pos)
+        self._pos += 1
+
+    def _peek(self):
+        '''Skip the whitespaces and return the next character without consuming it.'''
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._eof:
+                raise JSONDecodeError("Unexpected end of trace", self._buffer, self._pos)
+            self._fill()
+
+    def _fill(self):
+        chunk = self._fileobj.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return
+
+        # drop the consumed text so that the window only holds the pending data.
+        self._consume()
+        self._buffer += chunk
+        self._patch()
+
+    def _patch(self):
+        # The N/A values out of the strings are replaced once for each chunk. The text from a string cut at
+        # the end of the window, or from an N or N/ at the end, is scanned again with the next chunk.
+        if self._buffer.find(INVALID_VALUE, self._patched) < 0:
+            return
+
+        growth = len(INVALID_VALUE_REPLACEMENT) - len(INVALID_VALUE)
+        parts = []
+        start = 0
+        pos = self._patched
+        while True:
+            pos = INVALID_VALUE_PREFIX.match(self._buffer, pos).end()
+            if not self._buffer.startswith(INVALID_VALUE, pos):
+                break
+            # the position in the patched text, shifted by the values replaced before it.
+            self._patch_positions.append(self._offset + pos + growth * (len(parts) // 2))
+            parts.append(self._buffer[start:pos])
+            parts.append(INVALID_VALUE_REPLACEMENT)
+            pos += len(INVALID_VALUE)
+            start = pos
+
+        if pos == len(self._buffer):
+            for i in range(len(INVALID_VALUE) - 1, 0, -1):
+                if self._buffer.endswith(INVALID_VALUE[:i]):
+                    pos -= i
+                    break
+        if parts:
+            parts.append(self._buffer[start:])
+            pos += growth * (len(parts) // 2)
+            self._buffer = "".join(parts)
+        self._patched = pos
+
+    def _consume(self):
+        if self.text_sink is not None:
+            self.text_sink(self._buffer[:self._pos])
+        self._buffer = self._buffer[self._pos:]
+        self._offset += self._pos
+        # the consumed text is out of any string, so it is safe to start the next scan from there.
+        self._patched = max(self._patched - self._pos, 0)
+        self._pos = 0
+
+
+def write_patched_trace(local_file, compressed, output_file, patches, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Copy the trace to the gzip output_file with the (start, end, replacement) patches applied.
+
+    The text is copied chunk by chunk and only the patched spans are changed, so the trace
+    doesn't need to be loaded and serialized again as a whole. The patches contained in a
+    previous patch are ignored.
+    """
+    binary = io.open_mapped(local_file, compressed)
+    with sysio.TextIOWrapper(binary, encoding="utf-8", newline="") as fin, \
+            gzip.open(output_file, 'wt', encoding="utf-8", newline="", compresslevel=6) as fout:
+        def copy(size, write=True):
+            while size > 0:
+                chunk = fin.read(min(size, chunk_size))
+                if not chunk:
+                    break
+                if write:
+                    fout.write(chunk)
+                size -= len(chunk)
+
+        pos = 0
+        for start, end, replacement in sorted(patches):
+            if start < pos:
+                continue
+            copy(start - pos)
+            copy(end - start, write=False)
+            fout.write(replacement)
+            pos = end
+
+        while True:
+            chunk = fin.read(chunk_size)
+            if not chunk:
+                break
+            fout.write(chunk)
+
+
+def write_compressed_trace(local_file, output_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Compress the trace to the gzip output_file chunk by chunk."""
+    with io.open_mapped(local_file, False) as fin, open(output_file, 'wb') as fout:
+        compressor = zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        while True:
+            chunk = fin.read(chunk_size)
+            if not chunk:
+                break
+            fout.write(compressor.compress(chunk))
+        fout.write(compressor.flush())
+
+
+class TraceProjection(object):
+    """The events and args of a trace to keep: the events of the pids and tids if given, except the ones of
+    the excluded categories, with the strip_args keys removed from their args. The events without pid, tid
+    or cat are kept, like the metadata events of the processes."""
+
+    def __init__(self, pids=(), tids=(), exclude_cats=(), strip_args=()):
+        self.pids = frozenset(str(pid) for pid in pids)
+        self.tids = frozenset(str(tid) for tid in tids)
+        self.exclude_cats = frozenset(exclude_cats)
+        self.strip_args = frozenset(strip_args)
+
+    def __bool__(self):
+        return bool(self.pids or self.tids or self.exclude_cats or self.strip_args)
+
+    @property
+    def key(self):
+        return json.dumps([sorted(self.pids), sorted(self.tids), sorted(self.exclude_cats), sorted(self.strip_args)])
+
+    def keeps(self, event):
+        if self.pids and "pid" in event and str(event["pid"]) not in self.pids:
+            return False
+        if self.tids and "tid" in event and str(event["tid"]) not in self.tids:
+            return False
+        return event.get("cat") not in self.exclude_cats
+
+
+def write_projected_trace(local_file, compressed, output_file, projection, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write the events of the trace kept by the projection to the gzip output_file.
+
+    The kept events are copied as they are, and only the ones whose args are stripped are serialized
+    again. The top-level members are written after the traceEvents.
+    """
+    with TraceStream.open(local_file, compressed, chunk_size) as stream, \
+            gzip.open(output_file, 'wt', encoding="utf-8", newline="", compresslevel=1) as fout:
+        fout.write('{"traceEvents": [')
+        separator = ""
+        for event in stream.events():
+            if not projection.keeps(event):
+                continue
+            args = event.get("args")
+            if projection.strip_args and isinstance(args, dict) and not projection.strip_args.isdisjoint(args):
+                event["args"] = {key: value for key, value in args.items() if key not in projection.strip_args}
+                text = json.dumps(event, ensure_ascii=False)
+            else:
+                text = stream.event_text
+            fout.write(separator)
+            fout.write(text)
+            separator = ", "
+        fout.write("]")
+        for key, value in stream.metadata.items():
+            fout.write(", {}: {}".format(json.dumps(key), json.dumps(value, ensure_ascii=False)))
+        fout.write("}")
+
+
+# The header of a gzip member without the file name and mtime.
+_GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+
+def write_trace_with_counters(local_file, compressed, output_file, counters, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write the trace with the counter events appended to its traceEvents to the gzip output_file.
+
+    The trace is copied chunk by chunk up to its last ']', and its deflate stream ends with a full flush,
+    so the counters and the end of the json are deflated on their own and appended to it, with the crc
+    of the trace continued. The file is a single gzip member, since some browsers ignore the members
+    after the first one.
+    """
+    crc = 0
+    size = 0
+    with io.open_mapped(local_file, compressed) as fin, open(output_file, 'wb') as fout:
+        fout.write(_GZIP_HEADER)
+        compressor = zlib.compressobj(1, zlib.DEFLATED, -zlib.MAX_WBITS)
+        # the text from the last ']' seen, which is dropped at the end.
+        pending = b""
+        while True:
+            chunk = fin.read(chunk_size)
+            if not chunk:
+                break
+            data = pending + chunk
+            end = data.rfind(b"]")
+            if end < 0:
+                pending = data
+                continue
+            body = memoryview(data)[:end]
+            crc = zlib.crc32(body, crc)
+            size += len(body)
+            fout.write(compressor.compress(body))
+            body.release()
+            pending = data[end:]
+        if not pending.startswith(b"]"):
+            raise ValueError("The trace %s has no traceEvents to append the counters" % local_file)
+        fout.write(compressor.flush(zlib.Z_FULL_FLUSH))
+
+        tail = counters + b"]}"
+        crc = zlib.crc32(tail, crc)
+        size += len(tail)
+        compressor = zlib.compressobj(1, zlib.DEFLATED, -zlib.MAX_WBITS)
+        fout.write(compressor.compress(tail))
+        fout.write(compressor.flush())
+        fout.write(struct.pack("<II", crc & 0xffffffff, size & 0xffffffff))
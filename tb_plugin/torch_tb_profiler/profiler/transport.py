@@ -0,0 +1,65 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# --------------------------------------------------------------------------
+import os
+import pickle
+import tempfile
+from collections import namedtuple
+
+from .. import utils
+
+logger = utils.get_logger()
+
+# /dev/shm is backed by memory, so the results don't hit the disk.
+TRANSPORT_DIR = os.getenv('TORCH_PROFILER_TRANSPORT_DIR',
+                          '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+
+# The handle of a result passed from the parsing process to the plugin.
+# path is the file storing the pickled result, or None if the value is passed inline.
+ResultHandle = namedtuple('ResultHandle', ['path', 'value'])
+
+
+def dump(obj):
+    '''Write obj to a temporary file and return its handle.
+    Fall back to pass obj inline if the file could not be written, e.g. /dev/shm is full.'''
+    path = None
+    try:
+        fd, path = tempfile.mkstemp(prefix='torch_tb_profiler_', suffix='.pkl', dir=TRANSPORT_DIR)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return ResultHandle(path, None)
+    except OSError as ex:
+        logger.warning("Failed to write the result to %s, pass it through the pipe. Exception=%s", TRANSPORT_DIR, ex)
+        if path is not None:
+            _remove(path)
+        return ResultHandle(None, obj)
+
+
+def load(handle):
+    '''Return the object of the handle. The file of the handle is removed, so it could be loaded once only.'''
+    if handle.path is None:
+        return handle.value
+    try:
+        with open(handle.path, 'rb') as f:
+            return pickle.load(f)
+    finally:
+        _remove(handle.path)
+
+
+def get_size(handle):
+    '''Return the size of the pickled result, or 0 if it is passed inline.'''
+    if handle.path is None:
+        return 0
+    return os.path.getsize(handle.path)
+
+
+def discard(handle):
+    if handle.path is not None:
+        _remove(handle.path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as ex:
+        logger.warning("Failed to remove the result file %s. Exception=%s", path, ex)
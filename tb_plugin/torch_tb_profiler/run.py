@@ -31,6 +31,11 @@ class Run(object):
     def get_workers(self, view):
         worker_set = set()
         for profile in self.profiles.values():
+            if isinstance(profile, PendingRunProfile) and not profile.views:
+                # The views are unknown until the trace file is parsed.
+                if view != consts.DISTRIBUTED_VIEW.display_name:
+                    worker_set.add(profile.worker)
+                continue
             for v in profile.views:
                 if v.display_name == view:
                     worker_set.add(profile.worker)
@@ -78,6 +83,17 @@ class Run(object):
         else:
             return self.profiles.values()
 
+class PendingRunProfile(object):
+    """ Placeholder of a worker and span whose trace file is not parsed yet, or whose profile is evicted.
+    """
+
+    def __init__(self, worker, span, views=None):
+        self.worker = worker
+        self.span = span
+        # The views are known if the profile was parsed and then evicted.
+        self.views = views or []
+
+
 class RunProfile(object):
     """ Cooked profiling result for a worker. For visualization purpose only.
     """
@@ -99,6 +115,8 @@ class RunProfile(object):
         self.kernel_pie = None
         self.kernel_table = None
         self.trace_file_path = None
+        # The StatData of the trace file when it is loaded, or None if unknown.
+        self.trace_file_state = None
         self.gpu_ids = None
         self.gpu_utilization = None
         self.sm_efficiency = None
@@ -157,17 +175,6 @@ class RunProfile(object):
         counter_json_bytes = bytes(counter_json_str, 'utf-8')
         return counter_json_bytes
 
-    def append_gpu_metrics(self, raw_data):
-        counter_json_bytes = self.get_gpu_metrics()
-
-        raw_data_without_tail = raw_data[: raw_data.rfind(b']')]
-        raw_data = b''.join([raw_data_without_tail, counter_json_bytes, b']}'])
-
-        import gzip
-        raw_data = gzip.compress(raw_data, 1)
-        return raw_data
-
-
     def get_gpu_metrics_data_tooltip(self):
         def get_gpu_metrics_data(profile):
             gpu_metrics_data = []
@@ -0,0 +1,107 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# --------------------------------------------------------------------------
+import re
+import threading
+from numbers import Number
+
+import numpy as np
+
+__all__ = ["TableIndex"]
+
+
+class TableIndex(object):
+    """The rows of a table view with the sorted orders of its columns, to serve a page of the table
+    sorted by a column and filtered by a search without serializing the whole table.
+
+    The table is either a list of dict rows, like the operator table, or {"data": {"columns", "rows"}}
+    with list rows, like the kernel tables. The order of a column is sorted on its first request and kept.
+    The numbers, including the numeric text, are sorted by value before the other text, and the ties
+    are kept in the order of the table in both directions.
+    """
+    # The number of the recent searches whose matches are kept.
+    MAX_SEARCHES = 16
+
+    def __init__(self, table):
+        if isinstance(table, dict):
+            self.rows = table["data"]["rows"]
+            self.columns = {column["name"]: i for i, column in enumerate(table["data"]["columns"])}
+        else:
+            self.rows = table
+            self.columns = {name: name for name in (table[0] if table else {})}
+        # (column name, order) => indexes of the sorted rows
+        self._orders = {}
+        # (search, regex) => mask of the matched rows
+        self._searches = {}
+        self._texts = None
+        self._lock = threading.Lock()
+
+    def get_page(self, offset=0, limit=None, sort_by=None, order="desc", search=None, regex=False):
+        '''Return the number of the rows matching the search, and the rows from offset to offset + limit of them.
+        The search is a case insensitive substring or regular expression of the text cells of the rows.
+        ValueError is raised for an unknown column or order, or an invalid regular expression.'''
+        if order not in ("asc", "desc"):
+            raise ValueError("The order must be asc or desc instead of {}".format(order))
+        if sort_by is None:
+            indexes = np.arange(len(self.rows))
+        else:
+            indexes = self._get_order(sort_by, order)
+        if search:
+            indexes = indexes[self._match(search, regex)[indexes]]
+
+        offset = max(offset, 0)
+        end = len(indexes) if limit is None else offset + max(limit, 0)
+        return len(indexes), [self.rows[i] for i in indexes[offset:end]]
+
+    def _get_order(self, name, order):
+        indexes = self._orders.get((name, order))
+        if indexes is None:
+            if name not in self.columns:
+                raise ValueError("The table has no column {}, whose columns are {}".format(name, list(self.columns)))
+            key = self.columns[name]
+            values = [row[key] for row in self.rows]
+            if all(isinstance(value, Number) for value in values):
+                values = np.array(values, dtype=np.float64)
+                # the stable sort of the negated values keeps the ties in order.
+                indexes = np.argsort(values if order == "asc" else -values, kind="stable")
+            else:
+                keys = [_get_sort_key(value) for value in values]
+                indexes = np.array(sorted(range(len(keys)), key=keys.__getitem__, reverse=order == "desc"),
+                                   dtype=np.int64)
+            self._orders[(name, order)] = indexes
+        return indexes
+
+    def _match(self, search, regex):
+        mask = self._searches.get((search, regex))
+        if mask is None:
+            try:
+                pattern = re.compile(search if regex else re.escape(search), re.IGNORECASE)
+            except re.error as e:
+                raise ValueError("Invalid regular expression {}: {}".format(search, e))
+            if self._texts is None:
+                self._texts = ["\n".join(str(value) for value in self._values(row) if not isinstance(value, Number))
+                               for row in self.rows]
+            mask = np.fromiter((pattern.search(text) is not None for text in self._texts), dtype=bool,
+                               count=len(self._texts))
+            with self._lock:
+                if len(self._searches) >= self.MAX_SEARCHES:
+                    self._searches.pop(next(iter(self._searches)))
+                self._searches[(search, regex)] = mask
+        return mask
+
+    @staticmethod
+    def _values(row):
+        return row.values() if isinstance(row, dict) else row
+
+
+def _get_sort_key(value):
+    '''Return the key sorting the numbers and the numeric text by value, before the other text.'''
+    if not isinstance(value, Number):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return 1, 0.0, str(value).lower()
+    if value != value:
+        # NaN
+        return 1, 0.0, "nan"
+    return 0, value, ""
@@ -24,3 +24,51 @@ def get_logger():
 
 def is_chrome_trace_file(path):
     return consts.WORKER_PATTERN.match(path)
+
+def _read_first_line(path):
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except (OSError, ValueError):
+        return None
+
+def get_cpu_count():
+    """Return the number of CPUs the process can use, considering the affinity and the cgroup quota."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+
+    quota = None
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    line = _read_first_line("/sys/fs/cgroup/cpu.max")
+    if line:
+        fields = line.split()
+        if len(fields) == 2 and fields[0] != "max":
+            quota = int(fields[0]) / int(fields[1])
+    else:
+        # cgroup v1: the quota is -1 when not limited.
+        cfs_quota = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+        cfs_period = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if cfs_quota and cfs_period and int(cfs_quota) > 0:
+            quota = int(cfs_quota) / int(cfs_period)
+
+    if quota is not None:
+        count = min(count, max(1, int(quota + 0.5)))
+    return count
+
+def get_memory_limit():
+    """Return the bytes of memory the process can use, considering the cgroup limit, or None if unknown."""
+    limit = None
+    try:
+        limit = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        pass
+
+    # cgroup v2 and v1. The v1 limit is a huge number when not limited.
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        line = _read_first_line(path)
+        if line and line.isdigit():
+            limit = int(line) if limit is None else min(limit, int(line))
+            break
+    return limit